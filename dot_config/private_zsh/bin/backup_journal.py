@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Content-addressed backup journal for the docs and config fixers.
+
+Instead of leaving `*.fix.bak` / `.backup-reorg` copies next to every file
+they touch, fixers record the original bytes here. Each distinct blob is
+stored once under its SHA-256 (across all runs), and every run writes one
+small manifest listing the files it changed.
+
+Layout (default: $ZSH_JOURNAL_DIR or $XDG_STATE_HOME/zsh/journal):
+    objects/ab/cdef...      original file contents, keyed by hash
+    runs/<run-id>.json      one manifest per run
+
+Library usage:
+    from backup_journal import Journal
+    with Journal().start_run('fix-docs') as run:
+        run.write_text(path, new_content)
+
+Usage:
+    python3 bin/backup_journal.py list
+    python3 bin/backup_journal.py show RUN_ID
+    python3 bin/backup_journal.py rollback RUN_ID [--dry-run] [--force]
+    python3 bin/backup_journal.py adopt BACKUP_DIR TARGET_DIR
+    python3 bin/backup_journal.py gc
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import secrets
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+
+
+def default_journal_dir() -> Path:
+    """Resolve the journal directory from the environment."""
+    if os.environ.get('ZSH_JOURNAL_DIR'):
+        return Path(os.environ['ZSH_JOURNAL_DIR'])
+    state = os.environ.get('XDG_STATE_HOME') or str(Path.home() / '.local' / 'state')
+    return Path(state) / 'zsh' / 'journal'
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path, chunk=1 << 20) -> str:
+    """Hash ``path`` in fixed-size chunks (never the whole file at once)."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _atomic_write(path: Path, data: bytes, mode=None):
+    """Write via a temp file + rename so readers never see partial content."""
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    if mode is not None:
+        os.chmod(tmp, mode)
+    os.replace(tmp, path)
+
+
+def atomic_write_chunks(path: Path, chunks, mode=None, encoding='utf-8', unless=None):
+    """Stream text ``chunks`` into a temp file, then rename it over ``path``.
+
+    Returns the SHA-256 of what was written, or None (leaving ``path``
+    untouched) when it equals ``unless``. The temp file is removed if the
+    chunk iterator raises.
+    """
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    h = hashlib.sha256()
+    try:
+        with open(tmp, 'wb') as f:
+            for chunk in chunks:
+                data = chunk.encode(encoding)
+                h.update(data)
+                f.write(data)
+        digest = h.hexdigest()
+        if digest == unless:
+            tmp.unlink()
+            return None
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, path)
+        return digest
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+class Journal:
+    """A directory of hash-addressed blobs plus per-run manifests."""
+
+    def __init__(self, root=None):
+        self.root = Path(root) if root else default_journal_dir()
+        self.objects = self.root / 'objects'
+        self.runs_dir = self.root / 'runs'
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest[2:]
+
+    def store(self, data: bytes) -> str:
+        """Store ``data`` once and return its hash."""
+        digest = hash_bytes(data)
+        blob = self._blob_path(digest)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            _atomic_write(blob, data)
+        return digest
+
+    def store_file(self, path) -> str:
+        """Like ``store`` but copies ``path`` without reading it into memory."""
+        digest = hash_file(path)
+        blob = self._blob_path(digest)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            tmp = blob.with_name(f'.{blob.name}.{os.getpid()}.tmp')
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, blob)
+        return digest
+
+    def load(self, digest: str) -> bytes:
+        return self._blob_path(digest).read_bytes()
+
+    def snapshot(self, path) -> dict:
+        """Record the current state of ``path`` and return a manifest entry."""
+        path = Path(path).resolve()
+        if not path.exists():
+            return {'path': str(path), 'before': None, 'after': None, 'mode': None}
+        return {
+            'path': str(path),
+            'before': self.store_file(path),
+            'after': None,
+            'mode': path.stat().st_mode & 0o7777,
+        }
+
+    def start_run(self, tool: str) -> 'Run':
+        return Run(self, tool)
+
+    def run_ids(self):
+        if not self.runs_dir.is_dir():
+            return []
+        return sorted(p.stem for p in self.runs_dir.glob('*.json'))
+
+    def load_run(self, run_id: str) -> dict:
+        manifest = self.runs_dir / f'{run_id}.json'
+        if not manifest.exists():
+            raise KeyError(f'unknown run: {run_id}')
+        return json.loads(manifest.read_text(encoding='utf-8'))
+
+    def rollback(self, run_id: str, dry_run=False, force=False):
+        """Restore every file touched by ``run_id``.
+
+        Files modified again since the run are skipped unless ``force`` is
+        set. Returns (restored, skipped) lists of paths.
+        """
+        manifest = self.load_run(run_id)
+        restored, skipped = [], []
+        for entry in manifest['files']:
+            path = Path(entry['path'])
+            current = hash_bytes(path.read_bytes()) if path.exists() else None
+            if not force and entry.get('after') and current != entry['after']:
+                skipped.append(path)
+                continue
+            restored.append(path)
+            if dry_run:
+                continue
+            if entry['before'] is None:
+                if path.exists():
+                    path.unlink()
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _atomic_write(path, self.load(entry['before']), entry.get('mode'))
+        return restored, skipped
+
+    def gc(self):
+        """Delete blobs no manifest references; return the number removed."""
+        live = set()
+        for run_id in self.run_ids():
+            for entry in self.load_run(run_id)['files']:
+                if entry['before']:
+                    live.add(entry['before'])
+        removed = 0
+        if self.objects.is_dir():
+            for blob in self.objects.glob('*/*'):
+                if blob.parent.name + blob.name not in live:
+                    blob.unlink()
+                    removed += 1
+        return removed
+
+
+class Run:
+    """One invocation of a fixer; collects entries and writes a manifest."""
+
+    def __init__(self, journal: Journal, tool: str):
+        self.journal = journal
+        self.tool = tool
+        self.started = datetime.now()
+        stamp = self.started.strftime('%Y%m%dT%H%M%S')
+        self.run_id = f'{stamp}-{tool}-{secrets.token_hex(2)}'
+        self.entries = {}
+
+    def record(self, path) -> dict:
+        """Back up ``path`` (once per run) before it is modified."""
+        key = str(Path(path).resolve())
+        if key not in self.entries:
+            self.entries[key] = self.journal.snapshot(key)
+        return self.entries[key]
+
+    def add(self, entry: dict):
+        """Merge an entry produced elsewhere (e.g. in a worker process)."""
+        self.entries.setdefault(entry['path'], entry)
+
+    def write_text(self, path, text: str, encoding='utf-8') -> dict:
+        """Back up ``path`` then atomically replace it with ``text``."""
+        entry = self.record(path)
+        data = text.encode(encoding)
+        target = Path(entry['path'])
+        target.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(target, data, entry.get('mode'))
+        entry['after'] = hash_bytes(data)
+        return entry
+
+    def write_chunks(self, path, chunks, encoding='utf-8'):
+        """Streaming ``write_text``: back up ``path`` then write ``chunks``.
+
+        Returns the entry, or None when the output matches the current
+        content (the file is then left untouched and not recorded).
+        """
+        fresh = str(Path(path).resolve()) not in self.entries
+        entry = self.record(path)
+        digest = atomic_write_chunks(Path(entry['path']), chunks, entry.get('mode'), encoding,
+                                     unless=entry['after'] or entry['before'])
+        if digest is None:
+            if fresh:
+                del self.entries[entry['path']]
+            return None
+        entry['after'] = digest
+        return entry
+
+    def close(self):
+        """Write the manifest if anything was recorded; return its path."""
+        if not self.entries:
+            return None
+        self.journal.runs_dir.mkdir(parents=True, exist_ok=True)
+        manifest = self.journal.runs_dir / f'{self.run_id}.json'
+        _atomic_write(manifest, json.dumps({
+            'run_id': self.run_id,
+            'tool': self.tool,
+            'started': self.started.isoformat(timespec='seconds'),
+            'cwd': os.getcwd(),
+            'files': sorted(self.entries.values(), key=lambda e: e['path']),
+        }, indent=2).encode('utf-8'))
+        return manifest
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def adopt(journal: Journal, backup_dir: Path, target_dir: Path) -> Run:
+    """Turn a legacy backup tree into a run whose rollback restores it.
+
+    Each file under ``backup_dir`` is mapped onto the same relative path
+    under ``target_dir``; once adopted the backup tree can be deleted.
+    """
+    run = journal.start_run(f'adopt-{backup_dir.name}')
+    for src in sorted(p for p in backup_dir.rglob('*') if p.is_file()):
+        dest = (target_dir / src.relative_to(backup_dir)).resolve()
+        current = hash_bytes(dest.read_bytes()) if dest.exists() else None
+        run.add({
+            'path': str(dest),
+            'before': journal.store(src.read_bytes()),
+            'after': current,
+            'mode': src.stat().st_mode & 0o7777,
+        })
+    run.close()
+    return run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect and roll back fixer runs')
+    parser.add_argument('--journal', type=Path, help='Journal directory (default: %(default)s)',
+                        default=default_journal_dir())
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='List recorded runs')
+    p_show = sub.add_parser('show', help='Show the files touched by a run')
+    p_show.add_argument('run_id')
+    p_rb = sub.add_parser('rollback', help='Restore every file touched by a run')
+    p_rb.add_argument('run_id')
+    p_rb.add_argument('--dry-run', action='store_true', help='List files without restoring')
+    p_rb.add_argument('--force', action='store_true', help='Restore files changed since the run too')
+    p_adopt = sub.add_parser('adopt', help='Import a legacy backup tree as a run')
+    p_adopt.add_argument('backup_dir', type=Path)
+    p_adopt.add_argument('target_dir', type=Path)
+    sub.add_parser('gc', help='Remove blobs no run references')
+    args = parser.parse_args(argv)
+
+    journal = Journal(args.journal)
+
+    if args.command == 'list':
+        for run_id in journal.run_ids():
+            manifest = journal.load_run(run_id)
+            print(f"{run_id}  {manifest['tool']:<24} {len(manifest['files'])} files")
+        return 0
+
+    if args.command == 'show':
+        try:
+            manifest = journal.load_run(args.run_id)
+        except KeyError as e:
+            print(f"❌ {e.args[0]}")
+            return 1
+        print(f"Run:     {manifest['run_id']}")
+        print(f"Tool:    {manifest['tool']}")
+        print(f"Started: {manifest['started']}")
+        for entry in manifest['files']:
+            print(f"  {entry['path']}")
+        return 0
+
+    if args.command == 'rollback':
+        try:
+            restored, skipped = journal.rollback(args.run_id, args.dry_run, args.force)
+        except KeyError as e:
+            print(f"❌ {e.args[0]}")
+            return 1
+        verb = 'Would restore' if args.dry_run else 'Restored'
+        for path in restored:
+            print(f"  ✅ {verb}: {path}")
+        for path in skipped:
+            print(f"  ⚠️  Changed since run, skipped (use --force): {path}")
+        print(f"\n{verb} {len(restored)} files, skipped {len(skipped)}")
+        return 0 if not skipped else 1
+
+    if args.command == 'adopt':
+        if not args.backup_dir.is_dir():
+            print(f"❌ Backup directory not found: {args.backup_dir}")
+            return 1
+        run = adopt(journal, args.backup_dir, args.target_dir)
+        print(f"📦 Adopted {len(run.entries)} files as run {run.run_id}")
+        print(f"   Restore with: backup_journal.py rollback {run.run_id}")
+        return 0
+
+    if args.command == 'gc':
+        print(f"🧹 Removed {journal.gc()} unreferenced blobs")
+        return 0
+
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Def-use analysis of variable assignments across the zshenv layer and the
+pre-plugin fragments.
+
+Walks, in load order, the live (or a chosen) .zshenv layer with
+.zshenv.local inlined where it is sourced, the vendored .zprofile/.zshrc
+code that runs before the fragments, and the pre-plugin fragments, on the
+structural tokenizer (zsh_blocks.py). For every assignment it reports:
+
+- dead: overwritten (or unset) before anything could read it; the shell
+  paid for the value, often a command substitution, and threw it away
+- redundant: a `X=${X:-default}` re-default after an unconditional
+  assignment already left X non-empty (and, for exports, exported)
+- unused: never read by any later code in these files, the later layers,
+  .zshrc.local or the plugins
+- unreferenced export: an unused variable that is exported; only external
+  programs could still read it, so it is worth a look but never removed
+
+A value counts as read when any later command mentions the name (even in
+single quotes), when a function that mentions it is called, when an
+exported variable meets an external command, and at anything opaque:
+eval, sourcing a file outside the tree, `typeset -p`, ${(P)...}. Files
+sourced from ZDOTDIR count as reading every name they mention. A read
+earlier in the same file counts too, as the file sees the value when it
+is sourced again: the `[[ -n ${X_DONE:-} ]] && return 0; X_DONE=1`
+idempotency guards rely on that.
+Function bodies are only analyzed for the names they read.
+
+`--patch FILE` writes a unified diff that deletes the dead and redundant
+assignments that are whole top-level statements of their own lines (not
+part of && / || chains or if/case bodies) and were superseded in the same
+file, since .zshenv.local differs per host; apply it with `git apply`
+after review.
+
+Usage:
+    python3 bin/dead_assignments.py [--zshenv LAYER] [--plugins DIR ...]
+                                    [--format text|json] [--patch FILE]
+
+Exit codes:
+    0 - no dead or redundant assignments
+    1 - dead or redundant assignments found
+"""
+
+import argparse
+import difflib
+import json
+import re
+import sys
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from startup_cost import command_word, is_external
+from toggle_index import find_zshenv_local
+from zsh_blocks import Command, scan, split_words
+from zsh_manifest import FAMILIES, live_layers, resolve_layer, resolve_live
+
+ROOT = Path(__file__).resolve().parent.parent
+
+VAR_REF_RE = re.compile(r'\$\{(?:\([^)]*\))?[#+=~^]*([A-Za-z_]\w*)|\$([A-Za-z_]\w*)')
+ARITH_RE = re.compile(r'\(\((.*?)\)\)', re.DOTALL)
+IDENT_RE = re.compile(r'\b[A-Za-z_]\w*\b')
+ASSIGN_RE = re.compile(r'^([A-Za-z_]\w*)(\+?)=')
+SELF_DEFAULT_RE = re.compile(r'^"?\$\{([A-Za-z_]\w*):?[-=](.*)\}"?$', re.DOTALL)
+LITERAL_RE = re.compile(r'^(?:"[^"$`]+"|\'[^\']+\'|[^\s"\'$`]+)$')
+DECLARE = {'export', 'typeset', 'declare', 'local', 'readonly', 'integer', 'float'}
+OPAQUE = {'eval', 'source', '.'}
+SOURCE_PATH_RE = re.compile(r'^"?\$\{?(\w+)(?:[:-][^}]*)?\}?/(.+?)"?$')
+CONDITIONAL = ('if', 'case', 'for', 'while', 'until', 'select', 'repeat', 'function')
+
+# Lists handled by path_cache.py, and parameters zsh itself reads
+IGNORED = {'PATH', 'path', 'FPATH', 'fpath', 'MANPATH', 'manpath', 'CDPATH', 'cdpath',
+           'REPLY', 'reply', 'match', 'mbegin', 'mend', 'MATCH', 'MBEGIN', 'MEND'}
+ZSH_READS = set('''
+    HISTFILE HISTSIZE SAVEHIST HISTORY_IGNORE PROMPT PROMPT2 PROMPT3 PROMPT4 PS1 PS2 PS3 PS4
+    RPROMPT RPS1 RPROMPT2 RPS2 WORDCHARS KEYTIMEOUT LISTMAX REPORTTIME REPORTMEMORY TIMEFMT
+    DIRSTACKSIZE ZDOTDIR TMPPREFIX NULLCMD READNULLCMD MAILCHECK MAILPATH LANG LC_ALL
+    LC_CTYPE LC_COLLATE LC_MESSAGES LC_NUMERIC LC_TIME TERM COLUMNS LINES ZLE_RPROMPT_INDENT
+    ZLE_REMOVE_SUFFIX_CHARS ZLE_SPACE_SUFFIX_CHARS SPROMPT TMOUT HOME SHELL EDITOR VISUAL
+    PAGER LESS ZBEEP CORRECT_IGNORE CORRECT_IGNORE_FILE
+'''.split())
+
+
+@dataclass
+class Definition:
+    var: str
+    where: str
+    line: int
+    last_line: int
+    text: str
+    exported: bool
+    substitution: bool
+    conditional: bool
+    removable: bool
+    status: str = 'pending'   # dead, redundant, live, unused, unreferenced-export
+    detail: str = ''
+
+
+def references(text: str) -> Set[str]:
+    """Names ``text`` may read: $X, ${...X...}, and identifiers in (( ))."""
+    names = {a or b for a, b in VAR_REF_RE.findall(text)}
+    for body in ARITH_RE.findall(text):
+        names.update(IDENT_RE.findall(body))
+    return names
+
+
+def assignments(stage: str) -> Tuple[List[Tuple[str, bool, str]], bool, bool]:
+    """([(name, appends, value)], exported, is_pure) for one stage.
+
+    ``is_pure`` is False when the stage also runs a command, in which case
+    leading `X=1 cmd` assignments only apply to that command.
+    """
+    words = split_words(stage)
+    if not words:
+        return [], False, True
+    if words[0] in DECLARE:
+        exported = words[0] == 'export'
+        found = []
+        for w in words[1:]:
+            if w.startswith(('-', '+')):
+                exported = exported or ('x' in w and w.startswith('-'))
+                if 'p' in w.lstrip('-+') and w.startswith('-'):
+                    return [], exported, False  # typeset -p prints values
+                continue
+            m = ASSIGN_RE.match(w)
+            if m:
+                found.append((m.group(1), bool(m.group(2)), w[m.end():]))
+        return found, exported, True
+    found = []
+    for w in words:
+        m = ASSIGN_RE.match(w)
+        if not m:
+            return [], False, False
+        found.append((m.group(1), bool(m.group(2)), w[m.end():]))
+    return found, False, True
+
+
+class DefUse:
+    def __init__(self, functions: Dict[str, Set[str]], base_dir: Optional[Path] = None):
+        self.functions = functions
+        self.base_dir = base_dir
+        self.pending: Dict[str, List[Definition]] = defaultdict(list)
+        self.exported: Set[str] = set()
+        self.done: List[Definition] = []
+        self.inline: Dict[str, Tuple[str, str]] = {}
+        # Variables an unconditional assignment left non-empty, and where
+        self.nonempty: Dict[str, str] = {}
+        # label -> name -> first line of that file reading it
+        self.file_reads: Dict[str, Dict[str, int]] = defaultdict(dict)
+
+    def use(self, names: Iterable[str], detail: str):
+        for name in names:
+            for d in self.pending.pop(name, ()):
+                d.status, d.detail = 'live', detail
+                self.done.append(d)
+
+    def use_all(self, detail: str):
+        self.use(list(self.pending), detail)
+        self.nonempty.clear()
+
+    def kill(self, name: str, where: str):
+        for d in self.pending.pop(name, ()):
+            d.status, d.detail = 'dead', f'overwritten at {where}'
+            d.removable = d.removable and where.startswith(f'{d.where}:')
+            self.done.append(d)
+
+    def run(self, label: str, text: str):
+        commands = scan(text).commands
+        for i, cmd in enumerate(commands):
+            if cmd.in_function:
+                continue
+            where = f'{label}:{cmd.line}'
+            body = cmd.text + ''.join(f' {s.body}' for s in cmd.substitutions)
+            reads = references(body)
+            words = set(split_words(body))
+            for func in words & self.functions.keys():
+                reads |= self.functions[func]
+            seen = self.file_reads[label]
+            for name in reads:
+                seen.setdefault(name, cmd.line)
+            if '*' in reads:
+                self.use_all(f'calls a function with opaque reads at {where}')
+                continue
+            self.use(reads, f'read at {where}')
+
+            head = command_word(cmd.stages[0]) or ''
+            if head in ('source', '.') and re.search(r'zshenv[._]local', cmd.text) and 'zshenv.local' in self.inline:
+                inner_label, inner = self.inline.pop('zshenv.local')
+                self.run(inner_label, inner)
+                continue
+            if head in ('source', '.'):
+                sourced = self.resolve(split_words(cmd.stages[0])[1:2])
+                if sourced is not None:
+                    self.use(references(sourced), f'read by the file sourced at {where}')
+                    head = ''
+            if head in OPAQUE or '(P)' in body or cmd.stages[0].strip() == 'set' \
+                    or re.search(r'\b(?:typeset|declare|export)\s+-p\b', body):
+                self.use_all(f'opaque command at {where}')
+                continue
+            if any(is_external(command_word(s), self.functions.keys()) for s in cmd.stages) \
+                    or cmd.substitutions:
+                self.use([n for n in self.pending if n in self.exported], f'exported to a command at {where}')
+
+            if head == 'unset':
+                for w in split_words(cmd.stages[0])[1:]:
+                    if not w.startswith('-'):
+                        self.nonempty.pop(w, None)
+                        if not self._conditional(cmd):
+                            self.kill(w, where)
+                continue
+            if len(cmd.stages) != 1:
+                continue
+            found, exported, pure = assignments(cmd.stages[0])
+            if not pure:
+                continue
+            conditional = self._conditional(cmd)
+            nxt = commands[i + 1] if i + 1 < len(commands) else None
+            last = cmd.line + sum(s.count('\n') for s in cmd.stages)
+            removable = (not cmd.context or cmd.context == ('brace',)) and not cmd.joined \
+                and not (nxt and nxt.joined) \
+                and not any(c is not cmd and c.line <= last and c.line + sum(s.count('\n') for s in c.stages) >= cmd.line
+                            for c in commands[max(0, i - 3):i + 4])
+            for name, appends, value in found:
+                if name in IGNORED:
+                    continue
+                default = SELF_DEFAULT_RE.match(value)
+                if default and default.group(1) != name:
+                    default = None
+                if default and name in self.nonempty and (not exported or name in self.exported):
+                    # ${X:-...} after X was already set: only repeats the value
+                    self.done.append(Definition(
+                        name, label, cmd.line, last, cmd.text.split('\n')[0][:100], exported, False,
+                        conditional, removable and len(found) == 1
+                        and self.nonempty[name].startswith(f'{label}:'), 'redundant',
+                        f'already set at {self.nonempty[name]}'))
+                    continue
+                if conditional or appends:
+                    self.nonempty.pop(name, None)
+                elif (default and LITERAL_RE.match(default.group(2))) or (not default and LITERAL_RE.match(value)):
+                    self.nonempty[name] = where
+                else:
+                    self.nonempty.pop(name, None)
+                if exported:
+                    self.exported.add(name)
+                if appends:
+                    self.use([name], f'appended at {where}')
+                elif not conditional:
+                    self.kill(name, where)
+                self.pending[name].append(Definition(
+                    name, label, cmd.line, last, cmd.text.split('\n')[0][:100],
+                    exported or name in self.exported, bool(cmd.substitutions) or '`' in cmd.text,
+                    conditional, removable and len(found) == 1))
+
+    def resolve(self, words: Sequence[str]) -> Optional[str]:
+        """Text of a sourced `${SOMEDIR}/rel/path` found under the base directory.
+
+        A ZDOTDIR-relative file missing from the tree is missing when
+        deployed too, so it reads nothing.
+        """
+        m = SOURCE_PATH_RE.match(words[0]) if words else None
+        if not m or not self.base_dir:
+            return None
+        parts = m.group(2).split('/')
+        for candidate in (parts, [('dot_' + p[1:]) if p.startswith('.') else p for p in parts]):
+            for last in (candidate[-1], 'executable_' + candidate[-1]):
+                path = self.base_dir.joinpath(*candidate[:-1], last)
+                if path.is_file():
+                    return path.read_text(encoding='utf-8', errors='replace')
+        return '' if 'zdotdir' in m.group(1).lower() else None
+
+    @staticmethod
+    def _conditional(cmd: Command) -> bool:
+        return bool(cmd.joined) or any(kind in CONDITIONAL for kind in cmd.context)
+
+    def finish(self, later: Set[str]):
+        for name in list(self.pending):
+            for d in self.pending.pop(name):
+                first = self.file_reads[d.where].get(name)
+                if name in later or name in ZSH_READS:
+                    d.status, d.detail = 'live', 'read by later layers, plugins or zsh'
+                elif first is not None and first <= d.line:
+                    d.status, d.detail = 'live', f'read when re-sourced, at {d.where}:{first}'
+                elif d.exported:
+                    d.status = 'unreferenced-export'
+                else:
+                    d.status = 'unused'
+                self.done.append(d)
+        self.done.sort(key=lambda d: (d.where, d.line))
+
+
+def function_reads(texts: Iterable[str]) -> Dict[str, Set[str]]:
+    """Names each function may read, including through the functions it calls."""
+    reads: Dict[str, Set[str]] = defaultdict(set)
+    words: Dict[str, Set[str]] = defaultdict(set)
+    for text in texts:
+        script = scan(text)
+        starts = sorted(script.functions)
+        for cmd in script.commands:
+            if not cmd.in_function:
+                continue
+            owner = [name for line, name in starts if line <= cmd.line]
+            if not owner:
+                continue
+            body = cmd.text + ''.join(f' {s.body}' for s in cmd.substitutions)
+            reads[owner[-1]] |= references(body)
+            words[owner[-1]] |= set(split_words(body))
+            if '(P)' in body or cmd.stages[0].split()[:1] == ['eval']:
+                reads[owner[-1]].add('*')
+    changed = True
+    while changed:
+        changed = False
+        for name in list(reads):
+            for callee in words[name] & reads.keys():
+                if not reads[callee] <= reads[name]:
+                    reads[name] |= reads[callee]
+                    changed = True
+    return reads
+
+
+def find_sources(base_dir: Path, zshenv: Optional[str]):
+    """(zshenv label/path, .zshenv.local, boundary files, pre-plugin fragments, later files)."""
+    zshenv = zshenv or resolve_live(base_dir, '.zshenv')
+    env = None
+    for name in ((zshenv, 'dot_' + zshenv.lstrip('.')) if zshenv else ()):
+        if (base_dir / name).is_file():
+            env = (zshenv, base_dir / name)
+            break
+    local = find_zshenv_local(base_dir)
+    boundary = [p for p in (base_dir / n for n in ('.zprofile', 'dot_zprofile', '.zshrc', 'dot_zshrc'))
+                if p.is_file()]
+    fragments, later = [], []
+    for layer in live_layers(base_dir):
+        layer_dir = resolve_layer(base_dir, layer)
+        if not layer_dir:
+            continue
+        files = [(f'{layer}/{p.name}', p) for p in sorted(layer_dir.glob('*.zsh'))]
+        (fragments if layer.startswith(FAMILIES[0]) else later).extend(files)
+    for name in ('.zshrc.local', 'dot_zshrc.local'):
+        if (base_dir / name).is_file():
+            later.append(('.zshrc.local', base_dir / name))
+    return env, local, boundary, fragments, later
+
+
+def analyze(base_dir: Path, zshenv: Optional[str], plugins: Sequence[Path]):
+    env, local, boundary, fragments, later = find_sources(base_dir, zshenv)
+    read = lambda p: p.read_text(encoding='utf-8', errors='replace')  # noqa: E731
+    plugin_files = [p for d in plugins if d.is_dir() for p in sorted(d.rglob('*')) if p.is_file()
+                    and (p.suffix in ('.zsh', '.sh') or p.name.endswith(('.plugin.zsh', '.zsh-theme')))]
+    ordered = ([env] if env else []) + ([('.zshenv.local', local)] if local else []) + fragments
+    texts = {label: read(path) for label, path in ordered + later}
+    functions = function_reads(texts.values())
+
+    du = DefUse(functions, base_dir)
+    if env:
+        if local:
+            du.inline['zshenv.local'] = ('.zshenv.local', texts['.zshenv.local'])
+        du.run(env[0], texts[env[0]])
+    if 'zshenv.local' in du.inline:
+        du.run('.zshenv.local', du.inline.pop('zshenv.local')[1])
+    for path in boundary:
+        du.use(references(read(path)), f'read by {path.name}')
+    for label, _ in fragments:
+        du.run(label, texts[label])
+    later_names = set()
+    for label, _ in later:
+        later_names |= references(texts[label]) | set(IDENT_RE.findall(texts[label]))
+    for path in plugin_files:
+        later_names |= references(read(path))
+    du.finish(later_names)
+    paths = {label: path for label, path in ordered}
+    return du.done, paths
+
+
+def build_patch(defs: Sequence[Definition], paths: Dict[str, Path], base_dir: Path) -> str:
+    """Unified diff deleting the removable dead assignments."""
+    by_file = defaultdict(set)
+    for d in defs:
+        if d.status in ('dead', 'redundant') and d.removable:
+            by_file[d.where].update(range(d.line, d.last_line + 1))
+    out = []
+    for label in sorted(by_file):
+        path = paths[label]
+        old = path.read_text(encoding='utf-8').splitlines(keepends=True)
+        new = [line for n, line in enumerate(old, 1) if n not in by_file[label]]
+        rel = path.relative_to(base_dir) if path.is_relative_to(base_dir) else path
+        out += difflib.unified_diff(old, new, f'a/{rel}', f'b/{rel}')
+    return ''.join(out)
+
+
+def render_text(defs: Sequence[Definition]) -> str:
+    out = []
+    groups = (('💀 Overwritten before read', 'dead'), ('♻️  Re-defaults a variable already set', 'redundant'),
+              ('🫥 Never read', 'unused'),
+              ('📤 Exported, referenced by nothing that was analyzed', 'unreferenced-export'))
+    for title, status in groups:
+        items = [d for d in defs if d.status == status]
+        if not items:
+            continue
+        out.append(f'{title} ({len(items)}):')
+        for d in items:
+            marks = ('🍴' if d.substitution else '  ') + ('✂️ ' if status in ('dead', 'redundant') and d.removable else '  ')
+            detail = f'  -- {d.detail}' if d.detail else ''
+            out.append(f'  {marks} {d.where}:{d.line}  {d.var}{detail}')
+        out.append('')
+    dead = [d for d in defs if d.status == 'dead']
+    redundant = [d for d in defs if d.status == 'redundant']
+    out.append(f"{len(defs)} assignments, {len(dead)} dead "
+               f"({sum(d.substitution for d in dead)} with a command substitution), {len(redundant)} redundant; "
+               f"{sum(d.removable for d in dead + redundant)} removable by the patch")
+    out.append('🍴 runs a command substitution   ✂️  removed by --patch')
+    return '\n'.join(out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find dead and overridden assignments in the zshenv layers')
+    parser.add_argument('--base-dir', type=Path, default=ROOT,
+                        help='ZDOTDIR or chezmoi source directory (default: %(default)s)')
+    parser.add_argument('--zshenv', help='zshenv layer to analyze, e.g. .zshenv.01 (default: .zshenv.live target)')
+    parser.add_argument('--plugins', type=Path, nargs='*',
+                        help='Plugin directories whose references keep a variable live '
+                             '(default: .zgenom under the base directory, if present)')
+    parser.add_argument('--format', choices=('text', 'json'), default='text')
+    parser.add_argument('--patch', type=Path, help='Write a removal patch for the dead assignments here')
+    args = parser.parse_args(argv)
+
+    plugins = args.plugins if args.plugins is not None else \
+        [d for d in (args.base_dir / '.zgenom', args.base_dir / 'zgenom') if d.is_dir()]
+    defs, paths = analyze(args.base_dir, args.zshenv, plugins)
+    if not paths:
+        print(f"❌ No zshenv layer found under {args.base_dir}")
+        return 1
+    if args.format == 'json':
+        print(json.dumps([asdict(d) for d in defs], indent=2))
+    else:
+        print(render_text(defs))
+    if args.patch:
+        patch = build_patch(defs, paths, args.base_dir)
+        args.patch.write_text(patch, encoding='utf-8')
+        print(f"📝 Patch written to {args.patch} ({patch.count(chr(10) + '-') } line(s) removed)", file=sys.stderr)
+    return 1 if any(d.status in ('dead', 'redundant') for d in defs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
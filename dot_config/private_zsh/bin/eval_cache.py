@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Pre-render the init code shells would otherwise get from `eval "$(tool ...)"`.
+
+Fragments load tools with `eval "$(zoxide init zsh)"`-style calls, which
+fork and exec the tool on every start; mroth/evalcache only avoids that
+after a first, slow start, and keys its files by the arguments alone. This
+tool finds every such call in the live zshenv layer, .zshenv.local,
+.zshrc.local and the live fragment layers:
+
+- `zf::init_output tool args...` and `_evalcache tool args...`
+- `eval "$(tool args...)"`
+- `$(tool init|activate|hook ...)` assigned for later use (starship)
+
+and renders all of them ahead of time, in parallel, into the evalcache
+directory (${ZSH_EVALCACHE_DIR:-$ZDOTDIR/.zsh-evalcache}) under the names
+mroth/evalcache uses (init-<tool>-<md5 of args>.sh). An entry is rendered
+again only when the tool binary's content hash or the arguments change; a
+binary that was touched but not changed just has its entry marked fresh.
+When an init script is a stub that sources the tool's own output again
+(`source <(starship init zsh --print-full-init)`), the full code is cached.
+Entries no call site uses any more are pruned.
+
+The shell reads $ZSH_CACHE_DIR/evalcache-index.zsh through zf::init_output
+(.zshenv.02): the entry is used while the binary found on PATH is the one
+it was rendered from and is not newer than the entry.
+
+Usage:
+    python3 bin/eval_cache.py [--cache-dir DIR] [-o INDEX] [--jobs N]
+                              [--timeout SECONDS] [--no-prune] [--list]
+                              [--check] [--quiet]
+
+Exit codes:
+    0 - success (--check: every entry is current)
+    1 - a tool failed to render (--check: entries are missing or stale)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from backup_journal import atomic_write_chunks
+from toggle_index import find_zshenv_local
+from zsh_blocks import scan
+from zsh_manifest import default_manifest_path, live_layers, resolve_layer, resolve_live
+
+ROOT = Path(__file__).resolve().parent.parent
+VERSION = 1
+INDEX_NAME = '.eval_cache.json'
+
+CALL_WORDS = ('zf::init_output', '_evalcache')
+INIT_WORDS = ('init', 'activate', 'hook')
+LITERAL_RE = re.compile(r'[\w@%+=:,./-]+')
+REDIRECT_RE = re.compile(r'^\d*[<>&]')
+STUB_RE = re.compile(r'^(?:source|\.)\s+<\((.+)\)$|^eval\s+"\$\((.+)\)"$')
+
+
+@dataclass
+class Entry:
+    args: Tuple[str, ...]
+    sites: List[str] = field(default_factory=list)
+    binary: Optional[str] = None
+    status: str = ''      # current, rendered, refreshed, missing, failed
+    detail: str = ''
+
+    @property
+    def key(self) -> str:
+        return ' '.join(self.args)
+
+    @property
+    def filename(self) -> str:
+        """mroth/evalcache's name: init-<tool>-<md5 of "$*">.sh"""
+        digest = hashlib.md5(self.key.encode()).hexdigest()
+        return f'init-{os.path.basename(self.args[0])}-{digest}.sh'
+
+
+def default_cache_dir() -> Path:
+    if os.environ.get('ZSH_EVALCACHE_DIR'):
+        return Path(os.environ['ZSH_EVALCACHE_DIR'])
+    return Path(os.environ.get('ZDOTDIR') or Path.home()) / '.zsh-evalcache'
+
+
+def default_index_path() -> Path:
+    """$ZSH_CACHE_DIR/evalcache-index.zsh, next to the manifest."""
+    return default_manifest_path().with_name('evalcache-index.zsh')
+
+
+def find_sources(base_dir: Path) -> List[Tuple[str, Path]]:
+    """(label, path) of every file that runs at startup, in load order."""
+    sources = []
+    live = resolve_live(base_dir, '.zshenv')
+    for name in ((live, 'dot_' + live[1:]) if live else ()):
+        if (base_dir / name).is_file():
+            sources.append((live, base_dir / name))
+            break
+    local = find_zshenv_local(base_dir)
+    if local:
+        sources.append(('.zshenv.local', local))
+    for layer in live_layers(base_dir):
+        layer_dir = resolve_layer(base_dir, layer)
+        if layer_dir:
+            sources += [(f'{layer}/{p.name}', p) for p in sorted(layer_dir.glob('*.zsh'))]
+    for name in ('.zshrc.local', 'dot_zshrc.local'):
+        if (base_dir / name).is_file():
+            sources.append(('.zshrc.local', base_dir / name))
+            break
+    return sources
+
+
+def _literal_args(words: Sequence[str]) -> Optional[Tuple[str, ...]]:
+    """The words before any redirection, or None if one is not literal."""
+    args = []
+    for word in words:
+        if REDIRECT_RE.match(word):
+            break
+        if not LITERAL_RE.fullmatch(word):
+            return None
+        args.append(word)
+    return tuple(args) or None
+
+
+def find_calls(text: str) -> Tuple[List[Tuple[int, Tuple[str, ...]]], List[Tuple[int, str]]]:
+    """(line, args) of every cacheable call in ``text``, and skipped (line, text)."""
+    calls, skipped = [], []
+    for cmd in scan(text).commands:
+        for stage in cmd.stages:
+            words = stage.split()
+            if words[:1] and words[0] in CALL_WORDS:
+                args = _literal_args(words[1:])
+                (calls.append((cmd.line, args)) if args else skipped.append((cmd.line, stage)))
+        is_eval = cmd.stages[0].split()[:1] == ['eval']
+        for sub in cmd.substitutions:
+            body = sub.body.strip()
+            if sub.kind != '$(' or re.search(r'[|;&]', body.replace('&>', '').replace('2>&1', '')):
+                continue
+            words = body.split()
+            if not (is_eval or (len(words) > 1 and words[1] in INIT_WORDS)):
+                continue
+            args = _literal_args(words)
+            (calls.append((sub.line, args)) if args else skipped.append((sub.line, body)))
+    return calls, skipped
+
+
+def collect(base_dir: Path) -> Tuple[Dict[str, Entry], List[str]]:
+    entries: Dict[str, Entry] = {}
+    skipped = []
+    for label, path in find_sources(base_dir):
+        calls, skips = find_calls(path.read_text(encoding='utf-8', errors='replace'))
+        for line, args in calls:
+            entry = entries.setdefault(' '.join(args), Entry(args))
+            entry.sites.append(f'{label}:{line}')
+        skipped += [f'{label}:{line}: {text}' for line, text in skips]
+    return entries, skipped
+
+
+def file_sha256(path: str, known: Optional[dict]) -> str:
+    """Content hash of ``path``; reuses ``known`` when size, mtime and inode match."""
+    st = os.stat(path)
+    stamp = [st.st_size, st.st_mtime_ns, st.st_ino]
+    if known and known.get('stat') == stamp:
+        return known['sha256']
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def run_tool(args: Sequence[str], timeout: float) -> Tuple[Optional[str], str]:
+    """(output, detail); follows a stub that re-runs the same tool once."""
+    try:
+        proc = subprocess.run(list(args), stdin=subprocess.DEVNULL, capture_output=True,
+                              text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return None, str(e)
+    if proc.returncode or not proc.stdout.strip():
+        return None, (proc.stderr.strip().splitlines() or [f'exit {proc.returncode}, no output'])[-1]
+    code = [line for line in proc.stdout.strip().split('\n') if not line.lstrip().startswith('#')]
+    m = STUB_RE.match(code[0].strip()) if len(code) == 1 else None
+    if m:
+        try:
+            inner = shlex.split(m.group(1) or m.group(2))
+        except ValueError:
+            inner = []
+        if inner and os.path.basename(inner[0]) == os.path.basename(args[0]):
+            output, detail = run_tool(inner, timeout)
+            if output is not None:
+                return output, f"followed {' '.join(inner[1:])}"
+    return proc.stdout, ''
+
+
+def render_index(entries: Sequence[Entry], cache_dir: Path) -> str:
+    q = lambda s: "'" + s.replace("'", "'\\''") + "'"  # noqa: E731
+    usable = [e for e in entries if e.status in ('current', 'rendered', 'refreshed')]
+    out = ['# Generated by bin/eval_cache.py -- do not edit',
+           '# "$*" of an init call -> its pre-rendered output, and the binary it came from',
+           'typeset -gA _ZF_EVALCACHE _ZF_EVALCACHE_BIN',
+           '_ZF_EVALCACHE=(']
+    out += [f'  {q(e.key)} {q(str(cache_dir / e.filename))}' for e in usable]
+    out += [')', '_ZF_EVALCACHE_BIN=(']
+    out += [f'  {q(e.key)} {q(e.binary)}' for e in usable]
+    out.append(')')
+    return '\n'.join(out) + '\n'
+
+
+def refresh(entries: Dict[str, Entry], cache_dir: Path, jobs: int, timeout: float,
+            check: bool = False) -> Dict[str, dict]:
+    """Bring the cache entries up to date; return the new sidecar index."""
+    try:
+        old = json.loads((cache_dir / INDEX_NAME).read_text(encoding='utf-8'))['entries']
+    except (OSError, ValueError, KeyError):
+        old = {}
+    new, todo = {}, []
+    for entry in entries.values():
+        entry.binary = shutil.which(entry.args[0])
+        if not entry.binary:
+            entry.status, entry.detail = 'missing', 'not on PATH'
+            continue
+        real = os.path.realpath(entry.binary)
+        prev = old.get(entry.filename, {})
+        digest = file_sha256(real, prev.get('binary'))
+        st = os.stat(real)
+        record = {'args': list(entry.args), 'path': entry.binary,
+                  'binary': {'realpath': real, 'sha256': digest,
+                             'stat': [st.st_size, st.st_mtime_ns, st.st_ino]}}
+        target = cache_dir / entry.filename
+        if (prev.get('args') == record['args'] and prev.get('binary', {}).get('sha256') == digest
+                and target.is_file() and target.stat().st_size):
+            entry.status = 'current'
+            new[entry.filename] = dict(prev, **record)
+            if not check and os.stat(entry.binary).st_mtime_ns > target.stat().st_mtime_ns:
+                os.utime(target)  # touched, not changed: keep the shell's -nt check passing
+                entry.status = 'refreshed'
+            continue
+        todo.append((entry, record))
+
+    if check:
+        for entry, _ in todo:
+            entry.status = 'stale'
+        return new
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        results = list(pool.map(lambda item: run_tool(item[0].args, timeout), todo))
+    for (entry, record), (output, detail) in zip(todo, results):
+        entry.detail = detail
+        if output is None:
+            entry.status = 'failed'
+            (cache_dir / entry.filename).unlink(missing_ok=True)
+            continue
+        atomic_write_chunks(cache_dir / entry.filename, [output])
+        entry.status = 'rendered'
+        record['rendered'] = hashlib.sha256(output.encode()).hexdigest()
+        new[entry.filename] = record
+    return new
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pre-render cached tool init code')
+    parser.add_argument('--base-dir', type=Path, default=ROOT,
+                        help='ZDOTDIR or chezmoi source directory (default: %(default)s)')
+    parser.add_argument('--cache-dir', type=Path, default=default_cache_dir(),
+                        help='Evalcache directory (default: %(default)s)')
+    parser.add_argument('-o', '--output', type=Path, default=default_index_path(),
+                        help='Index sourced by zf::init_output (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--timeout', type=float, default=20.0, help='Seconds per tool (default: %(default)s)')
+    parser.add_argument('--no-prune', action='store_true', help='Keep entries no call site uses')
+    parser.add_argument('--list', action='store_true', help='Only list the call sites found')
+    parser.add_argument('--check', action='store_true', help='Only report whether entries are stale')
+    parser.add_argument('-q', '--quiet', action='store_true')
+    args = parser.parse_args(argv)
+
+    entries, skipped = collect(args.base_dir)
+    if args.list:
+        for entry in entries.values():
+            print(f"{entry.key}\n    {entry.filename}\n    " + '\n    '.join(entry.sites))
+        for site in skipped:
+            print(f"⏭️  not cacheable: {site}")
+        return 0
+
+    index = refresh(entries, args.cache_dir, args.jobs, args.timeout, args.check)
+    stale = [p for p in args.cache_dir.glob('init-*.sh') if p.name not in index] \
+        if args.cache_dir.is_dir() and not args.no_prune else []
+    if args.check:
+        bad = [e for e in entries.values() if e.status == 'stale']
+        if not args.quiet:
+            for e in bad:
+                print(f"⚠️  Stale: {e.key}")
+            for p in stale:
+                print(f"⚠️  Unused: {p.name}")
+            if not bad and not stale:
+                print(f"✅ Current: {len(index)} entr{'y' if len(index) == 1 else 'ies'} in {args.cache_dir}")
+        return 1 if bad or stale else 0
+
+    for p in stale:
+        p.unlink()
+    if args.cache_dir.is_dir():
+        atomic_write_chunks(args.cache_dir / INDEX_NAME,
+                            [json.dumps({'version': VERSION, 'entries': index}, indent=2) + '\n'])
+    text = render_index(list(entries.values()), args.cache_dir)
+    try:
+        unchanged = args.output.read_text(encoding='utf-8') == text
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_chunks(args.output, [text])
+
+    failed = [e for e in entries.values() if e.status == 'failed']
+    if not args.quiet:
+        icons = {'current': '✅', 'refreshed': '✅', 'rendered': '📝', 'missing': '⏭️ ', 'failed': '❌'}
+        for e in entries.values():
+            detail = f"  ({e.detail})" if e.detail else ''
+            print(f"{icons[e.status]} {e.status:<9} {e.key}{detail}")
+        for p in stale:
+            print(f"🗑️  pruned    {p.name}")
+        print(f"{'📝 Wrote' if not unchanged else '✅ Unchanged'} {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,31 +11,8 @@ import re
 import sys
 from pathlib import Path
 
-# High-contrast color mappings
-COLOR_MAP = {
-    # Light colors → Dark colors with white text
-    r'fill:#e1f5ff(?!,)': 'fill:#0066cc,stroke:#fff,stroke-width:2px,color:#fff',
-    r'fill:#e1f5ff,stroke:#333,stroke-width:(\d+)px': r'fill:#0066cc,stroke:#fff,stroke-width:\1px,color:#fff',
-    r'fill:#fff3cd(?!,)': 'fill:#cc7a00,stroke:#000,stroke-width:2px,color:#fff',
-    r'fill:#fff3cd,stroke:#333,stroke-width:(\d+)px': r'fill:#cc7a00,stroke:#000,stroke-width:\1px,color:#fff',
-    r'fill:#d4edda(?!,)': 'fill:#006600,stroke:#fff,stroke-width:2px,color:#fff',
-    r'fill:#d4edda,stroke:#333,stroke-width:(\d+)px': r'fill:#006600,stroke:#fff,stroke-width:\1px,color:#fff',
-    r'fill:#cce5ff(?!,)': 'fill:#0080ff,stroke:#fff,stroke-width:2px,color:#fff',
-    r'fill:#cce5ff,stroke:#333,stroke-width:(\d+)px': r'fill:#0080ff,stroke:#fff,stroke-width:\1px,color:#fff',
-    r'fill:#f8d7da(?!,)': 'fill:#cc0066,stroke:#fff,stroke-width:2px,color:#fff',
-    r'fill:#f8d7da,stroke:#333,stroke-width:(\d+)px': r'fill:#cc0066,stroke:#fff,stroke-width:\1px,color:#fff',
-    r'fill:#e7f3ff(?!,)': 'fill:#6600cc,stroke:#fff,stroke-width:2px,color:#fff',
-    r'fill:#e7f3ff,stroke:#333,stroke-width:(\d+)px': r'fill:#6600cc,stroke:#fff,stroke-width:\1px,color:#fff',
-    r'fill:#ffeaa7(?!,)': 'fill:#cc6600,stroke:#000,stroke-width:2px,color:#fff',
-    r'fill:#ffeaa7,stroke:#333,stroke-width:(\d+)px': r'fill:#cc6600,stroke:#000,stroke-width:\1px,color:#fff',
-    r'fill:#d1ecf1(?!,)': 'fill:#0099cc,stroke:#fff,stroke-width:2px,color:#fff',
-    r'fill:#d1ecf1,stroke:#333': 'fill:#0099cc,stroke:#fff,stroke-width:2px,color:#fff',
-    r'fill:#d1f2eb(?!,)': 'fill:#008066,stroke:#fff,stroke-width:2px,color:#fff',
-    r'fill:#d1f2eb,stroke:#333': 'fill:#008066,stroke:#fff,stroke-width:2px,color:#fff',
-    r'fill:#d1f2eb,stroke:#333,stroke-width:(\d+)px': r'fill:#008066,stroke:#fff,stroke-width:\1px,color:#fff',
-    r'fill:#ffd6e0(?!,)': 'fill:#cc0066,stroke:#fff,stroke-width:2px,color:#fff',
-    r'fill:#ffd6e0,stroke:#333,stroke-width:(\d+)px': r'fill:#cc0066,stroke:#fff,stroke-width:\1px,color:#fff',
-}
+from backup_journal import Journal
+from mermaid_colors import recolor_mermaid
 
 # Folder link fixes
 FOLDER_LINKS = {
@@ -44,10 +21,8 @@ FOLDER_LINKS = {
 }
 
 def fix_mermaid_colors(content):
-    """Replace light colors with high-contrast colors in Mermaid diagrams"""
-    for old_pattern, new_value in COLOR_MAP.items():
-        content = re.sub(old_pattern, new_value, content)
-    return content
+    """Recolor light fills inside ```mermaid blocks; return (content, report)"""
+    return recolor_mermaid(content)
 
 def fix_folder_links(content):
     """Fix folder links to point to 000-index.md"""
@@ -129,7 +104,7 @@ def fix_heading_numbering(content, filepath):
 
     return '\n'.join(new_lines)
 
-def process_file(filepath):
+def process_file(filepath, run):
     """Process a single markdown file"""
     with open(filepath, 'r', encoding='utf-8') as f:
         content = f.read()
@@ -137,7 +112,7 @@ def process_file(filepath):
     original_content = content
 
     # Fix Mermaid colors
-    content = fix_mermaid_colors(content)
+    content, recolored = fix_mermaid_colors(content)
 
     # Fix folder links
     content = fix_folder_links(content)
@@ -147,11 +122,10 @@ def process_file(filepath):
 
     # Check if file was modified
     if content != original_content:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-        return True
+        run.write_text(filepath, content)
+        return True, recolored
 
-    return False
+    return False, recolored
 
 def main():
     docs_dir = Path(__file__).parent.parent / 'docs' / '010-zsh-configuration'
@@ -174,18 +148,24 @@ def main():
     print(f"📄 Processing {total_files} markdown files...")
     print()
 
-    for md_file in sorted(md_files):
-        relative_path = md_file.relative_to(docs_dir)
+    with Journal().start_run('fix-docs') as run:
+        for md_file in sorted(md_files):
+            relative_path = md_file.relative_to(docs_dir)
 
-        if process_file(md_file):
-            files_modified += 1
-            print(f"  ✅ Fixed: {relative_path}")
+            modified, recolored = process_file(md_file, run)
+            if modified:
+                files_modified += 1
+                print(f"  ✅ Fixed: {relative_path}")
+                for r in recolored:
+                    print(f"     🎨 line {r.line}: {r.node or '(inline)'} {r.old} → {r.new}")
 
     print()
     print("✅ Batch Processing Complete")
     print("=" * 50)
     print(f"Total files: {total_files}")
     print(f"Files modified: {files_modified}")
+    if run.entries:
+        print(f"Rollback: python3 bin/backup_journal.py rollback {run.run_id}")
     print()
     print("✨ Fixed:")
     print("   ✅ Mermaid diagram high-contrast colors")
@@ -9,12 +9,23 @@ Standard format:
 # Phase:    Which phase (.zshrc.d/, .zshrc.pre-plugins.d/, etc.)
 # Requires: Dependencies (optional)
 # Toggles:  Environment variables (optional)
+
+The extracted metadata is also written to a module manifest (see
+zsh_manifest.py; default $ZSH_CACHE_DIR/module-manifest.json) with path,
+phase, requirements, toggles, size, line count and content hash for every
+fragment, refreshed incrementally by mtime and hash.
+
+Usage:
+    python3 bin/standardize-headers.py [--manifest PATH] [--manifest-only]
 """
 
+import argparse
 import os
 import re
 from pathlib import Path
 
+from zsh_manifest import default_manifest_path, resolve_layer, update_manifest
+
 # Phase mappings based on directory
 PHASE_MAP = {
     '.zshrc.add-plugins.d.00': 'Plugin activation (.zshrc.add-plugins.d/)',
@@ -92,7 +103,7 @@ def extract_toggles(lines):
         return ', '.join(sorted(set(toggles)))
     return None
 
-def standardize_header(filepath):
+def standardize_header(filepath, layer=None):
     """Standardize header for a single file."""
     with open(filepath, 'r') as f:
         lines = f.readlines()
@@ -101,7 +112,7 @@ def standardize_header(filepath):
     filename = os.path.basename(filepath)
 
     # Determine phase
-    parent_dir = os.path.basename(os.path.dirname(filepath))
+    parent_dir = layer or os.path.basename(os.path.dirname(filepath))
     phase = PHASE_MAP.get(parent_dir, 'Configuration')
 
     # Extract metadata
@@ -142,27 +153,41 @@ def standardize_header(filepath):
 
     return filename, purpose
 
+LAYERS = [
+    '.zshrc.add-plugins.d.00',
+    '.zshrc.pre-plugins.d.01',
+    '.zshrc.d.01',
+]
+
 def main():
     """Standardize headers in all ZSH config files."""
-    base_dir = Path.cwd()
+    parser = argparse.ArgumentParser(description='Standardize zsh fragment headers and refresh the module manifest')
+    parser.add_argument('--manifest', type=Path, default=default_manifest_path(),
+                        help='Manifest path (default: %(default)s)')
+    parser.add_argument('--manifest-only', action='store_true',
+                        help='Only refresh the manifest; leave headers untouched')
+    args = parser.parse_args()
 
-    directories = [
-        base_dir / '.zshrc.add-plugins.d.00',
-        base_dir / '.zshrc.pre-plugins.d.01',
-        base_dir / '.zshrc.d.01',
-    ]
+    base_dir = Path.cwd()
 
     updated = []
-    for directory in directories:
-        if not directory.exists():
+    for layer in LAYERS:
+        directory = resolve_layer(base_dir, layer)
+        if args.manifest_only or directory is None:
             continue
 
+        # PHASE_MAP is keyed by target directory name
         for filepath in sorted(directory.glob('*.zsh')):
-            filename, purpose = standardize_header(filepath)
+            filename, purpose = standardize_header(filepath, layer)
             updated.append((str(filepath.relative_to(base_dir)), purpose))
             print(f"✓ {filepath.relative_to(base_dir)}")
 
-    print(f"\n✅ Standardized {len(updated)} files")
+    if not args.manifest_only:
+        print(f"\n✅ Standardized {len(updated)} files")
+
+    manifest, stats = update_manifest(base_dir, LAYERS, args.manifest)
+    print(f"📇 Manifest: {args.manifest} ({len(manifest['fragments'])} fragments; "
+          f"{stats['parsed']} parsed, {stats['rehashed']} rehashed, {stats['reused']} unchanged)")
     return updated
 
 if __name__ == '__main__':
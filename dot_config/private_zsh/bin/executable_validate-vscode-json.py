@@ -2,130 +2,256 @@
 """
 VSCode Settings JSON Validator and Fixer
 Helps identify and fix JSON syntax errors in VSCode settings
+
+Settings files are JSONC: comments and trailing commas are allowed, so
+they are read with the jsonc tokenizer rather than plain json.loads.
+Errors are reported at their exact line and column. Fixes (removing
+trailing commas, inserting missing commas) are applied to the original
+text, so comments and formatting are preserved, and the original is
+recorded in the backup journal.
+
+Batch mode (--all, or several FILES) validates every JSON/JSONC file in
+the config tree in parallel: metrics, badges, manifests, registries and
+the .vscode/.cursor editor settings. Each file must parse, and files
+matching a pattern in json_schemas.py must also fit that schema. Only
+editor settings and *.jsonc files may use comments or trailing commas;
+everything else is read by jq and the perf scripts, so it must be strict
+JSON. Results are cached by content hash and schema fingerprint, so an
+unchanged tree is re-checked without parsing anything.
+
+Usage:
+    python3 bin/validate-vscode-json.py [FILE] [--fix | --check]
+    python3 bin/validate-vscode-json.py --all [--root DIR] [--jobs N] [--no-cache]
+    python3 bin/validate-vscode-json.py FILE FILE ...
+
+    FILE defaults to the VSCode Insiders user settings.
+
+Exit codes:
+    0 - valid JSONC (trailing commas are reported as warnings)
+    1 - invalid, and not fixed (batch: any file failed)
 """
 
+import argparse
+import hashlib
 import json
+import os
 import sys
-import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-def find_json_error(content):
-    """Try to find where the JSON error is"""
-    lines = content.split('\n')
-    
-    # Common issues
-    issues = []
-    
-    for i, line in enumerate(lines, 1):
-        # Trailing commas before closing braces/brackets
-        if re.search(r',\s*[}\]]', line):
-            issues.append(f"Line {i}: Trailing comma before closing brace/bracket")
-        
-        # Missing commas between properties
-        if i < len(lines):
-            current = line.strip()
-            next_line = lines[i].strip() if i < len(lines) else ""
-            if (current.endswith('}') or current.endswith(']')) and \
-               (next_line.startswith('"') and not current.endswith(',')):
-                issues.append(f"Line {i}: Possible missing comma after closing brace/bracket")
-    
-    return issues
-
-def try_fix_common_issues(content):
-    """Attempt to fix common JSON issues"""
-    # Remove trailing commas before closing braces/brackets
-    content = re.sub(r',(\s*[}\]])', r'\1', content)
-    
-    # Remove comments (VSCode allows them, but standard JSON doesn't)
-    content = re.sub(r'//.*$', '', content, flags=re.MULTILINE)
-    content = re.sub(r'/\*.*?\*/', '', content, flags=re.DOTALL)
-    
-    return content
-
-def main():
-    if len(sys.argv) < 2:
-        settings_file = Path.home() / "Library/Application Support/Code - Insiders/User/settings.json"
+from backup_journal import Journal, atomic_write_chunks
+from json_schemas import compiled, deployed_path, schema_for, schema_key
+from jsonc import JSONCError, fix, line_col, loads
+from zsh_manifest import default_manifest_path
+
+DEFAULT_SETTINGS = Path.home() / "Library/Application Support/Code - Insiders/User/settings.json"
+
+JSON_SUFFIXES = ('.json', '.jsonc')
+SKIP_DIRS = {'.git', 'node_modules', '__pycache__', '.cache'}
+JSONC_DIRS = {'.vscode', '.cursor'}
+CACHE_VERSION = 1
+
+
+def find_json_files(root: Path):
+    """Every JSON/JSONC file under ``root``, skipping VCS and dependency dirs."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        found.extend(Path(dirpath) / f for f in sorted(filenames) if f.endswith(JSON_SUFFIXES))
+    return found
+
+
+def allows_comments(rel: str) -> bool:
+    target = deployed_path(rel)
+    return target.suffix == '.jsonc' or any(part in JSONC_DIRS for part in target.parts)
+
+
+def check_text(rel: str, text: str, schema_name):
+    """Problems in one file, as 'line:col: message' or '$.path: message'."""
+    try:
+        data, scan = loads(text)
+    except JSONCError as e:
+        return [f'{e.lineno}:{e.colno}: {e.msg}']
+    problems = []
+    if not allows_comments(rel):
+        for pos, what in sorted([(start, 'comment') for start, _ in scan.comments] +
+                                [(pos, 'trailing comma') for pos in scan.trailing_commas]):
+            lineno, colno = line_col(text, pos)
+            problems.append(f'{lineno}:{colno}: {what} not allowed in strict JSON')
+    if schema_name:
+        problems.extend(compiled(schema_name)(data))
+    return problems
+
+
+def default_cache_path() -> Path:
+    return default_manifest_path().with_name('json-validate-cache.json')
+
+
+def load_cache(path: Path) -> dict:
+    try:
+        cache = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+    return cache.get('results', {}) if cache.get('version') == CACHE_VERSION else {}
+
+
+def display_path(path: Path, root: Path) -> str:
+    """``path`` relative to ``root`` when inside it (schema patterns rely on that)."""
+    try:
+        return path.resolve().relative_to(root.resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def run_batch(files, root: Path, jobs: int, cache_path, prune: bool) -> int:
+    started = time.perf_counter()
+    cache = load_cache(cache_path) if cache_path else {}
+    results = {}
+    keys = {}
+    pending = []
+    for path in files:
+        rel = display_path(path, root)
+        try:
+            raw = path.read_bytes()
+        except OSError as e:
+            results[rel] = [f'unreadable: {e}']
+            continue
+        schema_name = schema_for(rel)
+        key = f'{hashlib.sha256(raw).hexdigest()}:{schema_key(schema_name)}:{int(allows_comments(rel))}'
+        keys[rel] = key
+        if key in cache:
+            results[rel] = cache[key]
+        else:
+            pending.append((rel, raw.decode('utf-8', errors='replace'), schema_name))
+
+    if jobs > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            outcomes = list(pool.map(check_text, *zip(*pending), chunksize=8))
     else:
-        settings_file = Path(sys.argv[1])
-    
+        outcomes = [check_text(*item) for item in pending]
+    for (rel, _, _), problems in zip(pending, outcomes):
+        results[rel] = problems
+
+    if cache_path:
+        # A full walk drops entries for content no longer in the tree; a
+        # partial run only adds to the cache
+        fresh = {} if prune else dict(cache)
+        fresh.update((keys[rel], results[rel]) for rel in keys)
+        if fresh != cache:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_chunks(cache_path, [json.dumps({'version': CACHE_VERSION, 'results': fresh}, indent=1)])
+
+    failed = {rel: problems for rel, problems in results.items() if problems}
+    for rel in sorted(failed):
+        name = schema_for(rel)
+        print(f"❌ {rel}" + (f" [{name}]" if name else ''))
+        for problem in failed[rel][:10]:
+            print(f"   • {problem}")
+        if len(failed[rel]) > 10:
+            print(f"   … {len(failed[rel]) - 10} more")
+    elapsed = (time.perf_counter() - started) * 1000
+    cached = len(results) - len(pending)
+    icon = '❌' if failed else '✅'
+    print(f"{icon} {len(results) - len(failed)}/{len(results)} JSON files valid "
+          f"({cached} cached, {len(pending)} checked, {elapsed:.0f} ms)")
+    return 1 if failed else 0
+
+
+def show_context(lines, lineno, colno):
+    """Print the lines around an error with a caret under its column."""
+    print("Problematic line:")
+    for n in range(max(1, lineno - 1), min(len(lines), lineno + 1) + 1):
+        print(f"  {n:>5}: {lines[n - 1]}")
+        if n == lineno:
+            print(f"         {' ' * (colno - 1)}^")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Validate and fix VSCode settings JSON')
+    parser.add_argument('files', nargs='*', type=Path, help='file(s) to validate')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--fix', action='store_true', help='save an automatic fix without asking')
+    mode.add_argument('--check', action='store_true', help='only validate, never offer a fix')
+    mode.add_argument('--all', action='store_true', help='validate every JSON file under --root')
+    parser.add_argument('--root', type=Path, default=Path(__file__).resolve().parent.parent,
+                        help='config tree for --all (default: the one holding this script)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--no-cache', action='store_true', help='re-check every file')
+    args = parser.parse_args(argv)
+
+    if args.all or len(args.files) > 1:
+        files = find_json_files(args.root) if args.all else args.files
+        return run_batch(files, args.root, args.jobs, None if args.no_cache else default_cache_path(),
+                         prune=args.all)
+
+    settings_file = args.files[0] if args.files else DEFAULT_SETTINGS
+
     if not settings_file.exists():
         print(f"❌ File not found: {settings_file}")
-        sys.exit(1)
-    
+        return 1
+
     print(f"📄 Validating: {settings_file}")
     print()
-    
-    # Read the file
+
     content = settings_file.read_text()
-    
-    # Try to parse as-is
+
     try:
-        data = json.loads(content)
+        data, scan = loads(content)
         print("✅ JSON is valid!")
-        print(f"   Found {len(data)} top-level settings")
-        sys.exit(0)
-    except json.JSONDecodeError as e:
+        if isinstance(data, dict):
+            print(f"   Found {len(data)} top-level settings")
+        if scan.comments:
+            print(f"   {len(scan.comments)} comments")
+        for pos in scan.trailing_commas:
+            lineno, colno = line_col(content, pos)
+            print(f"   ⚠️  Line {lineno}, Column {colno}: trailing comma")
+        return 0
+    except JSONCError as e:
         print(f"❌ JSON Error: {e.msg}")
         print(f"   Line {e.lineno}, Column {e.colno}")
         print()
-        
-        # Show the problematic line
-        lines = content.split('\n')
-        if e.lineno <= len(lines):
-            print("Problematic line:")
-            print(f"  {e.lineno}: {lines[e.lineno - 1]}")
-            if e.lineno > 1:
-                print(f"  {e.lineno - 1}: {lines[e.lineno - 2]}")
-            if e.lineno < len(lines):
-                print(f"  {e.lineno + 1}: {lines[e.lineno]}")
-        print()
-    
-    # Find common issues
-    issues = find_json_error(content)
-    if issues:
-        print("🔍 Potential issues found:")
-        for issue in issues:
-            print(f"   • {issue}")
+        show_context(content.split('\n'), e.lineno, e.colno)
         print()
-    
-    # Try to fix
+
+    if args.check:
+        return 1
+
     print("🔧 Attempting automatic fix...")
-    fixed_content = try_fix_common_issues(content)
-    
     try:
-        data = json.loads(fixed_content)
-        print("✅ Auto-fix successful!")
-        print()
-        
-        # Ask to save
-        response = input("Save fixed version? (y/N): ").strip().lower()
-        if response == 'y':
-            # Backup original
-            backup_file = settings_file.with_suffix('.json.broken')
-            settings_file.rename(backup_file)
-            print(f"   Backed up broken file to: {backup_file}")
-            
-            # Write fixed version
-            settings_file.write_text(json.dumps(data, indent=2) + '\n')
-            print(f"   ✅ Saved fixed version to: {settings_file}")
-        else:
-            print("   Skipped saving")
-    except json.JSONDecodeError as e:
-        print(f"❌ Auto-fix failed: {e.msg}")
+        fixed_content, edits = fix(content)
+    except JSONCError as e:
+        print(f"❌ Auto-fix failed: {e.msg} (line {e.lineno}, column {e.colno})")
         print()
         print("Manual fix required. Common issues:")
-        print("  • Trailing commas before } or ]")
-        print("  • Missing commas between properties")
-        print("  • Unescaped quotes in strings")
-        print("  • Comments (use // or /* */ - VSCode allows them but they break standard JSON parsers)")
+        print("  • Unescaped quotes or raw newlines in strings")
+        print("  • Unterminated /* comments */")
+        print("  • Missing values, colons or closing braces")
         print()
         print("Recommendation:")
         print("  1. Open the file in VSCode")
         print("  2. VSCode will highlight the syntax error")
         print("  3. Fix the error manually")
         print("  4. Run this script again to verify")
-        sys.exit(1)
+        return 1
 
-if __name__ == '__main__':
-    main()
+    print("✅ Auto-fix successful!")
+    for edit in edits:
+        print(f"   • Line {edit.line}, Column {edit.col}: {edit.action}")
+    print()
 
+    if not args.fix:
+        response = input("Save fixed version? (y/N): ").strip().lower()
+        if response != 'y':
+            print("   Skipped saving")
+            return 1
+
+    with Journal().start_run('validate-vscode-json') as run:
+        run.write_text(settings_file, fixed_content)
+    print(f"   ✅ Saved fixed version to: {settings_file} (comments preserved)")
+    print(f"   Undo with: python3 bin/backup_journal.py rollback {run.run_id}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
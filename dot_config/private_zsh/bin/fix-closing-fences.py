@@ -9,35 +9,18 @@ import re
 import sys
 from pathlib import Path
 
+from backup_journal import Journal
+from md_lint import fix_text
+
 def fix_code_fences(content):
     """
-    Fix code fences:
+    Fix code fences (md_lint rule ZF001):
     - Remove tags from closing fences
     - Move all fences to column 1
     """
-    lines = content.split('\n')
-    new_lines = []
-    in_code_block = False
-
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-
-        # Check if this is a code fence
-        if stripped.startswith('```'):
-            if not in_code_block:
-                # Opening fence - keep tag, but move to column 1
-                new_lines.append(stripped)
-                in_code_block = True
-            else:
-                # Closing fence - remove any tag and move to column 1
-                new_lines.append('```')
-                in_code_block = False
-        else:
-            new_lines.append(line)
-
-    return '\n'.join(new_lines)
-
-def process_file(filepath):
+    return fix_text(content, ['ZF001'])
+
+def process_file(filepath, run):
     """Process a single markdown file"""
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -50,8 +33,7 @@ def process_file(filepath):
 
         # Check if modified
         if content != original_content:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
+            run.write_text(filepath, content)
             return True
 
         return False
@@ -81,18 +63,21 @@ def main():
     print(f"📄 Processing {total_files} markdown files...")
     print()
 
-    for md_file in sorted(md_files):
-        relative_path = md_file.relative_to(docs_dir)
+    with Journal().start_run('fix-closing-fences') as run:
+        for md_file in sorted(md_files):
+            relative_path = md_file.relative_to(docs_dir)
 
-        if process_file(md_file):
-            files_modified += 1
-            print(f"  ✅ Fixed: {relative_path}")
+            if process_file(md_file, run):
+                files_modified += 1
+                print(f"  ✅ Fixed: {relative_path}")
 
     print()
     print("✅ Code Fence Fixes Complete")
     print("=" * 60)
     print(f"Total files: {total_files}")
     print(f"Files modified: {files_modified}")
+    if run.entries:
+        print(f"Rollback: python3 bin/backup_journal.py rollback {run.run_id}")
     print()
     print("✨ Fixed:")
     print("   ✅ Removed language tags from closing code fences")
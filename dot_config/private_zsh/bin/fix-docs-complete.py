@@ -14,28 +14,9 @@ import re
 import sys
 from pathlib import Path
 
-# High-contrast color mappings (comprehensive)
-COLOR_FIXES = [
-    # Any remaining light colors without proper styling
-    (r'style\s+(\w+)\s+fill:#e1f5ff,stroke:#333,stroke-width:(\d+)px', r'style \1 fill:#0066cc,stroke:#fff,stroke-width:\2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#e1f5ff,stroke:#333$', r'style \1 fill:#0066cc,stroke:#fff,stroke-width:2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#fff3cd,stroke:#333,stroke-width:(\d+)px', r'style \1 fill:#cc7a00,stroke:#000,stroke-width:\2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#fff3cd,stroke:#333$', r'style \1 fill:#cc7a00,stroke:#000,stroke-width:2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#d4edda,stroke:#333,stroke-width:(\d+)px', r'style \1 fill:#006600,stroke:#fff,stroke-width:\2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#d4edda,stroke:#333$', r'style \1 fill:#006600,stroke:#fff,stroke-width:2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#cce5ff,stroke:#333,stroke-width:(\d+)px', r'style \1 fill:#0080ff,stroke:#fff,stroke-width:\2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#cce5ff,stroke:#333$', r'style \1 fill:#0080ff,stroke:#fff,stroke-width:2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#f8d7da,stroke:#333,stroke-width:(\d+)px', r'style \1 fill:#cc0066,stroke:#fff,stroke-width:\2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#f8d7da,stroke:#333$', r'style \1 fill:#cc0066,stroke:#fff,stroke-width:2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#e7f3ff,stroke:#333,stroke-width:(\d+)px', r'style \1 fill:#6600cc,stroke:#fff,stroke-width:\2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#e7f3ff,stroke:#333$', r'style \1 fill:#6600cc,stroke:#fff,stroke-width:2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#ffeaa7,stroke:#333,stroke-width:(\d+)px', r'style \1 fill:#cc6600,stroke:#000,stroke-width:\2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#ffeaa7,stroke:#333$', r'style \1 fill:#cc6600,stroke:#000,stroke-width:2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#d1ecf1,stroke:#333$', r'style \1 fill:#0099cc,stroke:#fff,stroke-width:2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#d1f2eb,stroke:#333,stroke-width:(\d+)px', r'style \1 fill:#008066,stroke:#fff,stroke-width:\2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#d1f2eb,stroke:#333$', r'style \1 fill:#008066,stroke:#fff,stroke-width:2px,color:#fff'),
-    (r'style\s+(\w+)\s+fill:#ffd6e0,stroke:#333,stroke-width:(\d+)px', r'style \1 fill:#cc0066,stroke:#fff,stroke-width:\2px,color:#fff'),
-]
+from backup_journal import Journal
+from md_lint import fix_text
+from mermaid_colors import recolor_mermaid
 
 def fix_title_anchors(content):
     """Remove HTML anchors from title (H1), keep just markdown"""
@@ -53,36 +34,12 @@ def fix_zsh_commands(content):
     return content
 
 def fix_code_fences(content):
-    """Add language tags to code fences without them"""
-    lines = content.split('\n')
-    new_lines = []
-
-    for i, line in enumerate(lines):
-        # Find code fences without language
-        if line.strip() == '```':
-            # Check if previous line suggests language
-            prev_line = lines[i-1] if i > 0 else ''
-
-            # Determine language from context
-            lang = 'text'
-            if 'bash' in prev_line.lower() or 'shell' in prev_line.lower() or 'command' in prev_line.lower():
-                lang = 'bash'
-            elif 'output' in prev_line.lower() or 'result' in prev_line.lower():
-                lang = 'text'
-            elif 'log' in prev_line.lower():
-                lang = 'log'
-
-            new_lines.append(f'```{lang}')
-        else:
-            new_lines.append(line)
-
-    return '\n'.join(new_lines)
+    """Add language tags to opening code fences without them (MD040)"""
+    return fix_text(content, ['MD040'])
 
 def fix_mermaid_colors(content):
-    """Fix all remaining Mermaid diagram colors"""
-    for pattern, replacement in COLOR_FIXES:
-        content = re.sub(pattern, replacement, content)
-    return content
+    """Recolor light fills inside ```mermaid blocks; return (content, report)"""
+    return recolor_mermaid(content)
 
 def fix_absolute_links(content):
     """Add file:// prefix to absolute paths"""
@@ -151,44 +108,10 @@ def fix_toc_collapsible(content):
     return '\n'.join(new_lines)
 
 def fix_markdown_spacing(content):
-    """Fix spacing around headings, lists, code fences (MD rules)"""
-    lines = content.split('\n')
-    new_lines = []
-
-    for i, line in enumerate(lines):
-        prev_line = lines[i-1] if i > 0 else ''
-        next_line = lines[i+1] if i < len(lines)-1 else ''
-
-        # Add blank line before heading (except first line or after blank)
-        if line.startswith('#') and i > 0 and prev_line.strip() != '':
-            if not prev_line.startswith('#'):
-                new_lines.append('')
-
-        # Add blank line before list (if previous line has content)
-        if line.startswith(('-', '*', '1.')) and prev_line.strip() != '' and not prev_line.startswith(('-', '*', '#')):
-            if '```' not in prev_line:
-                new_lines.append('')
-
-        # Add blank line before code fence
-        if line.strip().startswith('```') and prev_line.strip() != '':
-            if not prev_line.strip().startswith('```'):
-                new_lines.append('')
-
-        new_lines.append(line)
-
-        # Add blank line after heading
-        if line.startswith('#') and next_line.strip() != '' and not next_line.startswith('#'):
-            if not next_line.strip().startswith(('---', '<')):
-                new_lines.append('')
-
-        # Add blank line after code fence closing
-        if line.strip() == '```' and next_line.strip() != '' and not next_line.startswith('#'):
-            if '```' not in next_line and not next_line.strip().startswith(('---', '<')):
-                new_lines.append('')
-
-    return '\n'.join(new_lines)
+    """Fix spacing around headings, lists, code fences (MD022, MD031, MD032)"""
+    return fix_text(content, ['MD022', 'MD031', 'MD032'])
 
-def process_file(filepath):
+def process_file(filepath, run):
     """Process a single markdown file"""
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -200,22 +123,21 @@ def process_file(filepath):
         content = fix_title_anchors(content)
         content = fix_zsh_commands(content)
         content = fix_code_fences(content)
-        content = fix_mermaid_colors(content)
+        content, recolored = fix_mermaid_colors(content)
         content = fix_absolute_links(content)
         content = fix_toc_collapsible(content)
         content = fix_markdown_spacing(content)
 
         # Check if modified
         if content != original_content:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            return True
+            run.write_text(filepath, content)
+            return True, recolored
 
-        return False
+        return False, recolored
 
     except Exception as e:
         print(f"  ⚠️  Error processing {filepath.name}: {e}")
-        return False
+        return False, []
 
 def main():
     docs_dir = Path(__file__).parent.parent / 'docs' / '010-zsh-configuration'
@@ -238,18 +160,24 @@ def main():
     print(f"📄 Processing {total_files} markdown files...")
     print()
 
-    for md_file in sorted(md_files):
-        relative_path = md_file.relative_to(docs_dir)
+    with Journal().start_run('fix-docs-complete') as run:
+        for md_file in sorted(md_files):
+            relative_path = md_file.relative_to(docs_dir)
 
-        if process_file(md_file):
-            files_modified += 1
-            print(f"  ✅ Fixed: {relative_path}")
+            modified, recolored = process_file(md_file, run)
+            if modified:
+                files_modified += 1
+                print(f"  ✅ Fixed: {relative_path}")
+                for r in recolored:
+                    print(f"     🎨 line {r.line}: {r.node or '(inline)'} {r.old} → {r.new}")
 
     print()
     print("✅ Complete Fixes Applied")
     print("=" * 60)
     print(f"Total files: {total_files}")
     print(f"Files modified: {files_modified}")
+    if run.entries:
+        print(f"Rollback: python3 bin/backup_journal.py rollback {run.run_id}")
     print()
     print("✨ Fixes Applied:")
     print("   ✅ Removed HTML anchors from titles")
@@ -2,12 +2,22 @@
 """
 Update TOCs to match numbered headings
 Extracts actual headings from document and regenerates TOC
+
+Usage:
+    python3 bin/fix-tocs.py [--stream]
+
+--stream scans each file through mmap in two passes (headings, then TOC
+rewrite) and writes the result incrementally instead of loading it whole.
 """
 
+import argparse
 import re
 import sys
 from pathlib import Path
 
+from backup_journal import Journal
+from md_stream import iter_lines, write_lines
+
 def generate_anchor(heading_text):
     """Generate GitHub-compatible anchor from heading text"""
     # Remove markdown formatting, emoji, numbers
@@ -28,9 +38,9 @@ def generate_anchor(heading_text):
     return anchor
 
 def extract_headings(content):
-    """Extract all H2 and H3 headings from content"""
+    """Extract all H2 and H3 headings from content (a string or line iterable)"""
     headings = []
-    lines = content.split('\n')
+    lines = content.split('\n') if isinstance(content, str) else content
 
     in_toc = False
     past_toc = False
@@ -99,33 +109,21 @@ def generate_toc(headings):
 
     return toc_lines
 
-def update_toc(content):
-    """Replace TOC content with regenerated version"""
-    headings = extract_headings(content)
-
-    if not headings:
-        return content  # No headings found, skip
-
-    toc_content = generate_toc(headings)
-
-    # Find TOC section and replace content
-    lines = content.split('\n')
-    new_lines = []
+def rewrite_toc(lines, toc_content):
+    """Yield ``lines`` with every TOC section replaced by ``toc_content``"""
     in_toc = False
-    toc_replaced = False
 
-    for i, line in enumerate(lines):
+    for line in lines:
         if re.match(r'^## (📋 )?Table of Contents', line):
             in_toc = True
-            new_lines.append(line)
-            new_lines.append('')
-            new_lines.append('<details>')
-            new_lines.append('<summary>Expand Table of Contents</summary>')
-            new_lines.append('')
-            new_lines.extend(toc_content)
-            new_lines.append('')
-            new_lines.append('</details>')
-            toc_replaced = True
+            yield line
+            yield ''
+            yield '<details>'
+            yield '<summary>Expand Table of Contents</summary>'
+            yield ''
+            yield from toc_content
+            yield ''
+            yield '</details>'
             continue
 
         if in_toc:
@@ -133,13 +131,26 @@ def update_toc(content):
                 in_toc = False
             continue
 
-        new_lines.append(line)
+        yield line
+
+def update_toc(content):
+    """Replace TOC content with regenerated version"""
+    headings = extract_headings(content)
+
+    if not headings:
+        return content  # No headings found, skip
 
-    return '\n'.join(new_lines)
+    return '\n'.join(rewrite_toc(content.split('\n'), generate_toc(headings)))
 
-def process_file(filepath):
+def process_file(filepath, run, stream=False):
     """Process a single markdown file"""
     try:
+        if stream:
+            headings = extract_headings(iter_lines(filepath))
+            if not headings:
+                return False
+            return write_lines(filepath, rewrite_toc(iter_lines(filepath), generate_toc(headings)), run)
+
         with open(filepath, 'r', encoding='utf-8') as f:
             content = f.read()
 
@@ -150,8 +161,7 @@ def process_file(filepath):
 
         # Check if file was modified
         if content != original_content:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
+            run.write_text(filepath, content)
             return True
 
         return False
@@ -160,6 +170,11 @@ def process_file(filepath):
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description='Update TOCs to match numbered headings')
+    parser.add_argument('--stream', action='store_true',
+                        help='Bounded-memory mode: scan via mmap and write output incrementally')
+    args = parser.parse_args()
+
     docs_dir = Path(__file__).parent.parent / 'docs' / '010-zsh-configuration'
 
     if not docs_dir.exists():
@@ -182,16 +197,19 @@ def main():
     print(f"📄 Processing {total_files} markdown files...")
     print()
 
-    for md_file in sorted(md_files):
-        if process_file(md_file):
-            files_modified += 1
-            print(f"  ✅ Updated TOC: {md_file.name}")
+    with Journal().start_run('fix-tocs') as run:
+        for md_file in sorted(md_files):
+            if process_file(md_file, run, args.stream):
+                files_modified += 1
+                print(f"  ✅ Updated TOC: {md_file.name}")
 
     print()
     print("✅ TOC Update Complete")
     print("=" * 50)
     print(f"Total files: {total_files}")
     print(f"TOCs updated: {files_modified}")
+    if run.entries:
+        print(f"Rollback: python3 bin/backup_journal.py rollback {run.run_id}")
     print()
 
 if __name__ == '__main__':
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Inventory of the processes shell startup forks, per fragment and line.
+
+dot_ARCHIVE/docs/redesign/metrics/postplugin-external-commands-baseline.json
+holds one hand-made count of external commands. This produces the same
+number from an xtrace of a real startup, broken down to file and line,
+and compares it with a stored baseline so that a change adding a fork
+shows up in review with where it came from.
+
+The trace (PS4='+%D{%s.%6.}|%N:%i> ', see xtrace_profile.py) is either
+captured by running `zsh -x -i -c exit`, or read from --trace. Four
+kinds of fork site are counted:
+
+- exec      a traced command whose command word is not a builtin,
+            reserved word or function (commands inside $(...) are
+            traced too, so they are counted here)
+- subst     `$(...)`, backticks and `<(...)` on an executed line
+            (`$(<file)` does not fork)
+- subshell  a `( ... )` stage on an executed line
+- pipe      every pipeline stage but the last
+
+exec comes straight from the trace. The other three are not visible in
+it, so each executed line of a sourced file is looked up in the file
+(zsh_blocks.scan) and its forks counted once per time the line was
+entered. A single-line loop is entered once, so its forks are counted
+once; function bodies are only covered through their execs.
+
+The kinds overlap: `x=$(uname)` is a subst and an exec, `ls | wc -l` a
+pipe and two execs, though zsh runs the first with one process and the
+second with two. So each kind is reported on its own and never summed;
+exec is the number to watch, the others say where forks can be saved.
+
+Everything is charged to the innermost sourced file on the stack at the
+line it was executing, so an external command run by a plugin function
+is charged to the fragment line that called the function. Files are
+named relative to ZDOTDIR (else with ~ for $HOME), so the baseline is
+portable.
+
+Sites are compared with the baseline by (file, kind, command), not by
+line, so edits above a fork do not report it as new. A legacy baseline
+with only `estimated_external_commands` is compared by that total.
+
+Usage:
+    python3 bin/fork_inventory.py [--trace FILE | --keep-trace] [--zdotdir DIR]
+                                  [--baseline FILE] [--update-baseline] [--top N]
+                                  [--format text|json]
+
+    Without --trace, zsh is run once with xtrace on; capture with warm
+    caches, since a cold cache takes different paths. That trace goes to
+    a temporary file, deleted once it is read unless --keep-trace is given.
+
+    The baseline is machine-made: create it with --update-baseline on a
+    machine with zsh and commit it. Until then every run exits 3.
+
+Exit codes:
+    0 - no forks beyond the baseline (or the baseline was written)
+    1 - new forks compared with the baseline
+    2 - zsh could not be run, or the trace has no timestamped lines
+    3 - no baseline to compare with (create one with --update-baseline)
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from backup_journal import atomic_write_chunks
+from startup_cost import _short, command_word, is_external
+from xtrace_profile import READ_BUFFER, iter_events
+from zsh_blocks import scan
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = ROOT / 'docs/r-and-d/redesignv2/artifacts/metrics/fork-inventory-baseline.json'
+PS4 = '+%D{%s.%6.}|%N:%i> '
+KINDS = ('exec', 'subst', 'subshell', 'pipe')
+
+# (file label, line, kind, command) -> count
+Site = Tuple[str, int, str, str]
+
+
+class Inventory:
+    """Counts forks from a stream of trace events."""
+
+    def __init__(self, zdotdir: Path):
+        self.zdotdir = zdotdir.resolve()
+        self.home = Path.home()
+        self.execs: Counter = Counter()          # (label, line, word) -> count
+        self.entries: Counter = Counter()        # (label, line) -> times entered
+        self.functions: Set[str] = set()
+        self.paths: Dict[str, str] = {}          # label -> path as traced
+        self.labels: Dict[bytes, str] = {}
+        self.events = 0
+        self.stack: List[bytes] = []
+        self.file_lines: List[Optional[int]] = []   # current line of each frame, files only
+
+    def label(self, name: bytes) -> str:
+        found = self.labels.get(name)
+        if found is None:
+            text = name.decode('utf-8', errors='replace')
+            path = Path(text)
+            try:
+                found = path.resolve().relative_to(self.zdotdir).as_posix()
+            except (ValueError, OSError):
+                try:
+                    found = '~/' + path.relative_to(self.home).as_posix()
+                except ValueError:
+                    found = text
+            self.labels[name] = found
+            self.paths[found] = text
+        return found
+
+    def feed(self, events: Iterable[Tuple[int, bytes, int, bytes]]):
+        stack, file_lines = self.stack, self.file_lines
+        for _, name, lineno, command in events:
+            self.events += 1
+            is_file = b'/' in name
+            if stack and stack[-1] == name:
+                pass
+            elif name in stack:
+                depth = len(stack) - 1 - stack[::-1].index(name)
+                del stack[depth + 1:]
+                del file_lines[depth + 1:]
+            else:
+                stack.append(name)
+                file_lines.append(None)
+                if not is_file:
+                    self.functions.add(name.decode('utf-8', errors='replace'))
+            if is_file:
+                if file_lines[-1] != lineno:
+                    self.entries[(self.label(name), lineno)] += 1
+                file_lines[-1] = lineno
+            word = command_word(command.decode('utf-8', errors='replace'))
+            if not word or not is_external(word, set()):
+                continue
+            for depth in range(len(stack) - 1, -1, -1):
+                if b'/' in stack[depth] and file_lines[depth] is not None:
+                    self.execs[(self.label(stack[depth]), file_lines[depth], word)] += 1
+                    break
+
+    def sites(self) -> Dict[Site, int]:
+        """Every fork site with its count; calls of traced functions are dropped."""
+        found: Dict[Site, int] = {}
+        for (label, line, word), count in self.execs.items():
+            if word not in self.functions:
+                found[(label, line, 'exec', word)] = count
+        by_file = defaultdict(dict)
+        for (label, line), count in self.entries.items():
+            by_file[label][line] = count
+        for label, lines in by_file.items():
+            try:
+                text = Path(self.paths[label]).read_text(encoding='utf-8', errors='replace')
+            except OSError:
+                continue
+            for cmd in scan(text).commands:
+                if cmd.line not in lines or cmd.in_function:
+                    continue
+                count = lines[cmd.line]
+                for kind, what in static_forks(cmd):
+                    key = (label, cmd.line, kind, what)
+                    found[key] = found.get(key, 0) + count
+        return found
+
+
+def static_forks(cmd) -> List[Tuple[str, str]]:
+    """(kind, text) of the forks a command makes besides its execs."""
+    forks = []
+    for sub in cmd.substitutions:
+        body = sub.body.strip()
+        if sub.kind == '$(' and body.startswith('<') and not body.startswith('<('):
+            continue
+        close = '`' if sub.kind == '`' else ')'
+        forks.append(('subst', _short(f'{sub.kind}{body}{close}', 60)))
+    for stage in cmd.stages:
+        text = stage.lstrip()
+        if text.startswith('(') and not text.startswith('(('):
+            forks.append(('subshell', _short(text, 60)))
+    if len(cmd.stages) > 1:
+        forks += [('pipe', _short(cmd.text, 60))] * (len(cmd.stages) - 1)
+    return forks
+
+
+def build_report(sites: Dict[Site, int], events: int, source: Optional[str]) -> dict:
+    files: Dict[str, Counter] = defaultdict(Counter)
+    for (label, _, kind, _), count in sites.items():
+        files[label][kind] += count
+    totals = Counter()
+    for counts in files.values():
+        totals.update(counts)
+    return {
+        'schema': 'fork-inventory.v1',
+        'generated_at': datetime.now().astimezone().isoformat(timespec='seconds'),
+        'trace': source,
+        'trace_events': events,
+        'totals': {kind: totals[kind] for kind in KINDS},
+        'files': {
+            label: {kind: counts[kind] for kind in KINDS}
+            for label, counts in sorted(files.items(), key=lambda item: [-item[1][k] for k in KINDS])
+        },
+        'sites': [
+            {'file': label, 'line': line, 'kind': kind, 'command': what, 'count': count}
+            for (label, line, kind, what), count in sorted(sites.items())
+        ],
+    }
+
+
+def compare(report: dict, baseline: dict) -> List[dict]:
+    """Sites whose (file, kind, command) count grew past the baseline."""
+    before = Counter()
+    for site in baseline.get('sites', ()):
+        before[(site['file'], site['kind'], site['command'])] += site['count']
+    now: Dict[tuple, List[dict]] = defaultdict(list)
+    for site in report['sites']:
+        now[(site['file'], site['kind'], site['command'])].append(site)
+    grown = []
+    for key, group in now.items():
+        count = sum(site['count'] for site in group)
+        if count > before[key]:
+            grown.append({'file': key[0], 'kind': key[1], 'command': key[2],
+                          'lines': sorted(site['line'] for site in group),
+                          'count': count, 'baseline': before[key]})
+    return sorted(grown, key=lambda g: (g['file'], g['lines'][0]))
+
+
+def run_trace(zdotdir: Path, timeout: float) -> Path:
+    """Trace one interactive startup; returns the trace file."""
+    fd, name = tempfile.mkstemp(prefix='zsh-fork-trace-', suffix='.log')
+    env = dict(os.environ, ZDOTDIR=str(zdotdir), PS4=PS4)
+    try:
+        with os.fdopen(fd, 'wb') as trace:
+            subprocess.run(['zsh', '-x', '-i', '-c', 'exit'], env=env, stdin=subprocess.DEVNULL,
+                           stdout=subprocess.DEVNULL, stderr=trace, timeout=timeout)
+    except BaseException:
+        os.unlink(name)
+        raise
+    return Path(name)
+
+
+def render_text(report: dict, grown: Optional[List[dict]], top: int, baseline_path: Path,
+                legacy_total: Optional[int]) -> str:
+    t = report['totals']
+    out = [f"🍴 Fork sites at startup: {t['exec']} exec, {t['subst']} substitutions, "
+           f"{t['subshell']} subshells, {t['pipe']} pipe stages (overlapping, not summed)", '',
+           f"{'exec':>7}  file  (other sites)"]
+    for label, counts in list(report['files'].items())[:top]:
+        other = ', '.join(f'{counts[k]} {k}' for k in KINDS[1:] if counts[k])
+        out.append(f"  {counts['exec']:>5}  {label}" + (f"  ({other})" if other else ''))
+    if grown is None and legacy_total is None:
+        out += ['', f"⚠️  No baseline at {baseline_path}; new forks are not checked. "
+                    f"Run with --update-baseline to create one"]
+    if grown is not None:
+        out.append('')
+        if not grown:
+            out.append(f"✅ No new forks compared with {baseline_path}")
+        for g in grown:
+            lines = ','.join(map(str, g['lines']))
+            out.append(f"❌ NEW {g['file']}:{lines}  {g['kind']} {g['command']}  "
+                       f"({g['baseline']} -> {g['count']})")
+    if legacy_total is not None:
+        delta = t['exec'] - legacy_total
+        out += ['', f"📉 Legacy baseline: {legacy_total} external commands; now {t['exec']} ({delta:+d})"]
+    return '\n'.join(out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Count the forks shell startup makes, per fragment')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--trace', type=Path, help='existing trace (default: run zsh -x -i -c exit)')
+    source.add_argument('--keep-trace', action='store_true', help='keep the trace this run captures')
+    parser.add_argument('--zdotdir', type=Path,
+                        default=Path(os.environ.get('ZDOTDIR') or Path.home()),
+                        help='config dir to trace and to name files relative to (default: $ZDOTDIR)')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='write this inventory as the baseline')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--top', type=int, default=20, help='files listed in the text report')
+    parser.add_argument('--format', choices=['text', 'json'], default='text')
+    args = parser.parse_args(argv)
+
+    trace = args.trace
+    if trace is None:
+        try:
+            trace = run_trace(args.zdotdir, args.timeout)
+        except FileNotFoundError:
+            print("❌ zsh not found; pass --trace FILE instead", file=sys.stderr)
+            return 2
+        except subprocess.TimeoutExpired:
+            print(f"❌ Startup took longer than {args.timeout}s under xtrace", file=sys.stderr)
+            return 2
+    inventory = Inventory(args.zdotdir)
+    discard = args.trace is None and not args.keep_trace
+    try:
+        with open(trace, 'rb', buffering=READ_BUFFER) as stream:
+            inventory.feed(iter_events(stream))
+    finally:
+        if discard:
+            trace.unlink()
+        elif args.keep_trace:
+            print(f"📝 Kept trace {trace}", file=sys.stderr)
+    if not inventory.events:
+        where = 'the captured trace (rerun with --keep-trace to inspect it)' if discard else trace
+        print(f"❌ No timestamped trace lines in {where} (PS4={PS4!r})", file=sys.stderr)
+        return 2
+    report = build_report(inventory.sites(), inventory.events, None if discard else str(trace))
+
+    if args.update_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_chunks(args.baseline, [json.dumps(report, indent=2) + '\n'])
+        print(f"📝 Wrote baseline {args.baseline} ({report['totals']['exec']} exec)", file=sys.stderr)
+        return 0
+
+    grown, legacy_total = None, None
+    try:
+        baseline = json.loads(args.baseline.read_text())
+    except FileNotFoundError:
+        baseline = None
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Cannot read baseline {args.baseline}: {e}", file=sys.stderr)
+        baseline = None
+    if isinstance(baseline, dict):
+        if 'sites' in baseline:
+            grown = compare(report, baseline)
+        elif 'estimated_external_commands' in baseline:
+            legacy_total = baseline['estimated_external_commands']
+
+    if args.format == 'json':
+        print(json.dumps(dict(report, new_forks=grown), indent=2))
+    else:
+        print(render_text(report, grown, args.top, args.baseline, legacy_total))
+    if grown is None and legacy_total is None:
+        if args.format == 'json':
+            print(f"⚠️  No baseline at {args.baseline}; run with --update-baseline to create one",
+                  file=sys.stderr)
+        return 3
+    return 1 if grown else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Pruning directory walker and in-memory filesystem snapshot.
+
+walk_files() uses os.scandir and decides whether to descend into a
+directory *before* entering it, so `.ARCHIVE` trees and hidden directories
+are never listed (rglob visits them and filters afterwards).
+
+Snapshot records every path under a root in one walk, plus a lower-cased
+index, so link checkers can answer "does this exist?" without a syscall
+per link. Lookups are case-sensitive, as on Linux; a target that only
+matches with different case is reported through case_match(), since it
+resolves on a default (case-insensitive) macOS volume but breaks on Linux.
+
+Library usage:
+    from fs_snapshot import Snapshot, walk_files
+    files = walk_files(docs_dir)
+    snap = Snapshot(repo_root)
+    snap.exists(target) / snap.case_match(target)
+"""
+
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+# Directories a snapshot never descends into; their contents fall back to
+# a real syscall if a link ever points there.
+SNAPSHOT_PRUNE = {'.git', '__pycache__', 'node_modules', '.venv'}
+
+
+def skip_archived(name: str, hidden: bool = True) -> bool:
+    """Default walker filter: `.ARCHIVE` entries and (optionally) dot-names."""
+    return '.ARCHIVE' in name or (hidden and name.startswith('.'))
+
+
+def walk_files(root, suffix: str = '.md',
+               skip: Callable[[str], bool] = skip_archived) -> List[Path]:
+    """Return sorted files under ``root`` ending in ``suffix``.
+
+    ``skip(name)`` is applied to every directory and file name below
+    ``root``; skipped directories are pruned before they are opened.
+    Symlinked directories are not followed.
+    """
+    found = []
+    stack = [os.fspath(root)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if skip(entry.name):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(suffix) and entry.is_file():
+                    found.append(Path(entry.path))
+    return sorted(found)
+
+
+def _abs(path) -> str:
+    return os.path.normpath(os.path.join(os.getcwd(), os.fspath(path)))
+
+
+class Snapshot:
+    """Every file and directory under ``root``, captured in one walk."""
+
+    def __init__(self, root, prune: Set[str] = SNAPSHOT_PRUNE):
+        self.root = _abs(root)
+        self.paths: Set[str] = {self.root}
+        self.folded: Dict[str, str] = {self.root.lower(): self.root}
+        # Directories present but not descended into (pruned or symlinked)
+        self.opaque: Set[str] = set()
+        self.fallbacks = 0
+
+        stack = [self.root]
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    path = entry.path
+                    is_link = entry.is_symlink()
+                    if is_link and not os.path.exists(path):
+                        continue  # dangling: Path.exists() is False too
+                    self.paths.add(path)
+                    self.folded.setdefault(path.lower(), path)
+                    if entry.is_dir():
+                        if is_link or entry.name in prune:
+                            self.opaque.add(path)
+                        else:
+                            stack.append(path)
+
+    def _covers(self, path: str) -> bool:
+        """True when ``path`` lies inside the walked part of the tree."""
+        if path != self.root and not path.startswith(self.root + os.sep):
+            return False
+        parent = os.path.dirname(path)
+        while parent != self.root and len(parent) > len(self.root):
+            if parent in self.opaque:
+                return False
+            parent = os.path.dirname(parent)
+        return True
+
+    def exists(self, path) -> bool:
+        """Case-sensitive existence check (no syscall inside the root)."""
+        path = _abs(path)
+        if path in self.paths:
+            return True
+        if self._covers(path):
+            return False
+        self.fallbacks += 1
+        return os.path.exists(path)
+
+    def case_match(self, path) -> Optional[str]:
+        """The real path when ``path`` only exists with different case."""
+        path = _abs(path)
+        if path in self.paths or not self._covers(path):
+            return None
+        return self.folded.get(path.lower())
+
+
+@lru_cache(maxsize=None)
+def snapshot_for(root) -> Snapshot:
+    """Shared snapshot per root for callers that don't build their own."""
+    return Snapshot(root)
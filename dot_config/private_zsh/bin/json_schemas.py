@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Shape checks for the JSON artifacts the config tools read and write.
+
+Each entry in SCHEMAS pairs a path pattern with a small JSON Schema
+subset (type, required, properties, additionalProperties, items,
+minItems, enum, minimum, pattern, anyOf). Patterns are matched from the
+right against the deployed path, with chezmoi source prefixes mapped
+back (dot_performance -> .performance, private_zsh -> zsh), so they work
+on the source tree and the live config alike; a leading '/' anchors a
+pattern at the config root. The first matching
+pattern wins, and names are unique so a name identifies one schema.
+Files matching no pattern only need to parse.
+
+A schema is compiled once into nested checker functions, so validating
+many files with the same schema does not re-walk the schema each time.
+schema_key() returns a fingerprint that changes whenever a schema is
+edited, which keeps the batch validator's result cache honest.
+
+Library usage:
+    from json_schemas import schema_for, compiled, schema_key
+    name = schema_for(path)                  # None when no pattern matches
+    problems = compiled(name)(data)          # ['$.segments[0].id: expected string']
+"""
+
+import hashlib
+import json
+import re
+from functools import lru_cache
+from pathlib import PurePosixPath
+from typing import Any, Callable, List, Optional
+
+Checker = Callable[[Any, str, List[str]], None]
+
+NUMBER = {'type': 'number'}
+STRING = {'type': 'string'}
+OBJECT = {'type': 'object'}
+
+SHIELDS_BADGE = {
+    'type': 'object',
+    'required': ['label', 'message', 'color'],
+    'properties': {
+        'schemaVersion': {'type': 'integer', 'minimum': 1},
+        'label': STRING,
+        'message': STRING,
+        'color': STRING,
+    },
+}
+
+PERF_SAMPLE = {
+    'type': 'object',
+    'required': ['timestamp', 'pre_plugin_cost_ms', 'post_plugin_cost_ms', 'prompt_ready_ms'],
+    'properties': {
+        'timestamp': STRING,
+        'mean_ms': NUMBER,
+        'pre_plugin_cost_ms': NUMBER,
+        'post_plugin_cost_ms': NUMBER,
+        'prompt_ready_ms': NUMBER,
+        'segments_available': {'type': 'boolean'},
+    },
+}
+
+MCP_SERVERS = {
+    'type': 'object',
+    'required': ['mcpServers'],
+    'properties': {'mcpServers': {'type': 'object', 'additionalProperties': {
+        'type': 'object',
+        'properties': {'command': STRING, 'args': {'type': 'array', 'items': STRING}, 'env': OBJECT},
+    }}},
+}
+
+# (name, pattern, schema); order matters, the first match wins
+SCHEMAS = [
+    ('badge-state', 'badges/*-state.json', OBJECT),
+    ('badge', 'badges/*.json', {'anyOf': [
+        SHIELDS_BADGE,
+        {'type': 'object', 'required': ['badge'], 'properties': {'badge': SHIELDS_BADGE}},
+    ]}),
+    ('metric-baseline', '/artifacts/metrics/*-baseline.json', {
+        'type': 'object',
+        'required': ['metric', 'mean_ms', 'runs', 'values'],
+        'properties': {
+            'metric': STRING,
+            'mean_ms': NUMBER,
+            'median_ms': NUMBER,
+            'stddev_ms': NUMBER,
+            'rsd_pct': NUMBER,
+            'runs': {'type': 'integer', 'minimum': 1},
+            'values': {'type': 'array', 'minItems': 1, 'items': NUMBER},
+        },
+    }),
+    ('perf-ledger', 'metrics/ledger-history/perf-ledger-*.json', {
+        'type': 'object',
+        'required': ['schema', 'timestamp', 'samples'],
+        'properties': {
+            'schema': {'type': 'string', 'pattern': r'^perf-multi\.v\d+$'},
+            'timestamp': STRING,
+            'samples': {'type': 'integer', 'minimum': 0},
+        },
+    }),
+    ('perf-current', 'metrics/perf-current*.json', PERF_SAMPLE),
+    ('perf-simple-sample', 'metrics/perf-simple-sample-*.json', PERF_SAMPLE),
+    ('fork-inventory', 'metrics/fork-inventory*.json', {
+        'type': 'object',
+        'required': ['schema', 'totals', 'sites'],
+        'properties': {
+            'schema': {'type': 'string', 'pattern': r'^fork-inventory\.v\d+$'},
+            'totals': {'type': 'object', 'additionalProperties': {'type': 'integer', 'minimum': 0}},
+            'files': OBJECT,
+            'sites': {'type': 'array', 'items': {
+                'type': 'object',
+                'required': ['file', 'line', 'kind', 'command', 'count'],
+                'properties': {
+                    'file': STRING,
+                    'line': {'type': 'integer', 'minimum': 1},
+                    'kind': {'enum': ['exec', 'subst', 'subshell', 'pipe']},
+                    'command': STRING,
+                    'count': {'type': 'integer', 'minimum': 1},
+                },
+            }},
+        },
+    }),
+    ('segments', '.performance/segments*.json', {
+        'type': 'object',
+        'required': ['schema_version', 'segments'],
+        'properties': {
+            'schema_version': STRING,
+            'segments': {'type': 'array', 'items': {
+                'type': 'object',
+                'required': ['id', 'name', 'start_ms', 'end_ms', 'duration_ms'],
+                'properties': {
+                    'id': STRING,
+                    'name': STRING,
+                    'order': {'type': 'integer'},
+                    'status': STRING,
+                    'start_ms': {'type': 'number', 'minimum': 0},
+                    'end_ms': {'type': 'number', 'minimum': 0},
+                    'duration_ms': {'type': 'number', 'minimum': 0},
+                    'metrics': OBJECT,
+                },
+            }},
+            'aggregate': OBJECT,
+        },
+    }),
+    ('plugin-metadata', '.plugin-registry/plugin-metadata.json', {
+        'type': 'object',
+        'required': ['registry_version', 'plugins'],
+        'properties': {'registry_version': STRING, 'last_updated': STRING, 'plugins': OBJECT},
+    }),
+    ('trusted-plugins', 'plugin-registry/trusted-plugins.json', {
+        'type': 'object',
+        'required': ['registry_version', 'plugins'],
+        'properties': {
+            'registry_version': STRING,
+            'plugins': {'type': 'object', 'additionalProperties': {
+                'type': 'object',
+                'required': ['trusted'],
+                'properties': {'trusted': {'type': 'boolean'}, 'repository': STRING},
+            }},
+        },
+    }),
+    ('default-trusted', 'plugin-registry/default-trusted.json', {
+        'type': 'object',
+        'required': ['plugins'],
+        'properties': {'plugins': {'type': 'array', 'items': STRING}},
+    }),
+    ('immutable-manifest', 'layers/immutable/manifest.json', {
+        'type': 'object',
+        'required': ['schema_version', 'hash_algorithm', 'directories'],
+        'properties': {
+            'schema_version': STRING,
+            'hash_algorithm': {'enum': ['sha256']},
+            'directories': {'type': 'array', 'items': {
+                'type': 'object',
+                'required': ['name', 'files'],
+                'properties': {'name': STRING, 'expected_file_count': {'type': 'integer', 'minimum': 0},
+                               'files': {'type': 'array'}},
+            }},
+        },
+    }),
+    ('smoke', 'artifacts/*smoke.json', {
+        'type': 'object',
+        'required': ['status'],
+        'properties': {'status': STRING, 'widgets': {'type': 'integer', 'minimum': 0}},
+    }),
+    ('pre-chsh', 'artifacts/pre-chsh.json', {
+        'type': 'object',
+        'required': ['status', 'tests'],
+        'properties': {'status': STRING, 'tests': OBJECT},
+    }),
+    ('widget-metrics', 'artifacts/widget-metrics.json', {
+        'type': 'object',
+        'required': ['widgets_core', 'status'],
+        'properties': {'widgets_core': {'type': 'integer', 'minimum': 0}, 'status': STRING},
+    }),
+    ('cursor-mcp', '.cursor/mcp.json', MCP_SERVERS),
+    ('roo-mcp', '.roo/mcp.json', MCP_SERVERS),
+    ('vscode', '.vscode/*.json', OBJECT),
+    ('cursor', '.cursor/*.json', OBJECT),
+    ('mermaid-palette', 'bin/mermaid-palette.json', {
+        'type': 'object',
+        'required': ['colors'],
+        'properties': {'colors': OBJECT},
+    }),
+]
+
+_SCHEMA_BY_NAME = {name: schema for name, _, schema in SCHEMAS}
+
+_CHEZMOI_PREFIXES = ('private_', 'executable_', 'readonly_', 'symlink_')
+
+_TYPES = {
+    'object': lambda v: isinstance(v, dict),
+    'array': lambda v: isinstance(v, list),
+    'string': lambda v: isinstance(v, str),
+    'boolean': lambda v: isinstance(v, bool),
+    'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+    'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    'null': lambda v: v is None,
+}
+
+
+def deployed_path(rel: str) -> PurePosixPath:
+    """``rel`` with chezmoi source attributes mapped back to target names."""
+    parts = []
+    for part in PurePosixPath(rel).parts:
+        for prefix in _CHEZMOI_PREFIXES:
+            if part.startswith(prefix):
+                part = part[len(prefix):]
+        if part.startswith('dot_'):
+            part = '.' + part[4:]
+        parts.append(part)
+    return PurePosixPath(*parts)
+
+
+def schema_for(rel: str) -> Optional[str]:
+    """Name of the first schema whose pattern matches ``rel``."""
+    target = PurePosixPath('/', deployed_path(rel))
+    for name, pattern, _ in SCHEMAS:
+        if target.match(pattern):
+            return name
+    return None
+
+
+def schema_key(name: Optional[str]) -> str:
+    """Fingerprint of schema ``name``, or 'syntax' when there is none."""
+    if name is None:
+        return 'syntax'
+    digest = hashlib.sha256(json.dumps(_SCHEMA_BY_NAME[name], sort_keys=True).encode()).hexdigest()
+    return f'{name}:{digest[:16]}'
+
+
+def _compile(schema: dict) -> Checker:
+    checks: List[Checker] = []
+
+    if 'anyOf' in schema:
+        options = [_compile(s) for s in schema['anyOf']]
+
+        def any_of(value, where, problems):
+            for option in options:
+                found: List[str] = []
+                option(value, where, found)
+                if not found:
+                    return
+            problems.append(f'{where}: matches none of {len(options)} allowed shapes')
+        checks.append(any_of)
+
+    if 'type' in schema:
+        kind = schema['type']
+        is_type = _TYPES[kind]
+
+        def type_check(value, where, problems):
+            if not is_type(value):
+                problems.append(f'{where}: expected {kind}, got {type(value).__name__}')
+        checks.append(type_check)
+
+    if 'enum' in schema:
+        allowed = schema['enum']
+
+        def enum_check(value, where, problems):
+            if value not in allowed:
+                problems.append(f'{where}: {value!r} not one of {allowed}')
+        checks.append(enum_check)
+
+    if 'minimum' in schema:
+        minimum = schema['minimum']
+
+        def min_check(value, where, problems):
+            if _TYPES['number'](value) and value < minimum:
+                problems.append(f'{where}: {value} is below {minimum}')
+        checks.append(min_check)
+
+    if 'pattern' in schema:
+        regex = re.compile(schema['pattern'])
+
+        def pattern_check(value, where, problems):
+            if isinstance(value, str) and not regex.search(value):
+                problems.append(f'{where}: {value!r} does not match {regex.pattern}')
+        checks.append(pattern_check)
+
+    required = schema.get('required', ())
+    properties = {k: _compile(s) for k, s in schema.get('properties', {}).items()}
+    extra = schema.get('additionalProperties', True)
+    extra_check = _compile(extra) if isinstance(extra, dict) else None
+    if required or properties or extra is not True:
+        def object_check(value, where, problems):
+            if not isinstance(value, dict):
+                return
+            for key in required:
+                if key not in value:
+                    problems.append(f'{where}: missing required key {key!r}')
+            for key, item in value.items():
+                check = properties.get(key)
+                if check is not None:
+                    check(item, f'{where}.{key}', problems)
+                elif extra is False:
+                    problems.append(f'{where}: unexpected key {key!r}')
+                elif extra_check is not None:
+                    extra_check(item, f'{where}.{key}', problems)
+        checks.append(object_check)
+
+    if 'items' in schema or 'minItems' in schema:
+        item_check = _compile(schema['items']) if 'items' in schema else None
+        min_items = schema.get('minItems', 0)
+
+        def array_check(value, where, problems):
+            if not isinstance(value, list):
+                return
+            if len(value) < min_items:
+                problems.append(f'{where}: expected at least {min_items} items')
+            if item_check is not None:
+                for i, item in enumerate(value):
+                    item_check(item, f'{where}[{i}]', problems)
+        checks.append(array_check)
+
+    def run(value, where, problems):
+        for check in checks:
+            check(value, where, problems)
+    return run
+
+
+@lru_cache(maxsize=None)
+def compiled(name: str) -> Callable[[Any], List[str]]:
+    """Checker for schema ``name``, returning a list of problems."""
+    check = _compile(_SCHEMA_BY_NAME[name])
+
+    def validate(data) -> List[str]:
+        problems: List[str] = []
+        check(data, '$', problems)
+        return problems
+    return validate
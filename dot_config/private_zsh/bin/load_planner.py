@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Dependency-graph load planner for the zsh fragment layers.
+
+Load order has so far come only from numeric filename prefixes. This tool
+builds a graph from the `Requires:` headers recorded in the module manifest
+(zsh_manifest.py) plus, optionally, function definitions and call sites
+inferred from the fragments themselves, and then:
+
+- reports requirements that name no fragment in the layer set
+- reports ordering violations: a requirement that loads at or after the
+  fragment needing it, given the real (phase, filename) order
+- reports dependency cycles
+- splits post-plugin fragments into an eager set and topological batches
+  to run with zsh-defer after the first prompt; batches keep filename
+  order and the fragments in one batch are independent of each other
+
+A fragment is eager when it sets up the prompt, or when it does something
+the first prompt's line editor must already see (DEFER_UNSAFE): shell
+options, completion (compinit/compdef), key bindings and widgets, history
+setup. Everything an eager fragment needs is eager too, and the plan
+shows why each one is. --defer moves a defer-unsafe fragment to the
+batches anyway, for one known to be harmless late.
+
+Usage:
+    python3 bin/load_planner.py [--layers L ...] [--format text|json|zsh]
+                                [--eager NAME] [--defer NAME] [--no-infer] [-o FILE]
+
+By default the active layers are read from the .live symlinks.
+
+Exit codes:
+    0 - plan is consistent
+    1 - missing requirements, ordering violations or cycles found
+"""
+
+import argparse
+import json
+import re
+import sys
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Set
+
+from zsh_manifest import FAMILIES, default_manifest_path, layer_family, live_layers, update_manifest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Only post-plugin fragments can be deferred; the earlier phases must
+# finish before plugins are registered and `zgenom save` runs.
+DEFERRABLE_FAMILY = '.zshrc.d'
+
+# Fragments that shape the first prompt stay eager.
+PROMPT_RE = re.compile(
+    r'^\s*(?:export\s+)?(?:PROMPT|PS1|RPROMPT|RPS1)='
+    r'|starship\s+init|\bp10k\b|powerlevel10k|\bpromptinit\b',
+    re.MULTILINE,
+)
+
+# What a deferred fragment would do too late, after the first prompt has
+# read options, completions and bindings: (pattern, reason)
+_CMD = r'(?<![\w.:/$-])'
+DEFER_UNSAFE = [
+    (re.compile(_CMD + r'(?:setopt|unsetopt)\b'), 'shell options'),
+    (re.compile(_CMD + r'(?:compinit|compdef)\b'), 'completion setup'),
+    (re.compile(_CMD + r'(?:bindkey|zle)\b'), 'key bindings/widgets'),
+    (re.compile(r'\b(?:HISTFILE|HISTSIZE|SAVEHIST)=|' + _CMD + r'atuin\s+init\b|' + _CMD + r'fc\s+-[RWAp]'),
+     'history setup'),
+]
+
+DEF_RE = re.compile(r'^\s*(?:function\s+([A-Za-z_][\w:.+-]*)|([A-Za-z_][\w:.+-]*)\s*\(\)\s*\{?)', re.MULTILINE)
+WORD_RE = re.compile(r'[A-Za-z_][\w:.+-]*')
+
+
+@dataclass
+class Fragment:
+    name: str
+    path: str
+    layer: str
+    family: str
+    requires: List[str] = field(default_factory=list)
+
+    @property
+    def order(self):
+        """Real load position: phase first, then glob (name) order."""
+        return (FAMILIES.index(self.family), self.name)
+
+
+@dataclass
+class Edge:
+    src: str   # the fragment that needs...
+    dst: str   # ...this one loaded first
+    kind: str  # 'requires' (header) or 'calls' (inferred)
+    detail: str = ''
+
+
+@dataclass
+class Plan:
+    layers: List[str]
+    order: List[str]
+    edges: List[Edge]
+    missing: List[Edge] = field(default_factory=list)
+    violations: List[Edge] = field(default_factory=list)
+    cycles: List[List[str]] = field(default_factory=list)
+    eager: Dict[str, str] = field(default_factory=dict)
+    batches: List[List[str]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing or self.violations or self.cycles)
+
+
+def load_fragments(base_dir: Path, layers: Sequence[str], manifest_path: Path) -> List[Fragment]:
+    """Read fragment metadata for ``layers`` through the (refreshed) manifest."""
+    manifest, _ = update_manifest(base_dir, layers, manifest_path)
+    fragments = [
+        Fragment(name=e['name'], path=e['path'], layer=e['layer'],
+                 family=layer_family(e['layer']), requires=e['requires'])
+        for e in manifest['fragments'] if e['layer'] in layers
+    ]
+    return sorted(fragments, key=lambda f: f.order)
+
+
+def _code(text: str) -> str:
+    return '\n'.join(line for line in text.split('\n') if not line.lstrip().startswith('#'))
+
+
+def defer_unsafe(text: str) -> List[str]:
+    """Reasons from DEFER_UNSAFE that apply to fragment source ``text``."""
+    code = _code(text)
+    return [reason for regex, reason in DEFER_UNSAFE if regex.search(code)]
+
+
+def infer_call_edges(base_dir: Path, fragments: Sequence[Fragment]) -> List[Edge]:
+    """Edges from a fragment to earlier fragments defining functions it names."""
+    code = {f.name: _code((base_dir / f.path).read_text(encoding='utf-8', errors='replace'))
+            for f in fragments}
+    definers = defaultdict(list)
+    for f in fragments:
+        for m in DEF_RE.finditer(code[f.name]):
+            definers[m.group(1) or m.group(2)].append(f)
+    edges = []
+    for f in fragments:
+        words = set(WORD_RE.findall(code[f.name]))
+        for func in sorted(words & definers.keys()):
+            for d in definers[func]:
+                if d.name != f.name and d.order < f.order:
+                    edges.append(Edge(f.name, d.name, 'calls', func))
+    return edges
+
+
+def strongly_connected(nodes: Iterable[str], succ: Dict[str, Set[str]]) -> List[List[str]]:
+    """Tarjan's algorithm (iterative); returns the components."""
+    index, low, on_stack, stack, comps = {}, {}, set(), [], []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(sorted(succ.get(root, ()))))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, it = work[-1]
+            advanced = False
+            for nxt in it:
+                if nxt not in index:
+                    index[nxt] = low[nxt] = counter
+                    counter += 1
+                    stack.append(nxt)
+                    on_stack.add(nxt)
+                    work.append((nxt, iter(sorted(succ.get(nxt, ())))))
+                    advanced = True
+                    break
+                if nxt in on_stack:
+                    low[node] = min(low[node], index[nxt])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                low[work[-1][0]] = min(low[work[-1][0]], low[node])
+            if low[node] == index[node]:
+                comp = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    comp.append(member)
+                    if member == node:
+                        break
+                comps.append(comp)
+    return comps
+
+
+def build_plan(base_dir: Path, fragments: Sequence[Fragment], layers: Sequence[str],
+               infer: bool = True, eager: Iterable[str] = (), defer: Iterable[str] = ()) -> Plan:
+    by_name = {f.name: f for f in fragments}
+    edges = []
+    plan = Plan(layers=list(layers), order=[f.name for f in fragments], edges=edges)
+
+    for f in fragments:
+        for req in f.requires:
+            edge = Edge(f.name, req, 'requires')
+            if req not in by_name:
+                plan.missing.append(edge)
+                continue
+            edges.append(edge)
+            if by_name[req].order >= f.order:
+                plan.violations.append(edge)
+    if infer:
+        edges.extend(infer_call_edges(base_dir, fragments))
+
+    succ = defaultdict(set)
+    for e in edges:
+        succ[e.src].add(e.dst)
+    required = defaultdict(set)
+    for e in edges:
+        if e.kind == 'requires':
+            required[e.src].add(e.dst)
+    plan.cycles = [sorted(c, key=lambda n: by_name[n].order)
+                   for c in strongly_connected(plan.order, required) if len(c) > 1]
+
+    # Eager set: earlier phases, prompt setup, defer-unsafe fragments,
+    # explicit names, and their transitive dependencies.
+    for f in fragments:
+        if f.family != DEFERRABLE_FAMILY:
+            plan.eager[f.name] = 'pre-plugin/plugin phase'
+            continue
+        if f.name in eager:
+            plan.eager[f.name] = 'requested (--eager)'
+            continue
+        text = (base_dir / f.path).read_text(encoding='utf-8', errors='replace')
+        if PROMPT_RE.search(text):
+            plan.eager[f.name] = 'prompt setup'
+        elif f.name not in defer:
+            unsafe = defer_unsafe(text)
+            if unsafe:
+                plan.eager[f.name] = 'defer-unsafe: ' + ', '.join(unsafe)
+    queue = list(plan.eager)
+    while queue:
+        node = queue.pop()
+        for dep in sorted(succ[node]):
+            if dep not in plan.eager:
+                plan.eager[dep] = f'needed by {node}'
+                queue.append(dep)
+
+    # Deferred batches keep the filename order (later prefixes may rely on
+    # overriding earlier ones, e.g. 990-final-overrides), and a new batch
+    # starts whenever a fragment depends on one already in the current
+    # batch, so the members of a batch are independent of each other.
+    batch: List[str] = []
+    for name in plan.order:
+        if name in plan.eager:
+            continue
+        if succ[name] & set(batch):
+            plan.batches.append(batch)
+            batch = []
+        batch.append(name)
+    if batch:
+        plan.batches.append(batch)
+    return plan
+
+
+def render_text(plan: Plan, by_name: Dict[str, Fragment]) -> str:
+    out = [f"Layers: {', '.join(plan.layers)}",
+           f"Fragments: {len(plan.order)}  Edges: {len(plan.edges)} "
+           f"({sum(e.kind == 'requires' for e in plan.edges)} declared)", '']
+    for title, items in (('❌ Missing requirements', plan.missing),
+                         ('❌ Ordering violations', plan.violations)):
+        if items:
+            out.append(f'{title}:')
+            out += [f'  {e.src} requires {e.dst}' for e in items]
+            out.append('')
+    if plan.cycles:
+        out.append('❌ Cycles:')
+        out += ['  ' + ' -> '.join(c + c[:1]) for c in plan.cycles]
+        out.append('')
+    eager_post = [n for n in plan.order if n in plan.eager and by_name[n].family == DEFERRABLE_FAMILY]
+    out.append(f'Eager post-plugin fragments ({len(eager_post)}; '
+               f'{len(plan.eager) - len(eager_post)} earlier-phase fragments are always eager):')
+    out += [f'  {name:<40} {plan.eager[name]}' for name in eager_post]
+    out.append('')
+    for i, batch in enumerate(plan.batches, 1):
+        out.append(f'Deferred batch {i} ({len(batch)}):')
+        out += [f'  {name}' for name in batch]
+    out.append('')
+    out.append('✅ Plan is consistent' if plan.ok else '⚠️  Fix the problems above before deferring')
+    return '\n'.join(out)
+
+
+def render_zsh(plan: Plan, by_name: Dict[str, Fragment]) -> str:
+    """A .zshrc.d loader: eager fragments in order, then one zsh-defer per batch."""
+    src = lambda n: f'source "${{ZDOTDIR:-$HOME}}/{DEFERRABLE_FAMILY}/{n}"'  # noqa: E731
+    out = ['# Generated by bin/load_planner.py -- do not edit',
+           f"# Layers: {', '.join(plan.layers)}"]
+    out += [src(n) for n in plan.order
+            if n in plan.eager and by_name[n].family == DEFERRABLE_FAMILY]
+    for i, batch in enumerate(plan.batches, 1):
+        out.append(f'# batch {i}')
+        out.append("zsh-defer -c '" + '; '.join(src(n) for n in batch) + "'")
+    return '\n'.join(out) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Plan zsh fragment load order from Requires: headers')
+    parser.add_argument('--base-dir', type=Path, default=ROOT,
+                        help='ZDOTDIR or chezmoi source directory (default: %(default)s)')
+    parser.add_argument('--layers', nargs='+', help='Layer directories (default: .live targets)')
+    parser.add_argument('--manifest', type=Path, default=default_manifest_path(),
+                        help='Module manifest (default: %(default)s)')
+    parser.add_argument('--format', choices=('text', 'json', 'zsh'), default='text')
+    parser.add_argument('--eager', action='append', default=[], metavar='NAME',
+                        help='Keep fragment NAME out of the deferred batches')
+    parser.add_argument('--defer', action='append', default=[], metavar='NAME',
+                        help='Allow deferring fragment NAME although it looks defer-unsafe')
+    parser.add_argument('--no-infer', action='store_true',
+                        help='Use declared Requires: only, not inferred function calls')
+    parser.add_argument('-o', '--output', type=Path, help='Write the plan here instead of stdout')
+    args = parser.parse_args(argv)
+
+    layers = args.layers or live_layers(args.base_dir)
+    if not layers:
+        print(f"❌ No layers found under {args.base_dir}")
+        return 1
+    fragments = load_fragments(args.base_dir, layers, args.manifest)
+    plan = build_plan(args.base_dir, fragments, layers, not args.no_infer, args.eager, args.defer)
+    by_name = {f.name: f for f in fragments}
+
+    if args.format == 'json':
+        text = json.dumps(dict(asdict(plan), ok=plan.ok), indent=2) + '\n'
+    elif args.format == 'zsh':
+        text = render_zsh(plan, by_name)
+    else:
+        text = render_text(plan, by_name) + '\n'
+    if args.output:
+        args.output.write_text(text, encoding='utf-8')
+        print(f"📝 Plan written to {args.output}")
+    else:
+        sys.stdout.write(text)
+    return 0 if plan.ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Shared code-fence helpers for the Markdown fixers.
+
+- index_fences(lines) locates every fenced block in one pass
+- classify_block(body) guesses the language of an unlabeled block
+
+The classifier scores the whole block against token-frequency profiles for
+bash/zsh, JSON, YAML, mermaid, log output and Python, instead of peeking at
+the line before or after the fence. Results are memoized by a hash of the
+block, so blocks repeated across the docs corpus are classified once.
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+FENCE_RE = re.compile(r'^(\s*)```\s*(.*?)\s*$')
+
+# Shell-aware tokenizer: multi-character operators first, then words.
+TOKEN_RE = re.compile(
+    r'\$\{|\$\(|&&|\|\||\[\[|\]\]|2>&1|>>|-->|-\.->|==>|->>|::'
+    r'|(?<![\w-])--?[A-Za-z][\w-]*|[A-Za-z_][\w.-]*|\d+|\S'
+)
+
+# Per-language weights for tokens that start a line ("lead") and for tokens
+# anywhere in the block ("any"). Scores are normalized per non-blank line.
+PROFILES = {
+    'bash': {
+        'lead': {
+            'export': 3, 'echo': 2, 'source': 3, 'cd': 2, 'fi': 3, 'then': 2,
+            'done': 3, 'do': 1, 'for': 1, 'while': 1, 'if': 1, 'elif': 1,
+            'zsh': 3, 'bash': 3, 'sh': 2, 'git': 2, 'brew': 3, 'ls': 2,
+            'mkdir': 3, 'rm': 3, 'cp': 2, 'mv': 2, 'ln': 2, 'cat': 2,
+            'grep': 2, 'curl': 2, 'sudo': 3, 'chmod': 3, 'chezmoi': 3,
+            'exec': 2, 'unset': 2, 'local': 2, 'typeset': 3, 'setopt': 3,
+            'unsetopt': 3, 'autoload': 3, 'alias': 3, 'zstyle': 3,
+            'bindkey': 3, 'compinit': 2, 'zgenom': 3, 'time': 1, 'npm': 2,
+            'python3': 2, 'find': 2, 'touch': 2, 'tail': 2, 'head': 2,
+            'sed': 2, 'awk': 2, 'diff': 2, 'tree': 2, 'which': 2, 'type': 1,
+            'printf': 2, 'eval': 2, 'case': 2, 'esac': 3, 'return': 1,
+            'function': 2, 'trap': 2, 'hyperfine': 3, 'ZDOTDIR': 2,
+            'vim': 2, 'nvim': 2, 'open': 1, 'gh': 2, 'code': 1, 'jq': 2,
+            'fzf': 2, 'rg': 2, 'eza': 2, 'bat': 2, 'zoxide': 2, 'starship': 2,
+            'atuin': 2, 'uv': 2, 'pip': 2, 'composer': 2, 'nvm': 2, 'node': 1,
+            'php': 1, 'make': 2, 'docker': 2, 'kill': 2, 'ps': 2, 'less': 1,
+            'zf': 2, '$': 2, '#': 1.5, '.': 1, '~': 1,
+        },
+        'any': {
+            '${': 2, '$(': 2, '&&': 1.5, '||': 1, '[[': 2, ']]': 2,
+            '2>&1': 2, '>>': 1, '$': 1, 'fi': 1, 'done': 1, 'dev': 0.5,
+            'null': 0.3, 'zsh': 1, 'ZDOTDIR': 1, 'HOME': 1, 'echo': 1,
+            '-flag': 1.5, '~': 1, '::': 1.5, '|': 0.5, ';': 0.5,
+        },
+    },
+    'json': {
+        'lead': {'{': 3, '}': 3, '[': 2, ']': 2, '"': 3},
+        'any': {'"': 0.5, ':': 0.5, ',': 0.3, 'true': 0.5, 'false': 0.5, 'null': 0.3},
+    },
+    'yaml': {
+        'lead': {'-': 1},
+        'any': {},
+    },
+    'mermaid': {
+        'lead': {
+            'graph': 8, 'flowchart': 8, 'sequenceDiagram': 8, 'classDiagram': 8,
+            'stateDiagram': 8, 'stateDiagram-v2': 8, 'erDiagram': 8, 'gantt': 8,
+            'pie': 4, 'journey': 6, 'gitGraph': 8, 'mindmap': 8, 'timeline': 6,
+            'subgraph': 3, 'end': 1, 'style': 2, 'classDef': 3, 'class': 1,
+            'participant': 3, 'actor': 2, 'Note': 1, 'section': 1, 'title': 1,
+        },
+        'any': {'-->': 3, '-.->': 3, '==>': 3, '->>': 3, '-->>': 3, 'fill': 1, 'stroke': 1},
+    },
+    'log': {
+        'lead': {'[': 1, 'INFO': 3, 'WARN': 3, 'WARNING': 3, 'ERROR': 3, 'DEBUG': 3},
+        'any': {'INFO': 1, 'WARN': 1, 'ERROR': 1, 'DEBUG': 1, 'TRACE': 1, 'ms': 0.3},
+    },
+    'python': {
+        'lead': {
+            'def': 4, 'import': 4, 'from': 3, 'class': 2, 'return': 1, 'print': 2,
+            'elif': 2, 'try': 1, 'except': 4, 'with': 2, 'self': 2, 'raise': 3,
+            '#': 0.5,
+        },
+        'any': {'self': 1, 'None': 1, 'True': 0.5, 'False': 0.5, '__name__': 3, 'lambda': 2},
+    },
+}
+
+# Whole-line patterns that token counts cannot express.
+LINE_FEATURES = {
+    'bash': [(re.compile(r'^#!.*\b(ba|z)?sh\b'), 6), (re.compile(r'^\s*[\w-]+\(\)\s*\{'), 4),
+             (re.compile(r'^\s*\w+=\S'), 1.5), (re.compile(r'^\s*(\$|❯|%)\s'), 2)],
+    'yaml': [(re.compile(r'^\s*[\w.-]+:(\s+\S.*)?$'), 2.5), (re.compile(r'^---\s*$'), 1)],
+    'log': [(re.compile(r'^\s*\[?\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}'), 4),
+            (re.compile(r'^\s*\[?\d{2}:\d{2}:\d{2}'), 3),
+            (re.compile(r'^\s*\[(INFO|WARN|ERROR|DEBUG|TRACE|zf|perf)[^\]]*\]', re.I), 3),
+            (re.compile(r'^\s*\+\d+(\.\d+)?\|'), 3)],
+    'mermaid': [(re.compile(r'^\s*\w[^\s]*.*\s(-->|---|-\.->|==>|->>|-->>)'), 3),
+                (re.compile(r'^\s*\w+(\[|\(|\{)'), 1.5)],
+    'python': [(re.compile(r'^\s*(def|class)\s+\w+.*:\s*$'), 3), (re.compile(r'^#!.*python'), 6)],
+}
+
+# zsh-only constructs; when present a shell block is tagged zsh, not bash.
+ZSH_MARKERS = re.compile(
+    r'\b(setopt|unsetopt|zstyle|bindkey|autoload\s+-U|zle|zmodload|typeset\s+-g|compdef|zgenom)\b'
+    r'|\$\{\([^)]*\)|\bfpath\b|\bZDOTDIR\b|\b\w+::\w+'
+)
+
+# A first line naming a diagram type settles the question outright.
+MERMAID_HEADER = re.compile(
+    r'^\s*(graph|flowchart|sequenceDiagram|classDiagram|stateDiagram(-v2)?|erDiagram'
+    r'|gantt|pie|journey|gitGraph|mindmap|timeline|quadrantChart)\b'
+)
+
+MIN_SCORE = 0.75
+
+_cache: Dict[bytes, str] = {}
+_stats = {'hits': 0, 'misses': 0}
+
+
+@dataclass
+class Fence:
+    """A fenced code block: ``lines[start]`` opens it, ``lines[end]`` closes it."""
+
+    start: int
+    end: int
+    info: str
+    indent: str = ''
+
+    def body(self, lines: Sequence[str]) -> Sequence[str]:
+        return lines[self.start + 1:self.end]
+
+
+def index_fences(lines: Sequence[str]) -> List[Fence]:
+    """Locate every fenced block in a single pass.
+
+    Any ``` line inside a block closes it (matching how the fixers have
+    always paired fences); an unterminated block ends at ``len(lines)``.
+    """
+    fences = []
+    open_fence = None
+    for i, line in enumerate(lines):
+        m = FENCE_RE.match(line)
+        if not m:
+            continue
+        if open_fence is None:
+            open_fence = Fence(start=i, end=len(lines), info=m.group(2), indent=m.group(1))
+        else:
+            open_fence.end = i
+            fences.append(open_fence)
+            open_fence = None
+    if open_fence is not None:
+        fences.append(open_fence)
+    return fences
+
+
+def _score(body: Sequence[str]) -> Dict[str, float]:
+    scores = dict.fromkeys(PROFILES, 0.0)
+    n = 0
+    for line in body:
+        if not line.strip():
+            continue
+        n += 1
+        tokens = ['-flag' if t[0] == '-' and len(t) > 1 and t[1] != '-' or t[:2] == '--' and len(t) > 2
+                  else t for t in TOKEN_RE.findall(line)]
+        lead = tokens[0] if tokens else ''
+        for lang, profile in PROFILES.items():
+            s = profile['lead'].get(lead, 0)
+            anyw = profile['any']
+            if anyw:
+                s += sum(anyw.get(t, 0) for t in tokens) / max(len(tokens), 1) * 3
+            scores[lang] += s
+        for lang, features in LINE_FEATURES.items():
+            for pattern, weight in features:
+                if pattern.search(line):
+                    scores[lang] += weight
+    if not n:
+        return scores
+    first = next((line for line in body if line.strip() and not line.lstrip().startswith('%%')), '')
+    if MERMAID_HEADER.match(first):
+        scores['mermaid'] += 10 * n
+    text = '\n'.join(body).strip()
+    if text[:1] in '{[':
+        try:
+            json.loads(text)
+            scores['json'] += 10 * n
+        except ValueError:
+            pass
+    return {lang: s / n for lang, s in scores.items()}
+
+
+def _classify(body: Sequence[str]) -> str:
+    scores = _score(body)
+    lang, best = max(scores.items(), key=lambda kv: kv[1])
+    if best < MIN_SCORE:
+        return 'text'
+    if lang == 'bash' and any(ZSH_MARKERS.search(line) for line in body):
+        return 'zsh'
+    return lang
+
+
+def classify_block(body: Sequence[str]) -> str:
+    """Return the most likely fence language for ``body`` (default 'text')."""
+    key = hashlib.blake2b('\n'.join(body).encode('utf-8'), digest_size=16).digest()
+    lang = _cache.get(key)
+    if lang is None:
+        _stats['misses'] += 1
+        lang = _cache[key] = _classify(body)
+    else:
+        _stats['hits'] += 1
+    return lang
+
+
+def cache_stats() -> Dict[str, int]:
+    """Return memo hit/miss counts (useful for reporting corpus reuse)."""
+    return dict(_stats, size=len(_cache))
+
+
+def tag_unlabeled_fences(lines: Sequence[str]) -> List[str]:
+    """Return ``lines`` with every unlabeled opening fence tagged.
+
+    Closing fences and block contents are copied untouched.
+    """
+    out = list(lines)
+    for fence in index_fences(lines):
+        if not fence.info:
+            out[fence.start] = f"{fence.indent}```{classify_block(fence.body(lines))}"
+    return out
@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""
+Markdown lint rule engine with check and fix modes.
+
+Rules (MD009, MD012, MD022, MD031, MD032, MD040, MD047 and the local
+ZF001 fence rule) live in one registry and are evaluated together in a
+single walk over each file's lines, instead of one split/join pass per
+fixer. Files are processed in parallel and per-rule timings are collected.
+
+Usage:
+    python3 bin/md_lint.py --check [PATH ...]
+    python3 bin/md_lint.py --fix [--rules MD022,MD031] [--jobs N] [PATH ...]
+
+The consolidated report is written to docs/reports/markdown-lint-report.md
+(override with --report, disable with --no-report). Fixes go through the
+backup journal, so a --fix run can be undone with backup_journal.py.
+
+--stream lints through md_stream.LineWindow instead of the whole text:
+lines are read lazily from an mmap, released once the walk has passed
+them, and fixed output is written incrementally by the worker.
+
+Exit codes:
+    0 - no violations remain
+    1 - violations found (check mode) or left unfixed
+"""
+
+import argparse
+import fnmatch
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from md_fences import FENCE_RE, classify_block
+from md_stream import LineWindow, iter_lines, join_lines, shape
+
+ROOT = Path(__file__).resolve().parent.parent
+DOCS = ROOT / 'docs'
+REPORT = DOCS / 'reports' / 'markdown-lint-report.md'
+DEFAULT_EXCLUDES = ['*.ARCHIVE*', '*.backup-*', '*/reports/markdown-lint-report.md']
+
+HEADING_RE = re.compile(r'^#{1,6}(\s|$)')
+LIST_RE = re.compile(r'^\s*([-+*]|\d+[.)])\s+')
+
+# Line kinds produced by the classifier
+BLANK, TEXT, HEADING, LIST, FENCE_OPEN, FENCE_CLOSE, CODE = (
+    'blank', 'text', 'heading', 'list', 'fence_open', 'fence_close', 'code')
+
+
+@dataclass
+class Violation:
+    rule: str
+    line: int  # 1-based
+    message: str
+
+
+@dataclass
+class Edit:
+    """What a rule wants done to the current line in fix mode."""
+
+    blank_before: bool = False
+    blank_after: bool = False
+    # Applied to the line as left by the rules before this one, so edits
+    # from several rules to one line add up instead of overwriting.
+    rewrite: Optional[Callable[[str], str]] = None
+    drop: bool = False
+
+
+@dataclass
+class Context:
+    """Shared state for one walk; rules only read it.
+
+    Line kinds are classified lazily, at most one line ahead of the walk,
+    so classification and rule evaluation share a single pass. Rules look
+    at most one line behind, so everything older can be released.
+
+    ``fence_indents`` holds the indentation each fence line should have:
+    none at the top level, the opening fence's own inside a list item.
+    """
+
+    lines: Sequence[str]
+    trailing_newline: bool = True
+    kinds: Dict[int, str] = field(default_factory=dict)
+    fence_indents: Dict[int, str] = field(default_factory=dict)
+    in_fence: bool = False
+    open_indent: str = ''
+    list_indent: Optional[int] = None  # content column of the open list item
+    classified: int = 0
+    released: int = 0
+
+    def kind(self, i: int) -> str:
+        if i < 0 or i >= len(self.lines):
+            return BLANK
+        while self.classified <= i:
+            self.kinds[self.classified] = self._classify(self.lines[self.classified])
+            self.classified += 1
+        return self.kinds[i]
+
+    def release(self, upto: int):
+        """Drop kinds (and, for a LineWindow, lines) before index ``upto``."""
+        for j in range(self.released, min(upto, self.classified)):
+            del self.kinds[j]
+            self.fence_indents.pop(j, None)
+        self.released = max(self.released, min(upto, self.classified))
+        if isinstance(self.lines, LineWindow):
+            self.lines.release(self.released)
+
+    def _classify(self, line: str) -> str:
+        m = FENCE_RE.match(line)
+        if m:
+            self.in_fence = not self.in_fence
+            if self.in_fence:
+                nested = self.list_indent is not None and len(m.group(1)) >= self.list_indent
+                self.open_indent = m.group(1) if nested else ''
+            self.fence_indents[self.classified] = self.open_indent
+            return FENCE_OPEN if self.in_fence else FENCE_CLOSE
+        if self.in_fence:
+            return CODE
+        if not line.strip():
+            return BLANK
+        previous = self.kinds.get(self.classified - 1)
+        if HEADING_RE.match(line):
+            self.list_indent = None
+            return HEADING
+        m = LIST_RE.match(line)
+        if m:
+            self.list_indent = m.end()
+            return LIST
+        # A line right after a list item continues it, indented or not
+        # (a lazy continuation line)
+        if previous == LIST:
+            return LIST
+        if self.list_indent is not None and len(line) - len(line.lstrip()) < self.list_indent:
+            self.list_indent = None
+        return TEXT
+
+
+class Rule:
+    id = ''
+    description = ''
+
+    def visit(self, ctx: Context, i: int) -> Optional[Edit]:
+        """Inspect line ``i``; return an Edit when it violates the rule."""
+        return None
+
+    def finish(self, ctx: Context) -> Optional[Violation]:
+        """Whole-file check run once after the walk."""
+        return None
+
+
+RULES: Dict[str, Rule] = {}
+
+
+def register(cls):
+    RULES[cls.id] = cls()
+    return cls
+
+
+@register
+class TrailingSpaces(Rule):
+    id = 'MD009'
+    description = 'Trailing spaces'
+
+    def visit(self, ctx, i):
+        line = ctx.lines[i]
+        if ctx.kind(i) in (CODE, BLANK) or line == line.rstrip():
+            return None
+        # exactly two spaces is a deliberate hard line break
+        if line.endswith('  ') and not line.endswith('   ') and line.strip():
+            return None
+        return Edit(rewrite=str.rstrip)
+
+
+@register
+class MultipleBlanks(Rule):
+    id = 'MD012'
+    description = 'Multiple consecutive blank lines'
+
+    def visit(self, ctx, i):
+        if ctx.kind(i) == BLANK and i > 0 and ctx.kind(i - 1) == BLANK:
+            return Edit(drop=True)
+        return None
+
+
+@register
+class HeadingBlanks(Rule):
+    id = 'MD022'
+    description = 'Headings should be surrounded by blank lines'
+
+    def visit(self, ctx, i):
+        if ctx.kind(i) != HEADING:
+            return None
+        before = i > 0 and ctx.kind(i - 1) != BLANK
+        after = i + 1 < len(ctx.lines) and ctx.kind(i + 1) != BLANK
+        if before or after:
+            return Edit(blank_before=before, blank_after=after)
+        return None
+
+
+@register
+class FenceBlanks(Rule):
+    id = 'MD031'
+    description = 'Fenced code blocks should be surrounded by blank lines'
+
+    def visit(self, ctx, i):
+        k = ctx.kind(i)
+        if k == FENCE_OPEN and i > 0 and ctx.kind(i - 1) != BLANK:
+            return Edit(blank_before=True)
+        if k == FENCE_CLOSE and i + 1 < len(ctx.lines) and ctx.kind(i + 1) != BLANK:
+            return Edit(blank_after=True)
+        return None
+
+
+@register
+class ListBlanks(Rule):
+    id = 'MD032'
+    description = 'Lists should be surrounded by blank lines'
+
+    def visit(self, ctx, i):
+        if ctx.kind(i) != LIST:
+            return None
+        before = i > 0 and ctx.kind(i - 1) not in (BLANK, LIST)
+        after = i + 1 < len(ctx.lines) and ctx.kind(i + 1) not in (BLANK, LIST)
+        if before or after:
+            return Edit(blank_before=before, blank_after=after)
+        return None
+
+
+@register
+class FenceLanguage(Rule):
+    id = 'MD040'
+    description = 'Fenced code blocks should have a language specified'
+
+    def visit(self, ctx, i):
+        if ctx.kind(i) != FENCE_OPEN:
+            return None
+        m = FENCE_RE.match(ctx.lines[i])
+        if m.group(2):
+            return None
+        end = i + 1
+        while end < len(ctx.lines) and not FENCE_RE.match(ctx.lines[end]):
+            end += 1
+        language = classify_block(ctx.lines[i + 1:end])
+        return Edit(rewrite=lambda line: line.rstrip() + language)
+
+
+@register
+class FinalNewline(Rule):
+    id = 'MD047'
+    description = 'Files should end with a single newline character'
+
+    def finish(self, ctx):
+        if ctx.lines and not ctx.trailing_newline:
+            return Violation(self.id, len(ctx.lines), self.description)
+        return None
+
+
+@register
+class FenceShape(Rule):
+    id = 'ZF001'
+    description = 'Code fences start in column 1 (in a list item, at its indent); closing fences carry no info string'
+
+    def visit(self, ctx, i):
+        k = ctx.kind(i)
+        if k not in (FENCE_OPEN, FENCE_CLOSE):
+            return None
+        line = ctx.lines[i]
+        indent = ctx.fence_indents[i]
+        if k == FENCE_OPEN and line != indent + line.strip():
+            return Edit(rewrite=lambda line: indent + line.strip())
+        if k == FENCE_CLOSE and line != indent + '```':
+            return Edit(rewrite=lambda line: indent + '```')
+        return None
+
+
+@dataclass
+class LintResult:
+    violations: List[Violation] = field(default_factory=list)
+    text: str = ''
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def _walk(ctx: Context, active: Sequence[Rule], fix: bool, result: LintResult) -> Iterator[str]:
+    """Evaluate ``active`` rules over every line of ``ctx``.
+
+    Violations and timings are recorded on ``result``; in fix mode the
+    corrected lines are yielded as the walk proceeds.
+    """
+    timings = result.timings
+    clock = time.perf_counter
+    last = None
+    need_blank = False
+
+    for i in range(len(ctx.lines)):
+        line = ctx.lines[i]
+        edits = []
+        for rule in active:
+            t0 = clock()
+            edit = rule.visit(ctx, i)
+            timings[rule.id] += clock() - t0
+            if edit is not None:
+                result.violations.append(Violation(rule.id, i + 1, rule.description))
+                edits.append(edit)
+        ctx.release(i - 1)
+        if not fix:
+            continue
+        if any(e.drop for e in edits):
+            continue
+        for e in edits:
+            if e.rewrite is not None:
+                line = e.rewrite(line)
+        # Blank lines are inserted lazily so a requested blank never
+        # doubles up with one already in the source.
+        if line.strip() and last and last.strip() and (need_blank or any(e.blank_before for e in edits)):
+            yield ''
+        yield line
+        last = line
+        need_blank = any(e.blank_after for e in edits)
+
+
+def _finish(ctx: Context, active: Sequence[Rule], result: LintResult) -> bool:
+    """Run whole-file checks; return whether the output ends with a newline."""
+    ending = ctx.trailing_newline
+    for rule in active:
+        t0 = time.perf_counter()
+        v = rule.finish(ctx)
+        result.timings[rule.id] += time.perf_counter() - t0
+        if v is not None:
+            result.violations.append(v)
+            ending = True
+    return ending
+
+
+def _start(rules: Optional[Sequence[str]]):
+    active = [RULES[r] for r in (rules or RULES)]
+    return active, LintResult(timings=dict.fromkeys((r.id for r in active), 0.0))
+
+
+def lint_text(text: str, rules: Optional[Sequence[str]] = None, fix: bool = False) -> LintResult:
+    """Run ``rules`` (default: all) over ``text`` in one walk.
+
+    In fix mode ``result.text`` holds the corrected document; otherwise it
+    is the input unchanged.
+    """
+    active, result = _start(rules)
+    lines = text.split('\n')
+    trailing_newline = lines[-1] == ''
+    if trailing_newline:
+        lines.pop()
+    ctx = Context(lines=lines, trailing_newline=trailing_newline)
+    out = list(_walk(ctx, active, fix, result))
+    ending = _finish(ctx, active, result)
+    result.text = '\n'.join(out) + ('\n' if ending else '') if fix else text
+    return result
+
+
+def fix_text(text: str, rules: Optional[Sequence[str]] = None) -> str:
+    """Return ``text`` with every fixable violation of ``rules`` corrected."""
+    return lint_text(text, rules, fix=True).text
+
+
+def find_markdown_files(paths, exclude=DEFAULT_EXCLUDES) -> List[Path]:
+    """Expand files/directories into a sorted list of Markdown files."""
+    found = set()
+    for base in paths:
+        base = Path(base)
+        candidates = [base] if base.is_file() else base.rglob('*.md')
+        for p in candidates:
+            rel = os.path.relpath(p, ROOT)
+            if not any(fnmatch.fnmatch(rel, pat) for pat in exclude):
+                found.add(p)
+    return sorted(found)
+
+
+def lint_file(path: Path, rules=None, fix=False):
+    """Worker entry point: lint one file; return (path, result, changed)."""
+    text = path.read_text(encoding='utf-8')
+    result = lint_text(text, rules, fix)
+    return path, result, fix and result.text != text
+
+
+def stream_file(path: Path, rules=None, fix=False, run=None):
+    """Bounded-memory ``lint_file``: return (path, result, journal entry).
+
+    The file is walked through a LineWindow over its mmap; in fix mode the
+    corrected text is streamed straight into the file through ``run`` (a
+    run of its own, closed before returning, when None), so ``result.text``
+    stays empty and the entry is None when nothing changed. In a worker
+    process ``run`` is a copy: the caller merges the entry with Run.add.
+    """
+    active, result = _start(rules)
+    length, trailing_newline = shape(path)
+    ctx = Context(lines=LineWindow(iter_lines(path), length), trailing_newline=trailing_newline)
+    body = _walk(ctx, active, fix, result)
+    if not fix:
+        for _ in body:
+            pass
+        _finish(ctx, active, result)
+        return path, result, None
+
+    def chunks():
+        yield from join_lines(body)
+        if _finish(ctx, active, result):
+            yield '\n'
+
+    if run is not None:
+        return path, result, run.write_chunks(path, chunks())
+    from backup_journal import Journal
+    with Journal().start_run('md-lint') as own:
+        return path, result, own.write_chunks(path, chunks())
+
+
+def run_jobs(worker, jobs: int, calls):
+    """Yield ``worker(*args)`` for each of ``calls``, in order.
+
+    With a pool, a failing job does not hide the jobs that already ran:
+    every outcome is yielded first and the first error raised at the end,
+    so a --stream --fix run records each file its workers rewrote.
+    """
+    if jobs <= 1 or len(calls) <= 1:
+        for args in calls:
+            yield worker(*args)
+        return
+    error = None
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for future in [pool.submit(worker, *args) for args in calls]:
+            try:
+                yield future.result()
+            except Exception as e:
+                error = error or e
+    if error is not None:
+        raise error
+
+
+def write_report(report: Path, results, rules, elapsed: float, fixed: bool):
+    """Write the consolidated Markdown lint report."""
+    by_rule = Counter(v.rule for _, r in results for v in r.violations)
+    timings = defaultdict(float)
+    for _, r in results:
+        for rule_id, t in r.timings.items():
+            timings[rule_id] += t
+    dirty = [(p, r) for p, r in results if r.violations]
+    generated = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    out = [
+        '# Markdown Lint Report — zsh/docs',
+        '',
+        f'Generated: {generated}',
+        f'Scope: {len(results)} files (excluding {", ".join(f"`{x}`" for x in DEFAULT_EXCLUDES)})',
+        f'Mode: {"fix" if fixed else "check"}',
+        f'Elapsed: {elapsed:.2f}s',
+        '',
+        '## Summary',
+        '',
+        f'- Files scanned: {len(results)}',
+        f'- Files with violations: {len(dirty)}',
+        f'- Total violations: {sum(by_rule.values())}',
+        '',
+        '## Rules',
+        '',
+        '| Rule | Description | Violations | Time (ms) |',
+        '| ---- | ----------- | ---------: | --------: |',
+    ]
+    for rule_id in rules:
+        out.append(f'| {rule_id} | {RULES[rule_id].description} | {by_rule.get(rule_id, 0)} '
+                   f'| {timings.get(rule_id, 0.0) * 1000:.1f} |')
+    out += ['', '## Files', '']
+    if not dirty:
+        out.append('No violations found.')
+    else:
+        out += ['| File | ' + ' | '.join(rules) + ' |',
+                '| ---- | ' + ' | '.join('---:' for _ in rules) + ' |']
+        for path, r in dirty:
+            counts = Counter(v.rule for v in r.violations)
+            rel = os.path.relpath(path, ROOT)
+            out.append(f'| `{rel}` | ' + ' | '.join(str(counts.get(x, '')) for x in rules) + ' |')
+    out += ['', '---', '', '*Generated by `bin/md_lint.py`*', '']
+    report.parent.mkdir(parents=True, exist_ok=True)
+    report.write_text('\n'.join(out), encoding='utf-8')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Lint (and optionally fix) Markdown files')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--check', action='store_true', help='Report violations only (default)')
+    mode.add_argument('--fix', action='store_true', help='Rewrite files to fix violations')
+    parser.add_argument('paths', nargs='*', type=Path, default=[DOCS],
+                        help='Files or directories to lint (default: docs/)')
+    parser.add_argument('--rules', help='Comma-separated rule ids (default: all)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                        help='Additional paths (relative to the zsh root) to skip')
+    parser.add_argument('--report', type=Path, default=REPORT,
+                        help='Report path (default: docs/reports/markdown-lint-report.md)')
+    parser.add_argument('--no-report', action='store_true', help='Do not write the report')
+    parser.add_argument('--list-rules', action='store_true', help='List registered rules and exit')
+    parser.add_argument('--stream', action='store_true',
+                        help='Bounded-memory mode: read via mmap, write fixes incrementally')
+    args = parser.parse_args(argv)
+
+    if args.list_rules:
+        for rule in RULES.values():
+            print(f'{rule.id}  {rule.description}')
+        return 0
+
+    rules = args.rules.split(',') if args.rules else list(RULES)
+    unknown = [r for r in rules if r not in RULES]
+    if unknown:
+        print(f"✗ Unknown rule(s): {', '.join(unknown)}")
+        return 2
+
+    files = find_markdown_files(args.paths, DEFAULT_EXCLUDES + args.exclude)
+    started = time.perf_counter()
+    n = len(files)
+    from backup_journal import Journal
+    outcomes = []
+    changed = 0
+    # The run is open before any file is touched and closed on the way
+    # out, so files fixed before an error still get a manifest.
+    with Journal().start_run('md-lint') as run:
+        worker, extra = (stream_file, (run,)) if args.stream else (lint_file, ())
+        calls = [(p, rules, args.fix, *extra) for p in files]
+        for path, result, outcome in run_jobs(worker, args.jobs, calls):
+            outcomes.append((path, result, outcome))
+            if args.stream and outcome:
+                run.add(outcome)
+                changed += 1
+            elif outcome is True:
+                run.write_text(path, result.text)
+                changed += 1
+    results = [(p, r) for p, r, _ in outcomes]
+    total = sum(len(r.violations) for _, r in results)
+    remaining = total
+    if args.fix:
+        # Lint what was written: a fix can leave (or expose) violations
+        recheck = [(p, rules, False) for p, r in results if r.violations]
+        remaining = sum(len(r.violations) for _, r, _ in run_jobs(worker, args.jobs, recheck))
+    elapsed = time.perf_counter() - started
+
+    for path, r in results:
+        for v in r.violations:
+            if not args.fix:
+                print(f'{os.path.relpath(path, ROOT)}:{v.line}: {v.rule} {v.message}')
+
+    if not args.no_report:
+        write_report(args.report, results, rules, elapsed, args.fix)
+
+    print(f"\n{'Fixed' if args.fix else 'Found'} {total} violations in {n} files ({elapsed:.2f}s)")
+    if args.fix:
+        print(f'Files modified: {changed}')
+        if remaining:
+            print(f'✗ {remaining} violations remain after fixing')
+        if run.entries:
+            print(f'Rollback: python3 bin/backup_journal.py rollback {run.run_id}')
+    if not args.no_report:
+        print(f'Report: {args.report}')
+    return 0 if remaining == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Bounded-memory line streaming for the Markdown tools.
+
+The default code paths do ``read()`` + ``split('\\n')`` and build a second
+list plus a joined string, holding several copies of each file at once.
+In streaming mode a file is scanned through a read-only mmap and a lazy
+line iterator instead; only the regions a tool rewrites (the TOC, the
+heading list, a fenced block) are materialized, and output is written
+incrementally to a temp file that is renamed into place. Peak memory then
+follows the largest edited region rather than the file size.
+
+Library usage:
+    from md_stream import iter_lines, write_lines
+    headings = collect(iter_lines(path))           # pass 1: small summary
+    write_lines(path, rewrite(iter_lines(path)))   # pass 2: stream output
+"""
+
+import mmap
+import os
+from collections.abc import Sequence
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple
+
+from backup_journal import atomic_write_chunks, hash_file
+
+CHUNK = 1 << 20
+
+
+@contextmanager
+def mapped(path):
+    """Map ``path`` read-only; empty files yield ``b''`` (mmap rejects them)."""
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def iter_lines(path, encoding='utf-8') -> Iterator[str]:
+    """Yield the lines of ``path`` exactly as ``text.split('\\n')`` would.
+
+    A trailing newline produces a final empty string and CRLF endings are
+    normalized, matching what the tools see when reading in text mode.
+    """
+    with mapped(path) as mm:
+        pos = 0
+        while True:
+            nl = mm.find(b'\n', pos)
+            end = len(mm) if nl == -1 else nl
+            line = mm[pos:end].decode(encoding)
+            yield line[:-1] if line.endswith('\r') else line
+            if nl == -1:
+                return
+            pos = nl + 1
+
+
+def shape(path) -> Tuple[int, bool]:
+    """Return (number of lines, ends with newline) without decoding.
+
+    The count excludes the empty string ``split`` yields after a final
+    newline, i.e. it is the length of the list the linters iterate.
+    """
+    with mapped(path) as mm:
+        count = sum(mm[i:i + CHUNK].count(b'\n') for i in range(0, len(mm), CHUNK))
+        trailing = len(mm) > 0 and mm[len(mm) - 1:] == b'\n'
+    return (count if trailing else count + 1), trailing
+
+
+def join_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Yield chunks equal to ``'\\n'.join(lines)`` without building the string."""
+    first = True
+    for line in lines:
+        if first:
+            first = False
+            yield line
+        else:
+            yield '\n'
+            yield line
+
+
+def write_lines(path, lines: Iterable[str], run=None) -> bool:
+    """Stream ``'\\n'.join(lines)`` into ``path``; return True if it changed.
+
+    With a journal ``run`` the original is recorded first; otherwise the
+    file is replaced atomically. Unchanged output leaves the file alone.
+    """
+    if run is not None:
+        return run.write_chunks(path, join_lines(lines)) is not None
+    path = Path(path)
+    mode = path.stat().st_mode & 0o7777
+    return atomic_write_chunks(path, join_lines(lines), mode, unless=hash_file(path)) is not None
+
+
+class LineWindow(Sequence):
+    """Random access into a line iterator that keeps only a sliding window.
+
+    Lines are pulled from the iterator on demand (so a rule may look ahead
+    to the end of a fenced block) and dropped again with ``release``.
+    ``length`` must be known up front; see ``shape``.
+    """
+
+    def __init__(self, lines: Iterable[str], length: int):
+        self._it = iter(lines)
+        self._len = length
+        self._base = 0
+        self._buf = []
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._len))]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError(i)
+        if i < self._base:
+            raise IndexError(f'line {i} was already released')
+        while self._base + len(self._buf) <= i:
+            self._buf.append(next(self._it))
+        return self._buf[i - self._base]
+
+    def release(self, upto: int):
+        """Forget every buffered line before index ``upto``."""
+        drop = min(upto - self._base, len(self._buf))
+        if drop > 0:
+            del self._buf[:drop]
+            self._base += drop
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+High-contrast recoloring for Mermaid diagrams.
+
+The palette lives in mermaid-palette.json next to this file and is compiled
+into a single alternation regex with a dispatch callback. Only the bodies
+of ```mermaid fences (located with md_fences.index_fences) are scanned, so
+each diagram is read once instead of running one re.sub per color over the
+whole document.
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Tuple
+
+from md_fences import index_fences
+
+PALETTE_FILE = Path(__file__).resolve().parent / 'mermaid-palette.json'
+
+# Statement that owns a style on the current line: `style A ...` / `classDef x ...`
+STYLE_OWNER_RE = re.compile(r'^\s*(style|classDef)\s+([\w,-]+)', re.MULTILINE)
+
+
+@dataclass
+class Recolor:
+    """One fill rewritten inside a diagram."""
+
+    line: int      # 1-based line number in the document
+    node: str      # node id / class name the style applies to ('' if inline)
+    old: str
+    new: str
+
+
+@lru_cache(maxsize=None)
+def load_palette(path: Path = PALETTE_FILE):
+    """Compile the palette file into (pattern, dispatch callback builder)."""
+    palette = json.loads(Path(path).read_text(encoding='utf-8'))
+    colors = {k.lower(): v for k, v in palette['colors'].items()}
+    legacy_stroke = re.escape(palette['legacy_stroke'])
+    alternation = '|'.join(re.escape(c.lstrip('#')) for c in colors)
+    # fill:#light[,stroke:#333[,stroke-width:Npx]][,color:#xxx] not followed by
+    # further style properties (those are left for a human to review).
+    pattern = re.compile(
+        rf'fill:#(?P<color>{alternation})'
+        rf'(?:,stroke:{legacy_stroke}(?:,stroke-width:(?P<width>\d+)px)?)?'
+        r'(?:,color:#[0-9a-fA-F]{3,6})?'
+        r'(?![\w,-])',
+        re.IGNORECASE,
+    )
+
+    def replacement(m: re.Match) -> str:
+        style = colors['#' + m.group('color').lower()]
+        width = f"{m.group('width')}px" if m.group('width') else palette['stroke_width']
+        return (f"fill:{style['fill']},stroke:{style['stroke']},"
+                f"stroke-width:{width},color:{palette['text_color']}")
+
+    return pattern, replacement
+
+
+def recolor_diagram(body: str, first_line: int = 1) -> Tuple[str, List[Recolor]]:
+    """Recolor one diagram body in a single scan; return (text, report)."""
+    pattern, replacement = load_palette()
+    report = []
+
+    def dispatch(m: re.Match) -> str:
+        new = replacement(m)
+        line_start = body.rfind('\n', 0, m.start()) + 1
+        owner = STYLE_OWNER_RE.match(body, line_start)
+        report.append(Recolor(
+            line=first_line + body.count('\n', 0, m.start()),
+            node=owner.group(2) if owner else '',
+            old=m.group(0),
+            new=new,
+        ))
+        return new
+
+    return pattern.sub(dispatch, body), report
+
+
+def recolor_mermaid(content: str) -> Tuple[str, List[Recolor]]:
+    """Recolor every ```mermaid block in ``content``.
+
+    Text outside Mermaid fences is never touched.
+    """
+    lines = content.split('\n')
+    report = []
+    for fence in index_fences(lines):
+        if fence.info.lower() != 'mermaid':
+            continue
+        body = '\n'.join(fence.body(lines))
+        new_body, hits = recolor_diagram(body, first_line=fence.start + 2)
+        if hits:
+            lines[fence.start + 1:fence.end] = new_body.split('\n')
+            report.extend(hits)
+    return '\n'.join(lines), report
@@ -0,0 +1,547 @@
+#!/usr/bin/env python3
+"""
+Flattened, deduplicated PATH/FPATH/MANPATH cache for this host.
+
+The zshenv layer, .zshenv.local and the pre-plugin fragments prepend and
+append to PATH, FPATH and MANPATH dozens of times, with existence checks,
+duplicates and directories that are missing on most machines. This tool
+evaluates those mutations symbolically, on the structural tokenizer
+(zsh_blocks.py), and writes the end result to one file:
+
+    $ZSH_CACHE_DIR/path-cache.zsh
+
+The value a shell inherits is unknown ahead of time, so it is kept as a
+placeholder and the cache records what goes before and after it. The
+`env` stage covers the zshenv layer (with .zshenv.local inlined where it
+is sourced); the `rc` stage adds the pre-plugin fragments and is what
+interactive shells apply. .zshenv.02 sources the file once, checks that no
+input is newer and that no directory that was missing now exists, then
+sets the arrays under `typeset -U`. Until the end of the layers the
+cache covers (_ZF_PATH_CACHED), the zf::path_* helpers skip entries that
+are already present, so the mutations cost a string match each.
+
+Evaluation rules:
+- scalar assignments, `: ${VAR:=...}` and `for x in ...` loops are
+  followed; `$(realpath X)`, `$(dirname X)` and `$(basename X)` are
+  computed, any other command substitution makes a value unknown (a
+  fallback branch that cannot be evaluated keeps the earlier value)
+- `PATH=...`, `path=(...)`, `path+=...` (and fpath/manpath) and the
+  zf::path_prepend/append/remove/dedupe helpers are applied in order
+- code guarded only by existence tests (`[[ -d X ]]`, `-e`, `-f`, ...,
+  joined with && or ||) is assumed to run, since a directory appearing
+  invalidates the cache; conditional mutations that would drop entries
+  (a replacement without $PATH, a removal) are skipped
+- path mutations guarded by anything else (a toggle such as
+  ZF_DISABLE_EARLY_JS, `-o interactive`, a `case`) depend on the running
+  shell: they are not evaluated and run at startup as usual
+- code inside function bodies and while loops is not evaluated
+- anything that cannot be evaluated is reported and left to run as usual
+
+Usage:
+    python3 bin/path_cache.py [-o FILE] [--env NAME=VALUE] [--show]
+                              [--check] [--quiet]
+
+Exit codes:
+    0 - success (--check: cache is current)
+    1 - error (--check: cache is missing or stale)
+"""
+
+import argparse
+import os
+import re
+import socket
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from backup_journal import atomic_write_chunks
+from toggle_index import find_zshenv_local
+from zsh_blocks import Command, scan, split_words
+from zsh_manifest import FAMILIES, default_manifest_path, resolve_layer, resolve_live
+
+ROOT = Path(__file__).resolve().parent.parent
+INHERITED = '%inherited%'
+LISTS = ('path', 'fpath', 'manpath')
+TIED = {'PATH': 'path', 'FPATH': 'fpath', 'MANPATH': 'manpath'}
+HELPERS = {
+    'zf::path_prepend': 'prepend',
+    'zf::path_append': 'append',
+    'zf::path_remove': 'remove',
+    'zf::path_dedupe': 'dedupe',
+}
+DECLARE = {'export', 'typeset', 'declare', 'local', 'readonly', 'integer', 'float'}
+# Marker that stands for the current value of a list inside a scalar
+TOKEN = '\0{}\0'
+# Test operators that only ask whether a path exists
+EXISTENCE_TESTS = {'-a', '-d', '-e', '-f', '-h', '-L', '-r', '-s', '-x'}
+# ``conditional`` value of code that only runs depending on the shell
+TOGGLE = 'toggle'
+
+ASSIGN_RE = re.compile(r'^([A-Za-z_]\w*)(\+?)=(.*)$', re.DOTALL)
+ARRAY_REF_RE = re.compile(r'^"?\$\{?(path|fpath|manpath)(?:\[[@*]\])?\}?"?$')
+PARAM_RE = re.compile(r'^([A-Za-z_]\w*)(?:(:?[-=+])(.*))?$', re.DOTALL)
+# Substitutions whose output only depends on the filesystem
+PURE_SUBST = {
+    'realpath': os.path.realpath,
+    'dirname': os.path.dirname,
+    'basename': os.path.basename,
+}
+
+
+class Unknown(Exception):
+    """A value depends on something only the running shell knows."""
+
+
+def existence_test(cmd: Command) -> bool:
+    """True for `[[ -d X ]]`-style tests of paths, possibly joined and negated."""
+    if len(cmd.stages) != 1:
+        return False
+    words = split_words(cmd.stages[0])
+    if words[:1] == ['test']:
+        words = ['[', *words[1:], ']']
+    if len(words) < 4 or (words[0], words[-1]) not in (('[[', ']]'), ('[', ']')):
+        return False
+    body, i = words[1:-1], 0
+    while True:
+        if i < len(body) and body[i] == '!':
+            i += 1
+        if i + 1 >= len(body) or body[i] not in EXISTENCE_TESTS:
+            return False
+        i += 2
+        if i == len(body):
+            return True
+        if body[i] not in ('&&', '||'):
+            return False
+        i += 1
+
+
+def _closing(text: str, i: int) -> int:
+    """Index of the '}' closing the '${' whose body starts at ``i``."""
+    depth = 1
+    while i < len(text):
+        if text.startswith('${', i):
+            depth += 1
+            i += 2
+            continue
+        if text[i] == '}':
+            depth -= 1
+            if not depth:
+                return i
+        i += 1
+    raise Unknown('unbalanced ${')
+
+
+class PathEvaluator:
+    def __init__(self, env: Dict[str, str]):
+        self.env: Dict[str, Optional[str]] = dict(env)
+        self.lists: Dict[str, List[str]] = {name: [INHERITED] for name in LISTS}
+        self.touched = set()
+        self.origin: Dict[str, str] = {}
+        self.warnings: List[str] = []
+        self.inline: Dict[str, Tuple[str, str]] = {}
+        self.inlined = set()
+        self.where = ''
+        # (label, if id) -> first branch reached through a runtime toggle
+        self.toggled: Dict[Tuple[str, int], int] = {}
+        self.branches_seen = set()
+
+    # -- expansion -------------------------------------------------------
+
+    def _param(self, body: str) -> str:
+        m = PARAM_RE.match(body)
+        if not m:
+            raise Unknown(f'${{{body}}}')
+        name, op, word = m.groups()
+        if name in TIED or name in LISTS:
+            value = TOKEN.format(TIED.get(name, name))
+        elif name in self.env and self.env[name] is None:
+            raise Unknown(f'${name} comes from a command substitution')
+        else:
+            value = self.env.get(name)
+        is_set = value is not None and (value != '' or ':' not in (op or ''))
+        if not op:
+            return value or ''
+        if op.endswith('-'):
+            return value if is_set else self.expand(word)
+        if op.endswith('='):
+            if not is_set:
+                self.env[name] = self.expand(word)
+                return self.env[name]
+            return value
+        return self.expand(word) if is_set else ''  # + / :+
+
+    def expand(self, word: str) -> str:
+        """Expand one shell word (quotes removed); raise Unknown if impossible."""
+        out, i, n = [], 0, len(word)
+        if word.startswith('~') and (n == 1 or word[1] == '/'):
+            out.append(self.env.get('HOME') or '')
+            i = 1
+        quote = None
+        while i < n:
+            c = word[i]
+            if c == "'" and quote is None:
+                end = word.index("'", i + 1)
+                out.append(word[i + 1:end])
+                i = end + 1
+                continue
+            if c == '"':
+                quote = None if quote else '"'
+                i += 1
+                continue
+            if c == '\\' and i + 1 < n:
+                out.append(word[i + 1])
+                i += 2
+                continue
+            if word.startswith('$(', i) and not word.startswith('$((', i):
+                end = word.find(')', i)
+                args = split_words(word[i + 2:end]) if end > 0 else []
+                if len(args) != 2 or args[0] not in PURE_SUBST or '$(' in args[1]:
+                    raise Unknown('command substitution')
+                out.append(PURE_SUBST[args[0]](self.expand(args[1])))
+                i = end + 1
+                continue
+            if c == '`' or c == '$' and word.startswith('$((', i):
+                raise Unknown('command substitution')
+            if word.startswith('${', i):
+                end = _closing(word, i + 2)
+                out.append(self._param(word[i + 2:end]))
+                i = end + 1
+                continue
+            if c == '$':
+                m = re.match(r'[A-Za-z_]\w*', word[i + 1:])
+                if m:
+                    out.append(self._param(m.group(0)))
+                    i += 1 + m.end()
+                    continue
+                raise Unknown(f'special parameter {word[i:i + 2]}')
+            out.append(c)
+            i += 1
+        return ''.join(out)
+
+    # -- list operations ---------------------------------------------------
+
+    def _scalar_items(self, value: str) -> List[str]:
+        items = []
+        for part in value.split(':'):
+            m = re.fullmatch(r'\0(\w+)\0', part)
+            if m:
+                items += self.lists[m.group(1)]
+            elif '\0' in part:
+                raise Unknown('list value joined to other text')
+            elif part:
+                items.append(part)
+        return items
+
+    def _array_items(self, words: Sequence[str]) -> List[str]:
+        items = []
+        for w in words:
+            m = ARRAY_REF_RE.match(w)
+            if m:
+                items += self.lists[m.group(1)]
+                continue
+            value = self.expand(w)
+            if '\0' in value:
+                raise Unknown('list value inside an array element')
+            if value:
+                items.append(value)
+        return items
+
+    def _set(self, name: str, items: List[str], conditional: bool):
+        if conditional and INHERITED in self.lists[name] and INHERITED not in items:
+            self.warnings.append(f'{self.where}: conditional {name} replacement skipped')
+            return
+        for item in items:
+            self.origin.setdefault(item, self.where)
+        self.lists[name] = items
+        self.touched.add(name)
+
+    def helper(self, op: str, args: Sequence[str], conditional: bool):
+        if conditional == TOGGLE:
+            raise Unknown('guarded by a runtime condition')
+        items = self.lists['path']
+        if op == 'dedupe':
+            self.lists['path'] = list(dict.fromkeys(items))
+            return
+        if op == 'remove' and conditional:
+            self.warnings.append(f'{self.where}: conditional zf::path_remove skipped')
+            return
+        for arg in args:
+            value = self.expand(arg)
+            items = [item for item in items if item != value]
+            if op != 'remove' and os.path.isdir(value):
+                items = [value] + items if op == 'prepend' else items + [value]
+                self.origin.setdefault(value, self.where)
+        self.lists['path'] = items
+        self.touched.add('path')
+
+    # -- commands ------------------------------------------------------------
+
+    def assign(self, word: str, conditional: bool):
+        m = ASSIGN_RE.match(word)
+        name, plus, value = m.groups()
+        if conditional == TOGGLE and (name in TIED or name in LISTS):
+            raise Unknown('guarded by a runtime condition')
+        if value.startswith('(') and value.endswith(')'):
+            if name in LISTS:
+                items = self._array_items(split_words(value[1:-1]))
+                self._set(name, (self.lists[name] + items) if plus else items, conditional)
+            return
+        if name in TIED:
+            items = self._scalar_items(self.expand(value))
+            self._set(TIED[name], items, conditional)
+        elif name in LISTS:
+            items = self._array_items([value])
+            self._set(name, (self.lists[name] + items) if plus else items, conditional)
+        else:
+            try:
+                expanded = self.expand(value)
+            except Unknown:
+                # A fallback branch keeps the value an evaluable one produced
+                if not (conditional and self.env.get(name) is not None):
+                    self.env[name] = None
+                return
+            self.env[name] = (self.env.get(name) or '') + expanded if plus else expanded
+
+    def command(self, cmd: Command, label: str, conditional: bool):
+        if len(cmd.stages) != 1:
+            return
+        words = split_words(cmd.stages[0])
+        if not words:
+            return
+        head = words[0]
+        if head in DECLARE:
+            for w in words[1:]:
+                if ASSIGN_RE.match(w):
+                    self.assign(w, conditional)
+        elif all(ASSIGN_RE.match(w) for w in words):
+            for w in words:
+                self.assign(w, conditional)
+        elif head == ':':
+            for w in words[1:]:
+                self.expand(w)
+        elif head in HELPERS:
+            self.helper(HELPERS[head], words[1:], conditional)
+        elif head in ('source', '.') and len(words) > 1:
+            target = os.path.basename(self.expand(words[1]))
+            if target in self.inline and target not in self.inlined:
+                self.inlined.add(target)
+                inner_label, text = self.inline[target]
+                self.run(scan(text).commands, inner_label)
+        elif head == 'unset':
+            for w in words[1:]:
+                if not w.startswith('-'):
+                    self.env.pop(w, None)
+
+    def run(self, commands: Sequence[Command], label: str, base: int = 0):
+        i = 0
+        while i < len(commands):
+            cmd = commands[i]
+            self.where = f'{label}:{cmd.line}'
+            ctx = cmd.context[base:]
+            body_end = i + 1
+            if cmd.stages[0].startswith('for '):
+                loop_ctx = cmd.context + ('for',)
+                while body_end < len(commands) and commands[body_end].context[:len(loop_ctx)] == loop_ctx:
+                    body_end += 1
+            if 'function' in ctx or 'while' in ctx or 'until' in ctx:
+                i += 1
+                continue
+            conditional = self._guard(commands, i, label, ctx)
+            try:
+                if cmd.stages[0].startswith('for '):
+                    words = split_words(cmd.stages[0])
+                    if len(words) > 3 and words[2] == 'in':
+                        body = commands[i + 1:body_end]
+                        for value in words[3:]:
+                            self.env[words[1]] = self.expand(value)
+                            self.run(body, label, len(cmd.context))
+                    i = body_end
+                    continue
+                self.command(cmd, label, conditional)
+            except Unknown as exc:
+                warning = f'{self.where}: not evaluated ({exc}): {cmd.stages[0][:60]}'
+                if any(v in cmd.stages[0] for v in ('PATH', 'path', 'zf::path_')) and warning not in self.warnings:
+                    self.warnings.append(warning)
+            i += 1
+
+    def _guard(self, commands: Sequence[Command], i: int, label: str, ctx):
+        """False, True (existence tests only) or TOGGLE for ``commands[i]``.
+
+        The first command of an if branch is taken as its condition (an
+        else body is then treated as a toggle, which only costs caching);
+        once a branch needs a toggle, every later branch of that if does.
+        """
+        cmd = commands[i]
+        toggle = 'case' in ctx
+        for if_id, branch in cmd.branches:
+            key = (label, if_id)
+            if (label, if_id, branch) not in self.branches_seen:
+                self.branches_seen.add((label, if_id, branch))
+                if (if_id, branch) == cmd.branches[-1] and not existence_test(cmd):
+                    self.toggled.setdefault(key, branch)
+            if key in self.toggled and branch >= self.toggled[key]:
+                toggle = True
+        j = i
+        while not toggle and commands[j].joined and j > 0:
+            j -= 1
+            toggle = not existence_test(commands[j])
+        if toggle:
+            return TOGGLE
+        return bool(cmd.joined) or any(k in ('if', 'case') for k in ctx)
+
+    # -- result ----------------------------------------------------------------
+
+    def flatten(self, missing: set) -> Dict[str, List[str]]:
+        """Deduplicated, existing entries of every list that was changed."""
+        result = {}
+        for name in LISTS:
+            if name not in self.touched:
+                continue
+            items = []
+            for item in dict.fromkeys(self.lists[name]):
+                if item == INHERITED or (item.startswith('/') and os.path.isdir(item)):
+                    items.append(item)
+                elif item.startswith('/'):
+                    missing.add(item)
+            result[name] = items
+        return result
+
+
+def host_env(overrides: Sequence[Tuple[str, str]]) -> Dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if k not in TIED and k not in LISTS}
+    env.update(overrides)
+    return env
+
+
+def find_inputs(base_dir: Path) -> Tuple[List[Tuple[str, Path]], List[Tuple[str, Path]], Optional[Path]]:
+    """(env inputs, rc inputs, pre-plugin layer dir) with target-style labels."""
+    env_inputs = []
+    live = resolve_live(base_dir, '.zshenv')
+    if live:
+        for name in (live, 'dot_' + live[1:]):
+            if (base_dir / name).is_file():
+                env_inputs.append((live, base_dir / name))
+                break
+    local = find_zshenv_local(base_dir)
+    if local:
+        env_inputs.append(('.zshenv.local', local))
+    rc_inputs = []
+    layer = resolve_live(base_dir, FAMILIES[0])
+    layer_dir = resolve_layer(base_dir, layer) if layer else None
+    if layer_dir:
+        rc_inputs = [(f'{layer}/{p.name}', p) for p in sorted(layer_dir.glob('*.zsh'))]
+    return env_inputs, rc_inputs, layer_dir
+
+
+def evaluate(base_dir: Path, env: Dict[str, str]):
+    env_inputs, rc_inputs, layer_dir = find_inputs(base_dir)
+    ev = PathEvaluator(env)
+    ev.inline = {label: (label, path.read_text(encoding='utf-8', errors='replace'))
+                 for label, path in env_inputs[1:]}
+    for label, path in env_inputs:
+        if label in ev.inlined:
+            continue
+        ev.inlined.add(label)
+        ev.run(scan(path.read_text(encoding='utf-8', errors='replace')).commands, label)
+    missing = set()
+    stages = {'env': ev.flatten(missing)}
+    for label, path in rc_inputs:
+        ev.run(scan(path.read_text(encoding='utf-8', errors='replace')).commands, label)
+    stages['rc'] = ev.flatten(missing)
+    inputs = [p for _, p in env_inputs + rc_inputs] + ([layer_dir] if layer_dir else [])
+    return ev, stages, sorted(missing), inputs
+
+
+def _q(s: str) -> str:
+    return "'" + s.replace("'", "'\\''") + "'"
+
+
+def render_cache(stages, missing: Sequence[str], inputs: Sequence[Path]) -> str:
+    out = ['# Generated by bin/path_cache.py -- do not edit',
+           f'# Host: {socket.gethostname()}',
+           f'# {INHERITED} marks where the inherited value goes']
+    for stage, lists in stages.items():
+        for name, items in lists.items():
+            out.append(f'_zf_pc_{stage}_{name}=(')
+            out += [f'  {_q(item)}' for item in items]
+            out.append(')')
+    out.append('# Newer inputs, or missing directories that appear, invalidate the cache')
+    out.append('_zf_pc_inputs=(' + ' '.join(_q(str(p.resolve())) for p in inputs) + ')')
+    out.append('_zf_pc_missing=(' + ' '.join(_q(m) for m in missing) + ')')
+    return '\n'.join(out) + '\n'
+
+
+def render_report(ev: PathEvaluator, stages, missing: Sequence[str]) -> str:
+    out = []
+    for name, items in stages['rc'].items():
+        raw = len(ev.lists[name])
+        out.append(f'{name} (interactive): {len(items) - 1} entries around the inherited value '
+                   f'({raw - len(items)} duplicate or missing dropped)')
+        for item in items:
+            where = '' if item == INHERITED else ev.origin.get(item, '')
+            out.append(f"  {'·' if item == INHERITED else '+'} {item:<50} {where}")
+        out.append('')
+    if missing:
+        out.append(f'Missing on this host ({len(missing)}):')
+        out += [f'  - {m}' for m in missing]
+        out.append('')
+    for w in ev.warnings:
+        out.append(f'⚠️  {w}')
+    return '\n'.join(out)
+
+
+def default_cache_path() -> Path:
+    return default_manifest_path().with_name('path-cache.zsh')
+
+
+def parse_env(value: str) -> Tuple[str, str]:
+    name, sep, val = value.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f'expected NAME=VALUE, got {value!r}')
+    return name, val
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precompute PATH/FPATH/MANPATH for this host')
+    parser.add_argument('--base-dir', type=Path, default=ROOT,
+                        help='ZDOTDIR or chezmoi source directory (default: %(default)s)')
+    parser.add_argument('-o', '--output', type=Path, default=default_cache_path(),
+                        help='Cache file (default: %(default)s)')
+    parser.add_argument('--env', action='append', type=parse_env, default=[], metavar='NAME=VALUE',
+                        help='Override an environment variable for the evaluation')
+    parser.add_argument('--show', action='store_true', help='Print the evaluated lists and warnings')
+    parser.add_argument('--check', action='store_true', help='Only report whether the cache is stale')
+    parser.add_argument('-q', '--quiet', action='store_true')
+    args = parser.parse_args(argv)
+
+    ev, stages, missing, inputs = evaluate(args.base_dir, host_env(args.env))
+    if not inputs:
+        print(f"❌ No zshenv layer found under {args.base_dir}")
+        return 1
+    text = render_cache(stages, missing, inputs)
+    if args.show:
+        print(render_report(ev, stages, missing))
+
+    try:
+        current = args.output.read_text(encoding='utf-8')
+    except OSError:
+        current = None
+    changed = current != text
+    if args.check:
+        if not args.quiet:
+            print(f"{'⚠️  Stale' if changed else '✅ Current'}: {args.output}")
+        return 1 if changed else 0
+    if changed:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_chunks(args.output, [text])
+    else:
+        os.utime(args.output)  # inputs were touched but not changed: mark the cache fresh again
+    if not args.quiet:
+        counts = ', '.join(f'{name}: {len(items) - 1}' for name, items in stages['rc'].items())
+        print(f"{'📝 Wrote' if changed else '✅ Unchanged'} {args.output} ({counts or 'no changes'}; "
+              f"{len(missing)} missing, {len(ev.warnings)} warning(s))")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
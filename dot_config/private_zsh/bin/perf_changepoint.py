@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Change-point detection over the perf capture history.
+
+perf-regression-classifier.zsh and perf-regression-check.zsh compare the
+latest capture with one baseline against fixed percentage thresholds, so
+a single noisy launch flips the verdict back and forth. This looks at
+the whole history in the perf_history store instead and asks, per
+segment, whether and where the level of the series shifted.
+
+Each capture (all rows of a segment sharing a timestamp) is reduced to
+its median, and the sequence of capture medians is tested with CUSUM
+change-point analysis:
+
+- the cumulative sum of deviations from the mean is formed, and its
+  range is the test statistic
+- the series is shuffled --resamples times; the confidence of a change
+  is the share of shuffles whose range is smaller than the real one
+- if that confidence reaches --confidence, the split point is the one
+  that minimizes the squared error of the two halves, and each half is
+  tested again (binary segmentation) until no confident split is left
+- splits shifting the median by less than --min-pct (default 3%) are
+  not taken, since long histories make even tiny shifts significant
+
+Every change is reported with the commit range it falls in (the git head
+of the last capture before it and the first capture after it), the
+medians on either side, the shift in ms and %, and its confidence.
+
+The output is a badge file in the {"schema", "badge": {...}} shape the
+badge generators and summary scripts already read, with the details
+alongside. The badge reflects the most recent change of each segment:
+an increase beyond --warn-pct is yellow, beyond --fail-pct red (the
+perf-drift-badge defaults, 5% and 10%). The JSON is written compact, as
+the summary scripts grep for '"color":"red"'.
+
+Usage:
+    python3 bin/perf_changepoint.py [SEGMENT...] [--days N] [--min-captures N]
+                                    [--confidence C] [--resamples N] [--min-pct P]
+                                    [--warn-pct P] [--fail-pct P] [--enforce]
+                                    [--store DIR] [-o FILE]
+
+    SEGMENT defaults to every segment with at least --min-captures captures.
+
+Exit codes:
+    0 - no regression (or WARN/FAIL in the default observe mode)
+    1 - the store has no usable history
+    2 - WARN (--enforce only)
+    3 - FAIL (--enforce only)
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from itertools import accumulate, groupby
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from perf_history import HistoryStore, default_store_dir, statistic
+
+STATUS_RANK = {'ok': 0, 'warn': 1, 'fail': 2}
+COLORS = {'ok': 'green', 'warn': 'yellow', 'fail': 'red'}
+
+
+@dataclass
+class Capture:
+    ts: int
+    head: str
+    value: float
+
+
+@dataclass
+class Change:
+    index: int              # first capture of the new level
+    confidence: float
+    before_ms: float
+    after_ms: float
+    delta_ms: float
+    delta_pct: float
+    from_head: str
+    to_head: str
+    from_time: str
+    to_time: str
+    status: str
+
+    @property
+    def commit_range(self) -> str:
+        if self.from_head == self.to_head:
+            return f'{self.from_head[:12]} (no commit between captures)'
+        return f'{self.from_head[:12]}..{self.to_head[:12]}'
+
+
+def captures(rows: Sequence[Tuple[int, str, float]]) -> List[Capture]:
+    """One Capture per timestamp, valued at the median of its rows."""
+    found = []
+    for (ts, head), group in groupby(rows, key=lambda row: (row[0], row[1])):
+        found.append(Capture(ts, head, statistic([value for _, _, value in group], 'median')))
+    return found
+
+
+def cusum_range(values: Sequence[float]) -> float:
+    mean = sum(values) / len(values)
+    sums = list(accumulate((v - mean for v in values), initial=0.0))
+    return max(sums) - min(sums)
+
+
+def change_confidence(values: Sequence[float], resamples: int, rng: random.Random) -> float:
+    """Share of shuffles whose CUSUM range is below that of ``values``."""
+    observed = cusum_range(values)
+    shuffled = list(values)
+    below = 0
+    for _ in range(resamples):
+        rng.shuffle(shuffled)
+        if cusum_range(shuffled) < observed:
+            below += 1
+    return below / resamples
+
+
+def best_split(values: Sequence[float], min_size: int) -> Optional[int]:
+    """Split index minimizing the squared error of the two halves."""
+    n = len(values)
+    prefix = list(accumulate(values, initial=0.0))
+    total = prefix[-1]
+    best, best_gain = None, 0.0
+    for k in range(min_size, n - min_size + 1):
+        left = prefix[k] / k
+        right = (total - prefix[k]) / (n - k)
+        # Minimizing the SSE is maximizing the between-halves term
+        gain = k * (n - k) * (left - right) ** 2
+        if gain > best_gain:
+            best, best_gain = k, gain
+    return best
+
+
+def segment_changes(values: Sequence[float], min_size: int, confidence: float, resamples: int,
+                    rng: random.Random, min_pct: float = 0.0) -> List[Tuple[int, float]]:
+    """(index, confidence) of every change found by binary segmentation.
+
+    Splits whose halves differ by less than ``min_pct`` (median to median)
+    are not taken: with enough captures the test finds shifts far too
+    small to matter, and each accepted split is tested again.
+    """
+    found = []
+    pending = [(0, len(values))]
+    while pending:
+        lo, hi = pending.pop()
+        part = values[lo:hi]
+        if len(part) < 2 * min_size:
+            continue
+        level = change_confidence(part, resamples, rng)
+        if level < confidence:
+            continue
+        split = best_split(part, min_size)
+        if split is None:
+            continue
+        before = statistic(part[:split], 'median')
+        after = statistic(part[split:], 'median')
+        if before and abs(after - before) / before * 100 < min_pct:
+            continue
+        found.append((lo + split, level))
+        pending.extend([(lo, lo + split), (lo + split, hi)])
+    return sorted(found)
+
+
+def describe(caps: List[Capture], found: List[Tuple[int, float]], warn_pct: float,
+             fail_pct: float) -> List[Change]:
+    """Changes with magnitudes measured between neighbouring levels."""
+    bounds = [0] + [index for index, _ in found] + [len(caps)]
+    changes = []
+    for i, (index, level) in enumerate(found):
+        before = statistic([c.value for c in caps[bounds[i]:index]], 'median')
+        after = statistic([c.value for c in caps[index:bounds[i + 2]]], 'median')
+        delta = after - before
+        pct = delta / before * 100 if before else 0.0
+        status = 'fail' if pct > fail_pct else 'warn' if pct > warn_pct else 'ok'
+        changes.append(Change(
+            index=index, confidence=round(level, 3),
+            before_ms=round(before, 2), after_ms=round(after, 2),
+            delta_ms=round(delta, 2), delta_pct=round(pct, 1),
+            from_head=caps[index - 1].head, to_head=caps[index].head,
+            from_time=_iso(caps[index - 1].ts), to_time=_iso(caps[index].ts),
+            status=status,
+        ))
+    return changes
+
+
+def _iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def badge(results: dict, label: str, precision: int) -> dict:
+    """Shields badge for the latest change of every segment."""
+    latest = [changes[-1] for changes in results.values() if changes]
+    shifted = [c for c in latest if c.status != 'ok']
+    if not shifted:
+        return {'schemaVersion': 1, 'label': label, 'message': 'stable', 'color': COLORS['ok']}
+    worst = max(shifted, key=lambda c: (STATUS_RANK[c.status], c.delta_pct))
+    return {
+        'schemaVersion': 1,
+        'label': label,
+        'message': f"{len(shifted)} {worst.status} (+{worst.delta_pct:.{precision}f}% max)",
+        'color': COLORS[worst.status],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Detect level shifts in the perf capture history')
+    parser.add_argument('segments', nargs='*', help='segments to test (default: all with enough captures)')
+    parser.add_argument('--store', type=Path, default=default_store_dir())
+    parser.add_argument('--days', type=float, help='only use the last N days of history')
+    parser.add_argument('--min-captures', type=int, default=6, help='skip segments with fewer captures')
+    parser.add_argument('--min-size', type=int, default=3, help='fewest captures on either side of a change')
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--resamples', type=int, default=1000)
+    parser.add_argument('--min-pct', type=float, default=3.0, help='ignore shifts smaller than this')
+    parser.add_argument('--warn-pct', type=float, default=5.0)
+    parser.add_argument('--fail-pct', type=float, default=10.0)
+    parser.add_argument('--label', default='perf shift')
+    parser.add_argument('--precision', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0, help='shuffle RNG seed')
+    parser.add_argument('--enforce', action='store_true', help='exit 2/3 on WARN/FAIL')
+    parser.add_argument('-o', '--output', type=Path, help='write the badge JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.store)
+    since = int(time.time() - args.days * 86400) if args.days is not None else None
+    names = args.segments or sorted(store.index_slices)
+    rng = random.Random(args.seed)
+
+    results = {}
+    tested = {}
+    for name in names:
+        caps = captures(store.series(name, since))
+        if len(caps) < max(args.min_captures, 2 * args.min_size):
+            continue
+        found = segment_changes([c.value for c in caps], args.min_size, args.confidence,
+                                args.resamples, rng, args.min_pct)
+        results[name] = describe(caps, found, args.warn_pct, args.fail_pct)
+        tested[name] = len(caps)
+    if not results:
+        print(f"❌ No segment has {args.min_captures}+ captures in {store.root}", file=sys.stderr)
+        return 1
+
+    for name, changes in results.items():
+        for c in changes:
+            icon = {'ok': '↔️ ', 'warn': '⚠️ ', 'fail': '❌'}[c.status]
+            if c.delta_ms < 0:
+                icon = '✅'
+            print(f"{icon} {name}: {c.before_ms} -> {c.after_ms} ms ({c.delta_pct:+.1f}%) "
+                  f"at {c.commit_range}, confidence {c.confidence:.0%}", file=sys.stderr)
+    shown = badge(results, args.label, args.precision)
+    report = {
+        'schema': 'perf-changepoint.v1',
+        'generated_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'badge': shown,
+        'method': {
+            'test': 'cusum-bootstrap',
+            'confidence': args.confidence,
+            'resamples': args.resamples,
+            'min_size': args.min_size,
+            'warn_pct': args.warn_pct,
+            'fail_pct': args.fail_pct,
+            'days': args.days,
+        },
+        'segments': {
+            name: {
+                'captures': tested[name],
+                'changes': [dict(asdict(c), commit_range=c.commit_range) for c in changes],
+            }
+            for name, changes in results.items()
+        },
+    }
+    text = json.dumps(report, separators=(',', ':')) + '\n'
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text)
+        print(f"📝 Wrote {args.output}", file=sys.stderr)
+    else:
+        sys.stdout.write(text)
+    print(f"🏷️  {shown['label']}: {shown['message']} ({len(results)} segments tested)", file=sys.stderr)
+
+    status = max((c.status for changes in results.values() if changes for c in changes[-1:]),
+                 key=STATUS_RANK.__getitem__, default='ok')
+    if not args.enforce:
+        return 0
+    return {'ok': 0, 'warn': 2, 'fail': 3}[status]
+
+
+if __name__ == '__main__':
+    sys.exit(main())
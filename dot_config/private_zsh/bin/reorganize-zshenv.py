@@ -1,15 +1,51 @@
 #!/usr/bin/env python3
 """
-Reorganize .zshenv.01 environment variables into logical sections.
-
-Preserves all functionality while improving organization and readability.
+Reorganize zshenv layers so related environment variables sit together.
+
+Works on the structural tokenizer (zsh_blocks.py), so an if/fi, loop,
+case, function body, { } group or heredoc is always one statement and is
+never split or moved. Blocks are runs of statements separated by blank
+lines, with their leading comments attached. Only blocks made of plain
+assignments (no command substitutions) move, and only within the region
+between two fixed blocks, so nothing crosses code that could read or
+change the environment. Inside a region, blocks are grouped by section
+(core, dev tools, terminal, ...) while every block stays after the blocks
+defining the variables it reads or overwrites.
+
+Each result is checked before it is written: the statements must be the
+same multiset as before, and `zsh -n` must accept the new file. Writes go
+through the backup journal, so a run can be rolled back.
+
+Usage:
+    python3 bin/reorganize-zshenv.py [FILES...] [--check] [--no-verify]
+
+    With no FILES, every .zshenv.0N layer in the config directory is
+    processed in one run.
+
+Exit codes:
+    0 - files reorganized (or already in order)
+    1 - --check found files that would change
+    2 - a file failed verification or could not be read
 """
 
+import argparse
+import heapq
 import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
+
+from backup_journal import Journal
+from dead_assignments import assignments, references
+from zsh_blocks import scan, statements
 
-# Section definitions with keywords
+# Section definitions with keywords, in priority order: a line matching
+# keywords from several sections belongs to the earliest one
 SECTIONS = {
     'core': {
         'title': 'Core Shell Environment',
@@ -47,167 +83,251 @@ SECTIONS = {
         'keywords': ['ZF_', 'ZSH_', 'DISABLE_', 'ENABLE_', 'SUPPRESS_'],
     },
 }
+DEFAULT_SECTION = 'zsh_config'
+SECTION_RANK = {section_id: rank for rank, section_id in enumerate(SECTIONS)}
 
-def classify_line(line: str) -> str:
-    """Classify a line into a section based on keywords."""
-    line_upper = line.upper()
-
-    # Check each section's keywords
-    for section_id, section_data in SECTIONS.items():
-        for keyword in section_data['keywords']:
-            if keyword in line_upper:
-                return section_id
-
-    # Default to zsh_config
-    return 'zsh_config'
-
-def parse_zshenv(filepath: Path) -> Tuple[List[str], List[Tuple[str, List[str]]]]:
-    """Parse .zshenv.01 into header and sections."""
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
-
-    # Find where environment variables start (after initial PATH setup)
-    # Look for the first major section after PATH init
-    env_start = 0
-    for i, line in enumerate(lines):
-        # Find "# === " section markers or first major export block
-        if i > 100 and (line.strip().startswith('# ===') or
-                       (line.strip().startswith('export ') and i > 50)):
-            env_start = i
-            break
-
-    if env_start == 0:
-        # Fallback: find first export after line 100
-        for i, line in enumerate(lines[100:], 100):
-            if line.strip().startswith('export '):
-                env_start = i
-                break
-
-    # Header is everything before env_start
-    header = lines[:env_start]
-
-    # Parse rest into blocks (groups of related lines)
-    blocks = []
-    current_block = []
-
-    for line in lines[env_start:]:
-        stripped = line.strip()
-
-        # Empty line ends a block
-        if not stripped:
-            if current_block:
-                blocks.append(current_block)
-                current_block = []
-            continue
-
-        current_block.append(line)
+# One pass over the line finds every keyword: the zero-width lookahead
+# tries each position without consuming, and alternatives are in section
+# order, so the group reported at a position is its highest-priority match
+CLASSIFIER = re.compile('(?=' + '|'.join(
+    f"(?P<{section_id}>{'|'.join(map(re.escape, data['keywords']))})"
+    for section_id, data in SECTIONS.items()) + ')')
 
-    # Add final block
-    if current_block:
-        blocks.append(current_block)
+LAYER_RE = re.compile(r'^(?:dot_|\.)zshenv\.\d+$')
 
-    # Classify blocks
-    classified = {section_id: [] for section_id in SECTIONS.keys()}
-    classified['_uncategorized'] = []
 
+def classify_line(line: str) -> str:
+    """Classify a line into a section based on keywords."""
+    found = {m.lastgroup for m in CLASSIFIER.finditer(line.upper())}
+    return min(found, key=SECTION_RANK.__getitem__) if found else DEFAULT_SECTION
+
+
+@dataclass
+class Block:
+    index: int
+    lines: List[str]
+    spans: List[Tuple[int, int]]      # statements in this block
+    movable: bool = False
+    section: str = DEFAULT_SECTION
+    defines: Set[str] = field(default_factory=set)
+    reads: Set[str] = field(default_factory=set)
+
+
+def _assignment_names(script, first: int, last: int) -> Optional[Tuple[Set[str], Set[str]]]:
+    """(defines, reads) when the statement is only plain assignments."""
+    defines: Set[str] = set()
+    reads: Set[str] = set()
+    for cmd in script.commands:
+        if not first <= cmd.line <= last:
+            continue
+        if cmd.context or cmd.substitutions or len(cmd.stages) != 1:
+            return None
+        found, _, pure = assignments(cmd.stages[0])
+        if not pure or not found:
+            return None
+        for name, appends, value in found:
+            defines.add(name)
+            reads.update(references(value))
+            if appends:
+                reads.add(name)
+    return defines, reads
+
+
+def parse_blocks(text: str) -> List[Block]:
+    """Split ``text`` into blank-line separated blocks of whole statements.
+
+    Blank lines inside a statement (a heredoc, a function body) do not
+    end a block. The separating blank lines are kept on the block before
+    them, so joining every block's lines gives back ``text``.
+    """
+    lines = text.splitlines(keepends=True)
+    script = scan(text)
+    spans = statements(script)
+    inside = set()
+    for first, last in spans:
+        inside.update(range(first, last + 1))
+
+    blocks: List[Block] = []
+    current: List[str] = []
+    after_blank = False
+    for lineno, line in enumerate(lines, 1):
+        blank = not line.strip() and lineno not in inside
+        if current and after_blank and not blank:
+            blocks.append(Block(len(blocks), current, []))
+            current = []
+        current.append(line)
+        after_blank = blank
+    if current:
+        blocks.append(Block(len(blocks), current, []))
+
+    lineno = 1
     for block in blocks:
-        # Classify by first meaningful line
-        section_id = None
-        for line in block:
-            if 'export ' in line or '#' in line:
-                section_id = classify_line(line)
-                break
-
-        if section_id:
-            classified[section_id].append(block)
+        end = lineno + len(block.lines) - 1
+        block.spans = [s for s in spans if lineno <= s[0] <= end]
+        lineno = end + 1
+        if not block.spans:
+            continue
+        names = [_assignment_names(script, first, last) for first, last in block.spans]
+        if all(n is not None for n in names):
+            block.movable = True
+            for defines, reads in names:
+                block.defines |= defines
+                block.reads |= reads
+            block.section = classify_line(lines[block.spans[0][0] - 1])
+    return blocks
+
+
+def _order_region(region: List[Block]) -> List[Block]:
+    """Group ``region`` by section without moving a block ahead of a def it needs."""
+    after: Dict[int, Set[int]] = {b.index: set() for b in region}
+    waiting = {b.index: 0 for b in region}
+    for i, earlier in enumerate(region):
+        for later in region[i + 1:]:
+            if earlier.defines & (later.reads | later.defines) or later.defines & earlier.reads:
+                after[earlier.index].add(later.index)
+                waiting[later.index] += 1
+    by_index = {b.index: b for b in region}
+    ready = [(SECTION_RANK[b.section], b.index) for b in region if not waiting[b.index]]
+    heapq.heapify(ready)
+    ordered = []
+    while ready:
+        _, index = heapq.heappop(ready)
+        ordered.append(by_index[index])
+        for nxt in after[index]:
+            waiting[nxt] -= 1
+            if not waiting[nxt]:
+                heapq.heappush(ready, (SECTION_RANK[by_index[nxt].section], nxt))
+    return ordered
+
+
+def _split_gap(lines: List[str]) -> Tuple[List[str], List[str]]:
+    """(body, trailing blank lines) of a block."""
+    end = len(lines)
+    while end and not lines[end - 1].strip():
+        end -= 1
+    return lines[:end], lines[end:]
+
+
+def reorganize(text: str) -> Tuple[str, int]:
+    """(new text, number of blocks that changed position)."""
+    blocks = parse_blocks(text)
+    out: List[str] = []
+    moved = 0
+    region: List[Block] = []
+
+    def flush():
+        nonlocal moved
+        ordered = _order_region(region)
+        moved += sum(1 for a, b in zip(ordered, region) if a is not b)
+        if ordered == region:
+            for b in region:
+                out.extend(b.lines)
         else:
-            classified['_uncategorized'].append(block)
+            # Moved blocks are separated by one blank line; the region keeps
+            # its original separator (or lack of one) at the end
+            tail = _split_gap(region[-1].lines)[1]
+            for i, b in enumerate(ordered):
+                body = _split_gap(b.lines)[0]
+                if body and not body[-1].endswith('\n'):
+                    body[-1] += '\n'
+                out.extend(body)
+                out.extend(tail if i == len(ordered) - 1 else ['\n'])
+            if not text.endswith('\n') and out and out[-1].endswith('\n') and region[-1] is blocks[-1]:
+                out[-1] = out[-1][:-1]
+        region.clear()
 
-    return header, classified
-
-def build_organized_content(header: List[str], classified: dict) -> str:
-    """Build reorganized file content."""
-    content = []
-
-    # Add header
-    content.extend(header)
-
-    # Add organized sections
-    for section_id in SECTIONS.keys():
-        blocks = classified.get(section_id, [])
-        if not blocks:
+    for block in blocks:
+        if block.movable:
+            region.append(block)
+        else:
+            flush()
+            out.extend(block.lines)
+    flush()
+    return ''.join(out), moved
+
+
+def _statement_texts(text: str) -> Counter:
+    lines = text.splitlines()
+    return Counter('\n'.join(lines[first - 1:last]).rstrip()
+                   for first, last in statements(scan(text)))
+
+
+def verify(old: str, new: str, zsh: Optional[str]) -> Optional[str]:
+    """Error message if ``new`` is not a faithful, parseable reordering."""
+    if _statement_texts(old) != _statement_texts(new):
+        return 'statements changed'
+    if len(scan(old).commands) != len(scan(new).commands):
+        return 'command count changed'
+    if zsh:
+        with tempfile.NamedTemporaryFile('w', suffix='.zsh') as tmp:
+            tmp.write(new)
+            tmp.flush()
+            result = subprocess.run([zsh, '-n', tmp.name], capture_output=True, text=True)
+        if result.returncode != 0:
+            return f'zsh -n failed: {result.stderr.strip()}'
+    return None
+
+
+def default_files(base_dir: Path) -> List[Path]:
+    return sorted(p for p in base_dir.iterdir() if LAYER_RE.match(p.name) and p.is_file())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reorganize zshenv layers into sections')
+    parser.add_argument('files', nargs='*', type=Path, help='zshenv layers (default: every .zshenv.0N)')
+    parser.add_argument('--base-dir', type=Path, default=Path(__file__).resolve().parent.parent,
+                        help='config directory holding the layers')
+    parser.add_argument('--check', '--dry-run', action='store_true', dest='check',
+                        help='report files that would change without writing')
+    parser.add_argument('--no-verify', action='store_true',
+                        help='write even when zsh is not installed for `zsh -n`')
+    args = parser.parse_args(argv)
+
+    files = args.files or default_files(args.base_dir)
+    if not files:
+        print(f"❌ No zshenv layers found in {args.base_dir}")
+        return 2
+    zsh = shutil.which('zsh')
+
+    changes: Dict[Path, str] = {}
+    failed = False
+    for path in files:
+        try:
+            text = path.read_text()
+        except OSError as e:
+            print(f"❌ {path}: {e}")
+            failed = True
             continue
-
-        section = SECTIONS[section_id]
-
-        # Section header
-        content.append('\n')
-        content.append('# ' + '=' * 78 + '\n')
-        content.append(f'# {section["title"].upper()}\n')
-        content.append('# ' + '=' * 78 + '\n')
-        content.append(f'# {section["desc"]}\n')
-        content.append('\n')
-
-        # Add blocks
-        for block in blocks:
-            content.extend(block)
-            content.append('\n')
-
-    # Add uncategorized if any
-    if classified.get('_uncategorized'):
-        content.append('\n')
-        content.append('# ' + '=' * 78 + '\n')
-        content.append('# UNCATEGORIZED\n')
-        content.append('# ' + '=' * 78 + '\n')
-        content.append('\n')
-        for block in classified['_uncategorized']:
-            content.extend(block)
-            content.append('\n')
-
-    return ''.join(content)
-
-def main():
-    """Reorganize .zshenv.01."""
-    filepath = Path.cwd() / '.zshenv.01'
-
-    if not filepath.exists():
-        print(f"Error: {filepath} not found")
-        return 1
-
-    print(f"📖 Reading {filepath}...")
-    header, classified = parse_zshenv(filepath)
-
-    print(f"📊 Analysis:")
-    print(f"  Header: {len(header)} lines")
-    for section_id, section_data in SECTIONS.items():
-        block_count = len(classified.get(section_id, []))
-        if block_count > 0:
-            print(f"  {section_data['title']}: {block_count} blocks")
-
-    uncategorized = len(classified.get('_uncategorized', []))
-    if uncategorized > 0:
-        print(f"  Uncategorized: {uncategorized} blocks")
-
-    print(f"\n🔧 Reorganizing...")
-    new_content = build_organized_content(header, classified)
-
-    # Backup original
-    backup_path = filepath.with_suffix('.01.backup-reorg')
-    print(f"💾 Backing up to {backup_path.name}...")
-    with open(backup_path, 'w') as f:
-        with open(filepath, 'r') as orig:
-            f.write(orig.read())
-
-    # Write new version
-    print(f"✍️  Writing reorganized file...")
-    with open(filepath, 'w') as f:
-        f.write(new_content)
-
-    print(f"\n✅ Done!")
-    print(f"   Original backed up to: {backup_path.name}")
-    print(f"   Test with: zsh -f -c 'source {filepath} && echo OK'")
-
+        new, moved = reorganize(text)
+        if new == text:
+            print(f"✅ {path.name}: already organized")
+            continue
+        error = verify(text, new, zsh)
+        if error:
+            print(f"❌ {path.name}: {error}; left unchanged")
+            failed = True
+            continue
+        print(f"🔧 {path.name}: {moved} blocks regrouped")
+        changes[path] = new
+
+    if failed:
+        return 2
+    if args.check:
+        return 1 if changes else 0
+    if changes and not zsh and not args.no_verify:
+        print("⚠️  zsh not found, so `zsh -n` could not check the result; "
+              "rerun with --no-verify to write anyway")
+        return 2
+    if not changes:
+        return 0
+
+    with Journal().start_run('reorganize-zshenv') as run:
+        for path, new in changes.items():
+            run.write_text(path, new)
+    print(f"\n✅ Reorganized {len(changes)} file(s)")
+    print(f"   Undo with: python3 bin/backup_journal.py rollback {run.run_id}")
     return 0
 
+
 if __name__ == '__main__':
-    exit(main())
+    sys.exit(main())
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Analytics over many segment captures (the segments.sample.json schema).
+
+Captures are loaded into one column store: each segment row becomes an
+entry in typed arrays (array.array) for capture, segment, phase, status,
+start, end and duration, plus one column per numeric key of the
+`metrics` blocks (NaN where a segment lacks it). Grouping builds index
+lists once, and aggregation gathers a group's values with a single
+C-level itemgetter call, so thousands of captures summarize in well
+under a second without numpy.
+
+Reports:
+- per-segment and per-phase distributions (n, min, median, p90, p95,
+  max, mean, MAD). Phase figures use the per-capture phase totals.
+- budget checks. Budgets are read from tools/perf-segment-budget.sh for
+  the chosen phase (interim or final), with the same BUDGET_<LABEL>
+  environment overrides and extra --budget LABEL=MS entries. Segment
+  ids are matched by label, so seg-030-toolchain-integration has the
+  label toolchain_integration, and a phase total by the phase label
+  plus _total, so phase pre-plugin is checked against pre_plugin_total.
+  Budget labels that match neither are listed: the script's labels
+  (compinit, prompt_ready, ...) name SEGMENT lines of the text capture,
+  which the JSON captures only carry if they record them as segments.
+- growth against a baseline set of captures, ranked by the change in
+  median duration
+
+Usage:
+    python3 bin/segment_analytics.py CAPTURE... [--baseline CAPTURE...]
+                                     [--budget-phase interim|final]
+                                     [--budget LABEL=MS] [--top N]
+                                     [--format text|json]
+
+    A CAPTURE is a segments JSON file or a directory of segments*.json.
+
+Exit codes:
+    0 - no segment or phase-total median over budget
+    1 - at least one segment or phase-total median exceeds its budget
+    2 - no readable captures, or a bad --budget
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+from array import array
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+NAN = float('nan')
+SEG_PREFIX_RE = re.compile(r'^seg-\d+-')
+BUDGET_SCRIPT_NAMES = ('executable_perf-segment-budget.sh', 'perf-segment-budget.sh')
+
+
+def segment_label(segment_id: str) -> str:
+    """seg-030-toolchain-integration -> toolchain_integration."""
+    return SEG_PREFIX_RE.sub('', segment_id).replace('-', '_').lower()
+
+
+def _ms(value) -> float:
+    """A capture's number as a float; NaN when missing, null or not a number."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return NAN
+    return float(value)
+
+
+class Codes:
+    """Interns strings as small integer codes for the integer columns."""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def code(self, name: str) -> int:
+        found = self.index.get(name)
+        if found is None:
+            found = self.index[name] = len(self.names)
+            self.names.append(name)
+        return found
+
+
+class SegmentTable:
+    def __init__(self):
+        self.sources: List[str] = []
+        self.segments = Codes()
+        self.phases = Codes()
+        self.statuses = Codes()
+        self.capture = array('I')
+        self.segment = array('I')
+        self.phase = array('I')
+        self.status = array('I')
+        self.start = array('d')
+        self.end = array('d')
+        self.duration = array('d')
+        self.metrics: Dict[str, array] = {}
+
+    def __len__(self):
+        return len(self.duration)
+
+    def add_capture(self, doc: dict, source: str):
+        capture = len(self.sources)
+        self.sources.append(source)
+        for seg in doc.get('segments') or ():
+            if not isinstance(seg, dict):
+                continue
+            row = len(self.duration)
+            start = _ms(seg.get('start_ms'))
+            end = _ms(seg.get('end_ms'))
+            duration = _ms(seg.get('duration_ms'))
+            self.capture.append(capture)
+            self.segment.append(self.segments.code(seg.get('id') or seg.get('name') or '?'))
+            self.phase.append(self.phases.code(seg.get('phase') or '?'))
+            self.status.append(self.statuses.code(seg.get('status') or '?'))
+            self.start.append(start)
+            self.end.append(end)
+            self.duration.append(duration if duration == duration else end - start)
+            for key, value in (seg.get('metrics') or {}).items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                column = self.metrics.get(key)
+                if column is None:
+                    column = self.metrics[key] = array('d', [NAN]) * row
+                elif len(column) < row:
+                    column.extend([NAN] * (row - len(column)))
+                column.append(float(value))
+        for column in self.metrics.values():
+            if len(column) < len(self.duration):
+                column.extend([NAN] * (len(self.duration) - len(column)))
+
+    def groups(self, codes: array) -> Dict[int, List[int]]:
+        """Row indexes for every code in ``codes``."""
+        found: Dict[int, List[int]] = {}
+        for row, code in enumerate(codes):
+            found.setdefault(code, []).append(row)
+        return found
+
+
+def gather(column: Sequence[float], rows: List[int]) -> List[float]:
+    if len(rows) == 1:
+        value = column[rows[0]]
+        return [value] if value == value else []
+    return [v for v in itemgetter(*rows)(column) if v == v]   # drop NaN
+
+
+def _quantile(ordered: List[float], pct: float) -> float:
+    rank = (len(ordered) - 1) * pct / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def distribution(values: List[float]) -> dict:
+    if not values:
+        return {'n': 0}
+    ordered = sorted(values)
+    median = _quantile(ordered, 50)
+    deviations = sorted(abs(v - median) for v in ordered)
+    return {
+        'n': len(ordered),
+        'min': round(ordered[0], 2),
+        'median': round(median, 2),
+        'p90': round(_quantile(ordered, 90), 2),
+        'p95': round(_quantile(ordered, 95), 2),
+        'max': round(ordered[-1], 2),
+        'mean': round(math.fsum(ordered) / len(ordered), 2),
+        'mad': round(_quantile(deviations, 50), 2),
+    }
+
+
+def segment_stats(table: SegmentTable) -> Dict[str, dict]:
+    stats = {}
+    for code, rows in table.groups(table.segment).items():
+        entry = distribution(gather(table.duration, rows))
+        entry['phase'] = table.phases.names[table.phase[rows[0]]]
+        ok = table.statuses.index.get('ok')
+        entry['not_ok'] = sum(1 for row in rows if table.status[row] != ok)
+        metrics = {}
+        for key, column in table.metrics.items():
+            values = gather(column, rows)
+            if values:
+                metrics[key] = distribution(values)
+        if metrics:
+            entry['metrics'] = metrics
+        stats[table.segments.names[code]] = entry
+    return stats
+
+
+def phase_stats(table: SegmentTable) -> Dict[str, dict]:
+    """Distribution of each phase's total duration per capture."""
+    totals: Dict[int, Dict[int, float]] = {}
+    for capture, phase, duration in zip(table.capture, table.phase, table.duration):
+        if duration == duration:
+            per = totals.setdefault(phase, {})
+            per[capture] = per.get(capture, 0.0) + duration
+    return {table.phases.names[phase]: distribution(list(per.values()))
+            for phase, per in sorted(totals.items(), key=lambda kv: table.phases.names[kv[0]])}
+
+
+def find_budget_script(base_dir: Path) -> Optional[Path]:
+    for name in BUDGET_SCRIPT_NAMES:
+        path = base_dir / 'tools' / name
+        if path.is_file():
+            return path
+    return None
+
+
+def parse_budget(value: str) -> Tuple[str, float]:
+    label, sep, ms = value.partition('=')
+    try:
+        budget = float(ms)
+    except ValueError:
+        budget = NAN
+    if not sep or not label.strip() or not budget >= 0 or math.isinf(budget):
+        raise argparse.ArgumentTypeError(f'expected LABEL=MS with MS a number of milliseconds, got {value!r}')
+    return label.strip().replace('-', '_').lower(), budget
+
+
+def load_budgets(script: Optional[Path], phase: str,
+                 extra: Iterable[Tuple[str, float]] = ()) -> Dict[str, float]:
+    """Budgets (ms) by segment label, as perf-segment-budget.sh resolves them."""
+    budgets: Dict[str, float] = {}
+    if script is not None:
+        text = script.read_text()
+        per_phase: Dict[str, Dict[str, float]] = {}
+        current: List[str] = []
+        for line in text.splitlines():
+            case = re.match(r'\s*([\w|*]+)\)\s*$', line)
+            if case:
+                current = case.group(1).split('|')
+                continue
+            if line.strip() == ';;':
+                current = []
+                continue
+            default = re.match(r'\s*DEF_(\w+)=(\d+)', line)
+            if default and current:
+                for name in current:
+                    per_phase.setdefault(name, {})[default.group(1)] = float(default.group(2))
+        table = per_phase.get(phase) or per_phase.get('*', {})
+        for label, var in re.findall(r'\[(\w+)\]="\$DEF_(\w+)"', text):
+            if var in table:
+                budgets[label] = table[var]
+    for key, value in os.environ.items():
+        if key.startswith('BUDGET_') and value.isdigit():
+            budgets[key[len('BUDGET_'):].lower()] = float(value)
+    budgets.update(extra)
+    return budgets
+
+
+def check_budgets(stats: Dict[str, dict], budgets: Dict[str, float],
+                  phases: Optional[Dict[str, dict]] = None) -> List[dict]:
+    """Budget verdicts for segments, then phase totals, that have a budget."""
+    targets = [(segment_label(segment_id), segment_id, entry) for segment_id, entry in stats.items()]
+    targets += [(segment_label(phase) + '_total', f'{phase} (phase total)', entry)
+                for phase, entry in (phases or {}).items()]
+    results = []
+    for label, name, entry in targets:
+        budget = budgets.get(label)
+        if budget is None or not entry.get('n'):
+            continue
+        results.append({
+            'segment': name,
+            'label': label,
+            'budget_ms': budget,
+            'median_ms': entry['median'],
+            'p95_ms': entry['p95'],
+            'status': 'FAIL' if entry['median'] > budget else ('WARN' if entry['p95'] > budget else 'PASS'),
+        })
+    return results
+
+
+def unused_budgets(budgets: Dict[str, float], results: List[dict]) -> List[str]:
+    """Budget labels that matched no segment or phase total."""
+    used = {r['label'] for r in results}
+    return sorted(label for label in budgets if label not in used)
+
+
+def growth(current: Dict[str, dict], baseline: Dict[str, dict]) -> List[dict]:
+    """Segments ranked by the increase of their median over the baseline."""
+    ranked = []
+    for segment_id, entry in current.items():
+        base = baseline.get(segment_id)
+        if not base or not base.get('n') or not entry.get('n'):
+            continue
+        delta = entry['median'] - base['median']
+        ranked.append({
+            'segment': segment_id,
+            'baseline_median_ms': base['median'],
+            'median_ms': entry['median'],
+            'delta_ms': round(delta, 2),
+            'delta_pct': round(delta / base['median'] * 100, 1) if base['median'] else None,
+            # A shift smaller than the spread of either side is likely noise
+            'significant': abs(delta) > max(entry['mad'], base['mad'], 1.0),
+        })
+    ranked.sort(key=lambda r: r['delta_ms'], reverse=True)
+    return ranked
+
+
+def expand(paths: Iterable[Path]) -> List[Path]:
+    found = []
+    for path in paths:
+        if path.is_dir():
+            found.extend(sorted(path.glob('segments*.json')))
+        else:
+            found.append(path)
+    return found
+
+
+def load_table(paths: Iterable[Path], errors: List[str]) -> SegmentTable:
+    table = SegmentTable()
+    for path in expand(paths):
+        try:
+            doc = json.loads(path.read_text())
+        except (OSError, ValueError) as e:
+            errors.append(f'{path}: {e}')
+            continue
+        if not isinstance(doc, dict) or not isinstance(doc.get('segments'), list):
+            errors.append(f'{path}: no segments array')
+            continue
+        table.add_capture(doc, str(path))
+    return table
+
+
+def render_text(report: dict, top: int) -> str:
+    out = [f"📊 {report['captures']} captures, {report['rows']} segment rows"]
+    out.append('\nSegments (duration ms):')
+    out.append(f"  {'segment':<36} {'phase':<8} {'n':>5} {'median':>8} {'p95':>8} {'max':>8} {'mad':>6}")
+    for segment_id, s in sorted(report['segments'].items(), key=lambda kv: -kv[1].get('median', 0)):
+        # A segment whose captures all lack a duration has no distribution
+        out.append(f"  {segment_id:<36} {s['phase']:<8} {s['n']:>5} {s.get('median', '-'):>8} "
+                   f"{s.get('p95', '-'):>8} {s.get('max', '-'):>8} {s.get('mad', '-'):>6}"
+                   + (f"  ({s['not_ok']} not ok)" if s['not_ok'] else ''))
+    out.append('\nPhases (total ms per capture):')
+    for phase, s in report['phases'].items():
+        out.append(f"  {phase:<10} n={s['n']:<5} median={s['median']:<8} p95={s['p95']:<8} max={s['max']}")
+    if report['budgets']:
+        out.append(f"\nBudgets ({report['budget_phase']}):")
+        for b in report['budgets']:
+            icon = {'PASS': '✅', 'WARN': '⚠️ ', 'FAIL': '❌'}[b['status']]
+            out.append(f"  {icon} {b['segment']}: median {b['median_ms']} / p95 {b['p95_ms']} "
+                       f"vs budget {b['budget_ms']:g}")
+    else:
+        out.append(f"\nBudgets ({report['budget_phase']}): no segment or phase total has a budget")
+    if report['unused_budgets']:
+        out.append(f"  ℹ️  no segment or phase total for: {', '.join(report['unused_budgets'])}")
+    if report.get('growth') is not None:
+        out.append('\nGrowth vs baseline (median):')
+        for g in report['growth'][:top]:
+            mark = '📈' if g['significant'] and g['delta_ms'] > 0 else ('📉' if g['significant'] else '  ')
+            pct = f" ({g['delta_pct']:+}%)" if g['delta_pct'] is not None else ''
+            out.append(f"  {mark} {g['segment']:<36} {g['baseline_median_ms']:>8} -> {g['median_ms']:<8} "
+                       f"{g['delta_ms']:+}ms{pct}")
+    if report['errors']:
+        out.append('\nSkipped:')
+        out.extend(f'  ⚠️  {e}' for e in report['errors'])
+    return '\n'.join(out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyze segment captures')
+    parser.add_argument('captures', nargs='+', type=Path)
+    parser.add_argument('--baseline', nargs='+', type=Path, default=[])
+    parser.add_argument('--base-dir', type=Path, default=Path(__file__).resolve().parent.parent,
+                        help='config directory holding tools/perf-segment-budget.sh')
+    parser.add_argument('--budget-phase', choices=['interim', 'final'],
+                        default=os.environ.get('PERF_BUDGET_PHASE', 'interim'))
+    parser.add_argument('--budget', type=parse_budget, action='append', default=[], metavar='LABEL=MS')
+    parser.add_argument('--top', type=int, default=10, help='growth entries to show')
+    parser.add_argument('--format', choices=['text', 'json'], default='text')
+    args = parser.parse_args(argv)
+
+    errors: List[str] = []
+    table = load_table(args.captures, errors)
+    if not table.sources:
+        print('❌ No readable captures' + ''.join(f'\n   {e}' for e in errors))
+        return 2
+    stats = segment_stats(table)
+    budgets = load_budgets(find_budget_script(args.base_dir), args.budget_phase, args.budget)
+    phases = phase_stats(table)
+    checked = check_budgets(stats, budgets, phases)
+    report = {
+        'captures': len(table.sources),
+        'rows': len(table),
+        'segments': stats,
+        'phases': phases,
+        'budget_phase': args.budget_phase,
+        'budgets': checked,
+        'unused_budgets': unused_budgets(budgets, checked),
+        'growth': None,
+        'errors': errors,
+    }
+    if args.baseline:
+        baseline = load_table(args.baseline, errors)
+        report['growth'] = growth(stats, segment_stats(baseline)) if baseline.sources else []
+
+    if args.format == 'json':
+        print(json.dumps(report, indent=2))
+    else:
+        print(render_text(report, args.top))
+    return 1 if any(b['status'] == 'FAIL' for b in report['budgets']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Adaptive startup benchmark for the shell (or any command).
+
+perf-capture-multi.zsh and zsh-performance-baseline take a fixed number
+of samples and average them, so a single slow run (a cold disk cache, a
+Spotlight burst) moves the result and two captures rarely agree. This
+harness:
+
+- runs a few warm-up launches that are not recorded
+- optionally pins itself, and so every launch, to a CPU set with
+  os.sched_setaffinity (Linux; ignored with a warning elsewhere)
+- keeps sampling until the bootstrap confidence interval of the median
+  is narrower than a target, or a sample cap is reached
+- reports min, median, p95, MAD and the interval, plus CPU time per
+  launch from the children's rusage
+
+The JSON uses the perf-multi.v1 shape written by perf-capture-multi.zsh
+(schema, timestamp, samples, per_run, aggregate.<metric>, rsd and
+percentiles), with the extra statistics under aggregate.<metric> and a
+`bench` block describing how the numbers were taken. Readers of the
+existing files therefore keep working.
+
+Usage:
+    python3 bin/startup_bench.py [--command CMD] [--metric NAME] [--warmup N]
+                                 [--min-samples N] [--max-samples N]
+                                 [--target-pct P | --target-ms MS]
+                                 [--confidence C] [--cpus LIST] [-o FILE]
+
+    --target-pct bounds the CI half-width as a percentage of the median
+    (default 2); --target-ms bounds it in milliseconds.
+
+Exit codes:
+    0 - the interval converged to the target
+    1 - the sample cap was reached first (results are still written)
+    2 - the command failed or could not be started
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import resource
+import shlex
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Sequence, Set, Tuple
+
+DEFAULT_COMMAND = 'zsh -i -c exit'
+
+
+@dataclass
+class Sample:
+    wall_ms: float
+    cpu_ms: float
+
+
+def parse_cpus(spec: str) -> Set[int]:
+    """'0,2-3' -> {0, 2, 3}."""
+    cpus: Set[int] = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        cpus.update(range(int(first), int(last or first) + 1))
+    if not cpus:
+        raise ValueError(f'no CPUs in {spec!r}')
+    return cpus
+
+
+def pin_cpus(cpus: Set[int]) -> bool:
+    """Pin this process (and so every child) to ``cpus``; False if unsupported."""
+    setaffinity = getattr(os, 'sched_setaffinity', None)
+    if setaffinity is None:
+        return False
+    setaffinity(0, cpus)
+    return True
+
+
+def run_once(argv: Sequence[str], env: dict, timeout: float) -> Sample:
+    """Wall and CPU (user + sys) time of one launch, in milliseconds."""
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter_ns()
+    result = subprocess.run(argv, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL, timeout=timeout)
+    wall = (time.perf_counter_ns() - started) / 1e6
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, argv)
+    cpu = (after.ru_utime - before.ru_utime + after.ru_stime - before.ru_stime) * 1000
+    return Sample(wall, cpu)
+
+
+def median(values: Sequence[float]) -> float:
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    return ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Linear-interpolated percentile (the numpy default)."""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def mad(values: Sequence[float]) -> float:
+    """Median absolute deviation (unscaled)."""
+    center = median(values)
+    return median([abs(v - center) for v in values])
+
+
+def bootstrap_median_ci(values: Sequence[float], confidence: float, resamples: int,
+                        rng: random.Random) -> Tuple[float, float]:
+    """Percentile-bootstrap interval for the median."""
+    n = len(values)
+    mid = n // 2
+    medians = []
+    for _ in range(resamples):
+        draw = sorted(rng.choices(values, k=n))
+        medians.append(draw[mid] if n % 2 else (draw[mid - 1] + draw[mid]) / 2)
+    medians.sort()
+    alpha = (1 - confidence) / 2
+    lo = medians[int(alpha * (resamples - 1))]
+    hi = medians[int(math.ceil((1 - alpha) * (resamples - 1)))]
+    return lo, hi
+
+
+def half_width_ok(ci: Tuple[float, float], center: float, target_pct: Optional[float],
+                  target_ms: Optional[float]) -> bool:
+    half = (ci[1] - ci[0]) / 2
+    if target_ms is not None:
+        return half <= target_ms
+    return center > 0 and half / center * 100 <= target_pct
+
+
+def summarize(values: Sequence[float]) -> dict:
+    mean = sum(values) / len(values)
+    stddev = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+    return {
+        'mean': round(mean, 2),
+        'min': round(min(values), 2),
+        'max': round(max(values), 2),
+        'stddev': round(stddev, 2),
+        'median': round(median(values), 2),
+        'p95': round(percentile(values, 95), 2),
+        'mad': round(mad(values), 2),
+        'values': [round(v, 2) for v in values],
+    }
+
+
+def build_report(samples: List[Sample], metric: str, args, ci: Tuple[float, float],
+                 converged: bool, pinned: Optional[Sequence[int]], elapsed_s: float) -> dict:
+    walls = [s.wall_ms for s in samples]
+    cpus = [s.cpu_ms for s in samples]
+    wall_stats = summarize(walls)
+    wall_stats['ci'] = {
+        'confidence': args.confidence,
+        'low': round(ci[0], 2),
+        'high': round(ci[1], 2),
+        'half_width_ms': round((ci[1] - ci[0]) / 2, 2),
+    }
+    rsd = round(wall_stats['stddev'] / wall_stats['mean'], 4) if wall_stats['mean'] else 0
+    return {
+        'schema': 'perf-multi.v1',
+        'timestamp': datetime.now().strftime('%Y%m%dT%H%M%S'),
+        'samples': len(samples),
+        'requested_samples': args.max_samples,
+        'authentic_samples': len(samples),
+        'partial': 0 if converged else 1,
+        f'rsd_{metric}': rsd,
+        f'percentiles_{metric}': {
+            'p50': round(percentile(walls, 50), 2),
+            'p90': round(percentile(walls, 90), 2),
+            'p95': round(percentile(walls, 95), 2),
+        },
+        'per_run': [{'index': i, metric: round(s.wall_ms, 2), 'cpu_ms': round(s.cpu_ms, 2)}
+                    for i, s in enumerate(samples, 1)],
+        'aggregate': {metric: wall_stats, 'cpu_ms': summarize(cpus)},
+        'bench': {
+            'command': args.command,
+            'warmup': args.warmup,
+            'converged': converged,
+            'target_pct': None if args.target_ms is not None else args.target_pct,
+            'target_ms': args.target_ms,
+            'bootstrap_resamples': args.resamples,
+            'cpus': sorted(pinned) if pinned else None,
+            'elapsed_s': round(elapsed_s, 2),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Adaptive shell startup benchmark')
+    parser.add_argument('--command', default=DEFAULT_COMMAND, help=f'command to time (default: {DEFAULT_COMMAND!r})')
+    parser.add_argument('--metric', default='warm_ms',
+                        help='name of the timed value in the JSON (default: warm_ms, since warm-ups run first)')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--min-samples', type=int, default=10)
+    parser.add_argument('--max-samples', type=int, default=200)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--target-pct', type=float, default=2.0,
+                        help='stop when the CI half-width is within this %% of the median')
+    target.add_argument('--target-ms', type=float, help='stop when the CI half-width is within this many ms')
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--resamples', type=int, default=2000, help='bootstrap resamples')
+    parser.add_argument('--cpus', help='pin to these CPUs, e.g. 2 or 0,2-3')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds allowed per launch')
+    parser.add_argument('--seed', type=int, default=0, help='bootstrap RNG seed')
+    parser.add_argument('-o', '--output', type=Path, help='write JSON here instead of stdout')
+    parser.add_argument('-q', '--quiet', action='store_true')
+    args = parser.parse_args(argv)
+    if args.min_samples < 3 or args.max_samples < args.min_samples:
+        parser.error('need 3 <= --min-samples <= --max-samples')
+
+    log = (lambda *a: None) if args.quiet else (lambda *a: print(*a, file=sys.stderr))
+    argv_cmd = shlex.split(args.command)
+    env = dict(os.environ)
+
+    pinned = None
+    if args.cpus:
+        try:
+            cpus = parse_cpus(args.cpus)
+        except ValueError:
+            parser.error(f'--cpus: expected a list like 2 or 0,2-3, got {args.cpus!r}')
+        try:
+            supported = pin_cpus(cpus)
+        except OSError as e:
+            parser.error(f'--cpus: cannot pin to {args.cpus}: {e.strerror or e}')
+        if supported:
+            pinned = cpus
+            log(f"📌 Pinned to CPUs {sorted(cpus)}")
+        else:
+            log("⚠️  CPU pinning is not supported on this platform; running unpinned")
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    samples: List[Sample] = []
+    ci = (0.0, 0.0)
+    converged = False
+    try:
+        for i in range(args.warmup):
+            run_once(argv_cmd, env, args.timeout)
+        log(f"🔥 {args.warmup} warm-up runs done; sampling {args.command!r}")
+        while len(samples) < args.max_samples:
+            samples.append(run_once(argv_cmd, env, args.timeout))
+            if len(samples) < args.min_samples:
+                continue
+            walls = [s.wall_ms for s in samples]
+            ci = bootstrap_median_ci(walls, args.confidence, args.resamples, rng)
+            if half_width_ok(ci, median(walls), args.target_pct, args.target_ms):
+                converged = True
+                break
+    except FileNotFoundError:
+        print(f"❌ Command not found: {argv_cmd[0]}", file=sys.stderr)
+        return 2
+    except subprocess.CalledProcessError as e:
+        print(f"❌ {args.command!r} exited with status {e.returncode}", file=sys.stderr)
+        return 2
+    except subprocess.TimeoutExpired:
+        print(f"❌ {args.command!r} took longer than {args.timeout}s", file=sys.stderr)
+        return 2
+
+    report = build_report(samples, args.metric, args, ci, converged, pinned, time.perf_counter() - started)
+    stats = report['aggregate'][args.metric]
+    icon = '✅' if converged else '⚠️ '
+    log(f"{icon} n={len(samples)} median={stats['median']}ms "
+        f"CI[{stats['ci']['low']}, {stats['ci']['high']}] min={stats['min']} "
+        f"p95={stats['p95']} MAD={stats['mad']}"
+        + ('' if converged else f" (not converged after {args.max_samples} samples)"))
+
+    text = json.dumps(report, indent=2) + '\n'
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text)
+        log(f"📝 Wrote {args.output}")
+    else:
+        sys.stdout.write(text)
+    return 0 if converged else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
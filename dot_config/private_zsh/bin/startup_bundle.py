@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Layered startup bundle: the live fragment layers in one zcompile-ready file.
+
+load-shell-fragments opens, reads and parses every fragment of a layer on
+each start. This tool resolves the .live layer symlinks, takes the
+fragments in glob (load) order from the module manifest (zsh_manifest.py)
+and writes them into one file, with one function per layer family:
+
+    $ZSH_CACHE_DIR/startup-bundle.zsh        zf::bundle::.zshrc.add-plugins.d
+                                             zf::bundle::.zshrc.d
+    $ZSH_CACHE_DIR/startup-bundle.map.json   line map back to the fragments
+
+The load-shell-fragments override (020-zqs-overrides.zsh) calls the
+family function instead of globbing the directory, so the fragments run in
+the same function scope as before, and the file is compiled with
+`zcompile -U` so later starts read the .zwc. Pre-plugin fragments are not
+bundled: the vendored .zshrc loads them before the override exists.
+
+Each fragment is placed one of four ways:
+- inline: copied as is; a final top-level `return` becomes `:`
+- wrapped: inside `repeat 1 do ... done` with each top-level `return [n]`
+  turned into a plain `break` (early guards like `[[ -n $_DONE ]] &&
+  return 0`); the status is dropped, as load-shell-fragments ignores it
+- source: sourced from its file as before, because it refers to its own
+  path ($0, %x, %N, funcsourcetrace) or returns from inside a loop
+- skip: switched off by a whole-file guard set in .zshenv.local (see
+  toggle_index.py); sourced only if the toggle is no longer 1
+
+Line counts are kept, so an error in the bundle maps back with an offset;
+`where` does the lookup for `zf::bundle::.zshrc.d:123` (function-relative,
+as zsh reports it) or `startup-bundle.zsh:456`. Aliases defined by one
+fragment are not expanded in the later ones, since the whole family is
+parsed at once (as with any compiled file).
+
+The bundle records a stamp over its inputs and is only rewritten when a
+fragment, the layer selection or .zshenv.local changes. The shell ignores
+a bundle older than any input and regenerates it in the background.
+
+Usage:
+    python3 bin/startup_bundle.py build [-o FILE] [--check] [--no-zcompile] [--quiet]
+    python3 bin/startup_bundle.py where LOCATION [-o FILE]
+
+Exit codes:
+    0 - success (build --check: bundle is current)
+    1 - error (build --check: bundle is missing or stale)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from backup_journal import atomic_write_chunks
+from toggle_index import find_zshenv_local, read_toggle_state, skipped_fragments
+from zsh_blocks import scan
+from zsh_manifest import (FAMILIES, default_manifest_path, layer_family, live_layers,
+                          resolve_layer, update_manifest)
+
+ROOT = Path(__file__).resolve().parent.parent
+VERSION = 1
+STAMP_RE = re.compile(r'^# stamp: ([0-9a-f]{64})$', re.MULTILINE)
+
+# Families loaded through the load-shell-fragments override
+BUNDLED_FAMILIES = FAMILIES[1:]
+
+SELF_REF_RE = re.compile(r'\$0\b|\$\{0[:}]|%x|%N|\bfunc(?:file|source)trace\b')
+RETURN_RE = re.compile(r'(?<![\w:.$-])return\b')
+# The whole `return [n]`: `break n` would leave n enclosing loops, and zsh
+# rejects it at run time when n exceeds the one `repeat 1` loop
+RETURN_STATUS_RE = re.compile(r'(?<![\w:.$-])return\b(?:[ \t]+[^\s;&|)}]+)?')
+
+
+@dataclass
+class Section:
+    path: str            # fragment path relative to the base directory
+    family: str
+    mode: str            # inline, wrapped, source or skip
+    start: int           # bundle line of the fragment's first line
+    end: int             # bundle line of its last line
+    function_line: int   # bundle line of the enclosing `name() {`
+    reason: str = ''
+
+
+def default_bundle_path() -> Path:
+    """$ZSH_CACHE_DIR/startup-bundle.zsh, next to the manifest."""
+    return default_manifest_path().with_name('startup-bundle.zsh')
+
+
+def map_path(bundle: Path) -> Path:
+    return bundle.with_suffix('.map.json')
+
+
+def function_name(family: str) -> str:
+    return f'zf::bundle::{family}'
+
+
+def prepare(text: str) -> Tuple[str, List[str], str]:
+    """Return (mode, lines, reason) for one fragment.
+
+    Top-level returns are rewritten in place so line numbers do not move.
+    """
+    code = '\n'.join(line for line in text.split('\n') if not line.lstrip().startswith('#'))
+    m = SELF_REF_RE.search(code)
+    if m:
+        return 'source', [], f'refers to its own path ({m.group(0)})'
+    script = scan(text)
+    returns = [c for c in script.commands
+               if not c.in_function and c.stages and c.stages[0].split()[:1] == ['return']]
+    lines = text.rstrip('\n').split('\n') if text.strip() else []
+    if not returns:
+        return 'inline', lines, ''
+    for c in returns:
+        if c.in_loop:
+            return 'source', [], f'returns from inside a loop (line {c.line})'
+        if len(RETURN_RE.findall(lines[c.line - 1])) != 1:
+            return 'source', [], f'more than one return on line {c.line}'
+
+    final = returns[-1]
+    if final is script.commands[-1] and not final.context and not final.joined:
+        lines[final.line - 1] = RETURN_RE.sub(':', lines[final.line - 1])
+        returns = returns[:-1]
+    for c in returns:
+        lines[c.line - 1] = RETURN_STATUS_RE.sub('break', lines[c.line - 1])
+    return ('wrapped' if returns else 'inline'), lines, ''
+
+
+def unbundled_files(layer_dir: Path) -> List[str]:
+    """Files the `*` glob would load that the manifest does not cover."""
+    return sorted(e.name for e in os.scandir(layer_dir)
+                  if e.is_file() and not e.name.startswith('.') and not e.name.endswith('.zsh'))
+
+
+def input_stamp(zshenv_local: bytes, entries: Sequence[dict], layers: Sequence[str]) -> str:
+    h = hashlib.sha256(f'v{VERSION}\n'.encode())
+    h.update(zshenv_local)
+    for layer in layers:
+        h.update(f'\0{layer}'.encode())
+    for e in entries:
+        h.update(f"\0{e['path']}\0{e['sha256']}".encode())
+    return h.hexdigest()
+
+
+def render_bundle(base_dir: Path, stamp: str, layers: Sequence[str], entries: Sequence[dict],
+                  skips: Dict[str, str]) -> Tuple[str, List[Section]]:
+    """Bundle text and its line map."""
+    q = lambda s: "'" + s.replace("'", "'\\''") + "'"  # noqa: E731
+    families = [layer_family(layer) for layer in layers]
+    inputs = ['.zshenv.local'] + [f'{fam}.live/' for fam in families]
+    inputs += [f"{layer_family(e['layer'])}/{e['name']}" for e in entries]
+    out = ['# Generated by bin/startup_bundle.py -- do not edit',
+           f'# stamp: {stamp}',
+           f"# Layers: {', '.join(layers)}",
+           '# Paths (relative to ZDOTDIR) that invalidate this bundle when newer',
+           'typeset -ga _ZF_BUNDLE_INPUTS',
+           '_ZF_BUNDLE_INPUTS=(' + ' '.join(q(p) for p in inputs) + ')',
+           '# .live symlinks and the layer each pointed at',
+           'typeset -ga _ZF_BUNDLE_LAYERS',
+           '_ZF_BUNDLE_LAYERS=(' + ' '.join(q(f'{fam}.live:{layer}')
+                                           for fam, layer in zip(families, layers)) + ')']
+    sections = []
+    for layer, family in zip(layers, families):
+        out.append('')
+        out.append(f'{function_name(family)}() {{')
+        function_line = len(out)
+        for e in (e for e in entries if e['layer'] == layer):
+            key = f"{family}/{e['name']}"
+            target = f'"${{ZDOTDIR:-$HOME}}/{key}"'
+            out.append(f"# --- {e['path']} ---")
+            if key in skips:
+                mode, lines, reason = 'skip', [], f'{skips[key]}=1 in .zshenv.local'
+                body = [f'[[ "${{{skips[key]}:-0}}" == 1 ]] || source {target}']
+            else:
+                text = (base_dir / e['path']).read_text(encoding='utf-8', errors='replace')
+                mode, lines, reason = prepare(text)
+                body = [f'source {target}'] if mode == 'source' else lines
+            if mode == 'wrapped':
+                out.append('repeat 1 do')
+            start = len(out) + 1
+            out.extend(body)
+            sections.append(Section(e['path'], family, mode, start, len(out), function_line, reason))
+            if mode == 'wrapped':
+                out.append('done')
+        out.append('}')
+    return '\n'.join(out) + '\n', sections
+
+
+def _zsh() -> Optional[str]:
+    return shutil.which('zsh')
+
+
+def check_syntax(path: Path) -> Optional[str]:
+    """`zsh -n` output for ``path`` if it fails, else None (also without zsh)."""
+    zsh = _zsh()
+    if not zsh:
+        return None
+    proc = subprocess.run([zsh, '-n', str(path)], capture_output=True, text=True)
+    return (proc.stderr or proc.stdout).strip() or 'syntax check failed' if proc.returncode else None
+
+
+def zcompile(path: Path) -> bool:
+    zsh = _zsh()
+    if not zsh:
+        return False
+    return subprocess.run([zsh, '-fc', 'zcompile -U "$1"', 'zsh', str(path)]).returncode == 0
+
+
+def build(base_dir: Path, layers: Sequence[str], manifest_path: Path, out: Path,
+          check: bool = False, compile_: bool = True):
+    """Rebuild ``out`` if its inputs changed; return (changed, sections, problems)."""
+    manifest, _ = update_manifest(base_dir, layers, manifest_path)
+    problems = []
+    bundled = []
+    for layer in layers:
+        if layer_family(layer) not in BUNDLED_FAMILIES:
+            continue
+        extra = unbundled_files(resolve_layer(base_dir, layer))
+        if extra:
+            problems.append(f"{layer} not bundled: {', '.join(extra)} would not be loaded")
+            continue
+        bundled.append(layer)
+    entries = [e for e in manifest['fragments'] if e['layer'] in bundled]
+    local = find_zshenv_local(base_dir)
+    data = local.read_bytes() if local else b''
+    stamp = input_stamp(data, entries, bundled)
+    try:
+        m = STAMP_RE.search(out.read_text(encoding='utf-8'))
+    except OSError:
+        m = None
+    if m and m.group(1) == stamp:
+        if not check:
+            os.utime(out)  # inputs were touched but not changed: mark the bundle fresh again
+        try:
+            sections = [Section(**s) for s in json.loads(map_path(out).read_text())['sections']]
+        except (OSError, ValueError, KeyError, TypeError):
+            sections = []
+        return False, sections, problems
+
+    skips = dict(skipped_fragments(entries, read_toggle_state(data.decode('utf-8', errors='replace'))))
+    text, sections = render_bundle(base_dir, stamp, bundled, entries, skips)
+    if check:
+        return True, sections, problems
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f'.{out.name}.check')
+    tmp.write_text(text, encoding='utf-8')
+    error = check_syntax(tmp)
+    tmp.unlink()
+    if error:
+        problems.append(f'zsh -n rejected the bundle, kept the previous one: {error}')
+        return False, sections, problems
+    atomic_write_chunks(map_path(out), [json.dumps(
+        {'version': VERSION, 'stamp': stamp, 'bundle': str(out),
+         'sections': [asdict(s) for s in sections]}, indent=2) + '\n'])
+    atomic_write_chunks(out, [text])
+    if compile_:
+        zcompile(out)
+    return True, sections, problems
+
+
+def where(location: str, sections: Sequence[Section]) -> Optional[Tuple[Section, int]]:
+    """Map `FUNCTION:LINE` or `[FILE:]LINE` in the bundle to (section, fragment line)."""
+    name, _, num = location.rpartition(':')
+    if not num.isdigit():
+        return None
+    line = int(num)
+    for s in sections:
+        if name.startswith('zf::bundle::'):
+            if function_name(s.family) != name:
+                continue
+            bundle_line = s.function_line + line - 1
+        else:
+            bundle_line = line
+        if s.start <= bundle_line <= s.end:
+            return s, bundle_line - s.start + 1 if s.mode in ('inline', 'wrapped') else 0
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bundle the live fragment layers into one startup file')
+    parser.add_argument('--base-dir', type=Path, default=ROOT,
+                        help='ZDOTDIR or chezmoi source directory (default: %(default)s)')
+    parser.add_argument('--layers', nargs='+', help='Layer directories (default: .live targets)')
+    parser.add_argument('--manifest', type=Path, default=default_manifest_path(),
+                        help='Module manifest (default: %(default)s)')
+    parser.add_argument('-o', '--output', type=Path, default=default_bundle_path(),
+                        help='Bundle file (default: %(default)s)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_build = sub.add_parser('build', help='Rebuild the bundle if its inputs changed')
+    p_build.add_argument('--check', action='store_true', help='Only report whether the bundle is stale')
+    p_build.add_argument('--no-zcompile', action='store_true', help='Do not compile the bundle')
+    p_build.add_argument('-q', '--quiet', action='store_true')
+    p_where = sub.add_parser('where', help='Map a bundle location back to its fragment')
+    p_where.add_argument('location', help='zf::bundle::FAMILY:LINE or [startup-bundle.zsh:]LINE')
+    args = parser.parse_args(argv)
+
+    if args.command == 'where':
+        try:
+            sections = [Section(**s) for s in json.loads(map_path(args.output).read_text())['sections']]
+        except (OSError, ValueError, KeyError, TypeError):
+            print(f"❌ No line map at {map_path(args.output)}")
+            return 1
+        found = where(args.location, sections)
+        if not found:
+            print(f"❌ {args.location} is outside every fragment")
+            return 1
+        section, line = found
+        print(f"{section.path}:{line}" if line else f"{section.path} ({section.mode}: {section.reason})")
+        return 0
+
+    layers = args.layers or live_layers(args.base_dir)
+    if not layers:
+        print(f"❌ No layers found under {args.base_dir}")
+        return 1
+    changed, sections, problems = build(args.base_dir, layers, args.manifest, args.output,
+                                        args.check, not args.no_zcompile)
+    for problem in problems:
+        print(f"⚠️  {problem}", file=sys.stderr)
+    if args.check:
+        if not args.quiet:
+            print(f"{'⚠️  Stale' if changed else '✅ Current'}: {args.output}")
+        return 1 if changed else 0
+    if not args.quiet:
+        state = '📝 Wrote' if changed else '✅ Unchanged'
+        counts = {mode: sum(s.mode == mode for s in sections)
+                  for mode in ('inline', 'wrapped', 'source', 'skip')}
+        print(f"{state} {args.output} ({len(sections)} fragments: "
+              + ', '.join(f'{n} {mode}' for mode, n in counts.items()) + ')')
+        for s in sections:
+            if s.mode in ('source', 'skip'):
+                print(f"   {'⏭️ ' if s.mode == 'skip' else '📄'} {s.path}  ({s.reason})")
+    return 1 if any(p.startswith('zsh -n') for p in problems) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
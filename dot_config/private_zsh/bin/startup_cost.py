@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Static startup-cost analyzer for the zshenv layers and zshrc fragments.
+
+Scans each file with the structural tokenizer (zsh_blocks.py) and flags
+the constructs that cost startup time:
+
+- subst          `$(...)`, backticks and `<(...)`: a fork, plus an exec
+                 for every external command inside
+- eval-init      `eval "$(tool init ...)"` / `source <(tool ...)`: fork,
+                 exec and the tool's own start-up, every shell
+- pipeline       pipelines: every stage but the last forks, every
+                 external stage execs
+- exec           a plain call of an external binary
+- probe-in-loop  `command -v` / `whence` / `which` / `type` / `hash`
+                 inside a loop (a PATH search per iteration)
+- compinit-repeat / autoload-repeat
+                 `compinit` or `autoload` of a function already handled
+                 earlier in load order
+
+Each finding gets an estimated cost from a deliberately simple model
+(COSTS, in ms; override with --cost NAME=MS). Costs inside loops are
+multiplied by `loop` per nesting level. Commands inside function bodies
+only run when the function is called: they are reported separately and
+not counted in the startup total. Conditional code is counted as if it
+runs. The numbers rank where to look; they are not measurements.
+
+Usage:
+    python3 bin/startup_cost.py [FILE ...] [--top N] [--min-ms MS]
+                                [--format text|json] [--cost NAME=MS]
+
+Without FILEs the live .zshenv layer, .zshenv.local and the live fragment
+layers are analyzed, in load order.
+"""
+
+import argparse
+import json
+import re
+import sys
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from toggle_index import find_zshenv_local
+from zsh_blocks import Command, scan
+from zsh_manifest import live_layers, resolve_layer, resolve_live
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Rough macOS figures (ms): fork of an interactive zsh, exec of a small
+# binary, a typical `tool init` run, a full compinit, one PATH search.
+COSTS = {
+    'fork': 1.0,
+    'exec': 2.0,
+    'init': 15.0,
+    'compinit': 30.0,
+    'probe': 0.05,
+    'autoload': 0.02,
+    'loop': 10.0,
+}
+
+HINTS = {
+    'subst': 'use a parameter expansion/builtin, or compute once and cache',
+    'eval-init': 'cache the generated code (_evalcache or a file in $ZSH_CACHE_DIR)',
+    'pipeline': 'replace with zsh expansions/builtins or move behind zsh-defer',
+    'exec': 'defer it, cache its result, or guard it so it does not run every start',
+    'probe-in-loop': 'use (( $+commands[name] )) instead of probing PATH per iteration',
+    'compinit-repeat': 'call compinit once (zgenom already does); use compdef afterwards',
+    'autoload-repeat': 'drop the duplicate autoload',
+}
+
+ZSH_BUILTINS = set('''
+    . : [ [[ (( alias autoload bg bindkey break builtin bye cd chdir command compadd
+    compcall compctl compdescribe compfiles compgroups compquote comptags comptry
+    compvalues continue declare dirs disable disown echo echotc echoti emulate enable
+    eval exec exit export false fc fg float functions getcap getln getopts hash history
+    integer jobs kill let limit local log logout noglob nocorrect popd print printf
+    private pushd pushln pwd r read readonly rehash return sched set setcap setopt
+    shift source suspend test time times trap true ttyctl type typeset ulimit umask
+    unalias unfunction unhash unlimit unset unsetopt vared wait whence where which
+    zcompile zformat zle zmodload zparseopts zprof zpty zregexparse zsocket zstyle ztcp
+    add-zsh-hook add-zle-hook-widget compdef compinit bashcompinit colors promptinit
+    is-at-least zmv zcalc zrecompile zsh-defer _evalcache zgenom zgen
+'''.split())
+RESERVED = {'if', 'then', 'elif', 'else', 'fi', 'for', 'foreach', 'select', 'repeat', 'while',
+            'until', 'do', 'done', 'case', 'esac', 'function', 'coproc', 'nocorrect', '}', '{', '!'}
+PREFIX_WORDS = {'noglob', 'nocorrect', 'builtin', 'exec', 'time', '-', 'command'}
+PROBES = {'whence', 'which', 'type', 'hash', 'where'}
+ASSIGNMENT_RE = re.compile(r'^[A-Za-z_][\w]*(?:\[[^\]]*\])?\+?=')
+REDIRECT_RE = re.compile(r'^\d*(?:[<>]|&>)')
+EVAL_INIT_RE = re.compile(r'^(?:eval\s+["\']?\$\(|(?:source|\.)\s+<\()')
+
+
+@dataclass
+class Finding:
+    file: str
+    line: int
+    rule: str
+    cost_ms: float
+    startup: bool
+    text: str
+    hint: str
+
+
+def command_word(stage: str) -> Optional[str]:
+    """The command a stage runs, after assignments, redirections and prefixes."""
+    words = stage.split()
+    while words:
+        w = words[0]
+        if ASSIGNMENT_RE.match(w) or REDIRECT_RE.match(w) or w in PREFIX_WORDS - {'command'}:
+            words.pop(0)
+        elif w == 'command' and len(words) > 1 and not words[1].startswith('-'):
+            words.pop(0)
+        else:
+            break
+    return words[0] if words else None
+
+
+def is_external(word: Optional[str], functions: Set[str]) -> bool:
+    if not word or word[0] in '$"\'({[`<>!' or word in ZSH_BUILTINS or word in RESERVED or word in functions:
+        return False
+    if '::' in word or word.startswith(('_', '+', '-')) or ASSIGNMENT_RE.match(word):
+        return False
+    return True
+
+
+def external_count(body: str, functions: Set[str]) -> int:
+    """External commands run by a substitution body, including nested ones."""
+    count = 0
+    for cmd in scan(body).commands:
+        count += sum(is_external(command_word(s), functions) for s in cmd.stages)
+        count += sum(external_count(sub.body, functions) for sub in cmd.substitutions)
+    return count
+
+
+def _short(text: str, width: int = 70) -> str:
+    text = ' '.join(text.split())
+    return text if len(text) <= width else text[:width - 1] + '…'
+
+
+def analyze_commands(label: str, commands: Iterable[Command], functions: Set[str],
+                     costs: Dict[str, float]) -> List[Finding]:
+    findings = []
+    for cmd in commands:
+        weight = costs['loop'] ** sum(kind in ('for', 'while', 'until', 'select', 'repeat')
+                                      for kind in cmd.context)
+        startup = not cmd.in_function
+
+        def add(rule, cost, text=None):
+            findings.append(Finding(label, cmd.line, rule, round(cost * weight, 3), startup,
+                                    _short(text or cmd.text), HINTS[rule]))
+
+        first = cmd.stages[0]
+        subs = list(cmd.substitutions)
+        if EVAL_INIT_RE.match(first) and subs:
+            sub = subs.pop(0)
+            add('eval-init', costs['fork'] + costs['exec'] * max(external_count(sub.body, functions), 1)
+                + costs['init'])
+        for sub in subs:
+            body = sub.body.strip()
+            if sub.kind == '$(' and body.startswith('<') and not body.startswith('<('):
+                continue  # $(<file) is read without forking
+            add('subst', costs['fork'] + costs['exec'] * external_count(body, functions),
+                f"{'`' if sub.kind == '`' else sub.kind}{body}{'`' if sub.kind == '`' else ')'}")
+
+        words = [command_word(s) for s in cmd.stages]
+        externals = [w for w in words if is_external(w, functions)]
+        if len(cmd.stages) > 1:
+            add('pipeline', costs['fork'] * (len(cmd.stages) - 1) + costs['exec'] * len(externals))
+        elif externals:
+            add('exec', costs['fork'] + costs['exec'])
+
+        if cmd.in_loop:
+            for stage in cmd.stages:
+                parts = stage.split()
+                w = command_word(stage)
+                if (w in PROBES or (parts[:1] == ['command'] and len(parts) > 1
+                                    and parts[1] in ('-v', '-V'))):
+                    add('probe-in-loop', costs['probe'])
+    return findings
+
+
+def repeated_calls(label: str, commands: Iterable[Command], seen: Dict[str, list],
+                   costs: Dict[str, float]) -> List[Finding]:
+    """compinit/autoload calls that repeat one made earlier in load order.
+
+    Calls in different branches of the same if (a fallback `compinit`
+    in an elif) are alternatives, not repeats.
+    """
+    findings = []
+    for cmd in commands:
+        if cmd.in_function:
+            continue
+        for stage in cmd.stages:
+            words = stage.split()
+            w = command_word(stage)
+            if w == 'compinit':
+                keys = [('compinit', 'compinit-repeat', _short(stage))]
+            elif w == 'autoload':
+                keys = [(f'autoload {name}', 'autoload-repeat', f'autoload {name}')
+                        for name in words[words.index('autoload') + 1:]
+                        if not name.startswith(('-', '+')) and re.match(r'^[\w:.-]+$', name)]
+            else:
+                continue
+            for key, rule, text in keys:
+                earlier = [(f, c) for f, c in seen.get(key, ()) if f != label or not c.exclusive_with(cmd)]
+                if earlier:
+                    first = f'{earlier[0][0]}:{earlier[0][1].line}'
+                    cost = costs['compinit' if rule == 'compinit-repeat' else 'autoload']
+                    findings.append(Finding(label, cmd.line, rule, cost, True, text,
+                                            f'{HINTS[rule]} (first: {first})'))
+                seen.setdefault(key, []).append((label, cmd))
+    return findings
+
+
+def default_targets(base_dir: Path) -> List[Path]:
+    """The live .zshenv layer, .zshenv.local and the live fragment layers."""
+    targets = []
+    env = resolve_live(base_dir, '.zshenv')
+    if env:
+        for name in (env, 'dot_' + env[1:]):
+            if (base_dir / name).is_file():
+                targets.append(base_dir / name)
+                break
+    local = find_zshenv_local(base_dir)
+    if local:
+        targets.append(local)
+    for layer in live_layers(base_dir):
+        layer_dir = resolve_layer(base_dir, layer)
+        if layer_dir:
+            targets += sorted(layer_dir.glob('*.zsh'))
+    return targets
+
+
+def analyze(paths: List[Path], base_dir: Path, costs: Dict[str, float]) -> List[Finding]:
+    scripts = {}
+    functions: Set[str] = set()
+    for path in paths:
+        try:
+            label = str(path.resolve().relative_to(base_dir.resolve()))
+        except ValueError:
+            label = str(path)
+        scripts[label] = scan(path.read_text(encoding='utf-8', errors='replace'))
+        functions.update(name for _, name in scripts[label].functions)
+
+    findings = []
+    seen: Dict[str, list] = {}
+    for label, script in scripts.items():
+        findings += analyze_commands(label, script.commands, functions, costs)
+        findings += repeated_calls(label, script.commands, seen, costs)
+    return findings
+
+
+def summarize(findings: List[Finding]) -> List[dict]:
+    """Per-file totals, most expensive file first, findings ranked by cost."""
+    by_file = defaultdict(list)
+    for f in findings:
+        by_file[f.file].append(f)
+    files = []
+    for name, items in by_file.items():
+        items.sort(key=lambda f: (not f.startup, -f.cost_ms, f.line))
+        files.append({
+            'file': name,
+            'startup_ms': round(sum(f.cost_ms for f in items if f.startup), 2),
+            'deferred_ms': round(sum(f.cost_ms for f in items if not f.startup), 2),
+            'findings': [asdict(f) for f in items],
+        })
+    return sorted(files, key=lambda f: (-f['startup_ms'], f['file']))
+
+
+def render_text(files: List[dict], top: int, min_ms: float) -> str:
+    out = ['📊 Estimated startup cost (static fork/exec model, not a measurement)', '']
+    for entry in files:
+        shown = [f for f in entry['findings'] if f['startup'] and f['cost_ms'] >= min_ms][:top]
+        if not shown and entry['startup_ms'] < min_ms:
+            continue
+        out.append(f"{entry['file']}  ~{entry['startup_ms']:.1f} ms at startup"
+                   + (f" (+{entry['deferred_ms']:.1f} ms inside functions)" if entry['deferred_ms'] else ''))
+        for f in shown:
+            out.append(f"  {f['cost_ms']:7.2f} ms  L{f['line']:<5} {f['rule']:<16} {f['text']}")
+            out.append(f"  {'':>10}  ↳ {f['hint']}")
+        hidden = sum(1 for f in entry['findings'] if f['startup']) - len(shown)
+        if hidden > 0:
+            out.append(f'  ... {hidden} more')
+        out.append('')
+    total = sum(f['startup_ms'] for f in files)
+    out.append(f'Total: ~{total:.1f} ms estimated across {len(files)} file(s)')
+    return '\n'.join(out)
+
+
+def parse_cost(value: str):
+    name, _, ms = value.partition('=')
+    if name not in COSTS:
+        raise argparse.ArgumentTypeError(f"unknown cost '{name}' (one of: {', '.join(COSTS)})")
+    try:
+        return name, float(ms)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'not a number: {ms!r}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rank startup-cost constructs in zsh files')
+    parser.add_argument('files', nargs='*', type=Path, help='Files to analyze (default: live layers)')
+    parser.add_argument('--base-dir', type=Path, default=ROOT,
+                        help='ZDOTDIR or chezmoi source directory (default: %(default)s)')
+    parser.add_argument('--top', type=int, default=10, help='Findings shown per file (default: %(default)s)')
+    parser.add_argument('--min-ms', type=float, default=0.0, help='Hide findings cheaper than this')
+    parser.add_argument('--format', choices=('text', 'json'), default='text')
+    parser.add_argument('--cost', action='append', type=parse_cost, default=[], metavar='NAME=MS',
+                        help=f"Override a cost model entry ({', '.join(COSTS)})")
+    args = parser.parse_args(argv)
+
+    costs = dict(COSTS, **dict(args.cost))
+    paths = args.files or default_targets(args.base_dir)
+    if not paths:
+        print(f"❌ No zsh files found under {args.base_dir}")
+        return 1
+    files = summarize(analyze(paths, args.base_dir, costs))
+    if args.format == 'json':
+        print(json.dumps({'costs': costs, 'files': files}, indent=2))
+    else:
+        print(render_text(files, args.top, args.min_ms))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
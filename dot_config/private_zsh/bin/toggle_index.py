@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Toggle index and precomputed skip list for disabled ZF_ features.
+
+Fragments honor `ZF_*` / `NO_*` toggles at runtime, so a disabled feature
+still costs an open, read and parse of its file. This tool builds, from the
+module manifest (zsh_manifest.py):
+
+- a toggle index mapping every variable to the fragments it gates, and
+  whether it gates the whole file (a top-of-file guard, see ``guards`` in
+  the manifest) or only part of it
+- a skip list for the toggle state in `.zshenv.local`: the fragments whose
+  whole-file guard is set to 1 there
+
+The skip list is a small zsh file in $ZSH_CACHE_DIR that the
+load-shell-fragments override (020-zqs-overrides.zsh) sources once; listed
+fragments are never opened. Each entry names its toggle and is only skipped
+while that toggle is still 1, so an environment override wins. The file
+records its inputs; when `.zshenv.local`, a layer directory, a skipped
+fragment or a .live symlink changes, the shell ignores the stale list and
+regenerates it in the background. The generator itself only rewrites the
+file when the input stamp changes (otherwise it just refreshes the mtime).
+Pre-plugin fragments load before the override exists, so in practice the
+list saves opens in the layers read through load-shell-fragments later on.
+
+Usage:
+    python3 bin/toggle_index.py index [--format text|json]
+    python3 bin/toggle_index.py skip-list [-o FILE] [--check] [--quiet]
+
+Exit codes:
+    0 - success (skip-list --check: list is current)
+    1 - error (skip-list --check: list is missing or stale)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from backup_journal import atomic_write_chunks
+from zsh_manifest import default_manifest_path, layer_family, live_layers, update_manifest
+
+ROOT = Path(__file__).resolve().parent.parent
+VERSION = 1
+STAMP_RE = re.compile(r'^# stamp: ([0-9a-f]{64})$', re.MULTILINE)
+
+# Top-level toggle assignments in .zshenv.local
+ASSIGN_RE = re.compile(
+    r'^(?:export\s+|typeset\s+(?:-[a-zA-Z]+\s+)*)?((?:ZF|NO)_[A-Z0-9_]+)=(["\']?)([^"\'\s;]*)\2\s*(?:;|#.*)?$'
+)
+OPEN_RE = re.compile(r'^(?:if|for|while|until|case|select|function)\b|\{\s*$')
+CLOSE_RE = re.compile(r'^(?:fi|done|esac|\})(?:\s|;|$)')
+INLINE_CLOSE_RE = re.compile(r'(?:\bfi|\bdone|\besac|\})\s*;?\s*$')
+
+
+def default_skip_list_path() -> Path:
+    """$ZSH_CACHE_DIR/fragment-skip-list.zsh, next to the manifest."""
+    return default_manifest_path().with_name('fragment-skip-list.zsh')
+
+
+def find_zshenv_local(base_dir: Path) -> Optional[Path]:
+    """`.zshenv.local` in a deployed tree, `dot_zshenv.local` in the source."""
+    for name in ('.zshenv.local', 'dot_zshenv.local'):
+        if (base_dir / name).is_file():
+            return base_dir / name
+    return None
+
+
+def read_toggle_state(text: str) -> Dict[str, str]:
+    """Unconditional ZF_/NO_ assignments in ``text``; the last one wins.
+
+    Assignments inside functions, conditionals and loops are ignored since
+    their effect cannot be known without running the shell.
+    """
+    state = {}
+    depth = 0
+    for raw in text.split('\n'):
+        line = raw.strip()
+        if not line or line.startswith('#'):
+            continue
+        if CLOSE_RE.match(line):
+            depth = max(depth - 1, 0)
+            continue
+        if OPEN_RE.search(line) and not INLINE_CLOSE_RE.search(line):
+            depth += 1
+            continue
+        m = ASSIGN_RE.match(line)
+        if m and depth == 0:
+            state[m.group(1)] = m.group(3)
+    return state
+
+
+def fragment_key(entry: dict) -> str:
+    """Key used by load-shell-fragments: '<family>/<name>'."""
+    return f"{layer_family(entry['layer'])}/{entry['name']}"
+
+
+def toggle_index(entries: Sequence[dict]) -> Dict[str, List[dict]]:
+    """Map each toggle to the fragments it gates."""
+    index = defaultdict(list)
+    for e in entries:
+        for var in sorted(set(e['toggles']) | set(e.get('guards', []))):
+            index[var].append({
+                'fragment': fragment_key(e),
+                'path': e['path'],
+                'gates': 'file' if var in e.get('guards', []) else 'partial',
+            })
+    return dict(sorted(index.items()))
+
+
+def skipped_fragments(entries: Sequence[dict], state: Dict[str, str]) -> List[Tuple[str, str]]:
+    """(fragment key, toggle) for every fragment a toggle set to 1 switches off."""
+    skips = []
+    for e in entries:
+        for var in e.get('guards', []):
+            if state.get(var) == '1':
+                skips.append((fragment_key(e), var))
+                break
+    return skips
+
+
+def input_stamp(zshenv_local: bytes, entries: Sequence[dict], layers: Sequence[str]) -> str:
+    h = hashlib.sha256(f'v{VERSION}\n'.encode())
+    h.update(zshenv_local)
+    for layer in layers:
+        h.update(f'\0{layer}'.encode())
+    for e in entries:
+        h.update(f"\0{e['path']}\0{e['sha256']}".encode())
+    return h.hexdigest()
+
+
+def render_skip_list(stamp: str, layers: Sequence[str], skips: Sequence[Tuple[str, str]]) -> str:
+    families = [layer_family(layer) for layer in layers]
+    inputs = ['.zshenv.local'] + [f'{fam}.live/' for fam in families] + [key for key, _ in skips]
+    q = lambda s: "'" + s.replace("'", "'\\''") + "'"  # noqa: E731
+    out = ['# Generated by bin/toggle_index.py -- do not edit',
+           f'# stamp: {stamp}',
+           '# Fragments switched off by a whole-file toggle guard set in .zshenv.local',
+           'typeset -gA _ZF_SKIP_FRAGMENTS',
+           '_ZF_SKIP_FRAGMENTS=(']
+    out += [f'  {q(key)} {var}' for key, var in skips]
+    out.append(')')
+    out.append('# Paths (relative to ZDOTDIR) that invalidate this list when newer')
+    out.append('typeset -ga _ZF_SKIP_INPUTS')
+    out.append('_ZF_SKIP_INPUTS=(' + ' '.join(q(p) for p in inputs) + ')')
+    out.append('# .live symlinks and the layer each pointed at')
+    out.append('typeset -ga _ZF_SKIP_LAYERS')
+    out.append('_ZF_SKIP_LAYERS=(' + ' '.join(q(f'{fam}.live:{layer}')
+                                               for fam, layer in zip(families, layers)) + ')')
+    return '\n'.join(out) + '\n'
+
+
+def update_skip_list(base_dir: Path, layers: Sequence[str], manifest_path: Path,
+                     out: Path, check: bool = False):
+    """Regenerate ``out`` if its inputs changed; return (changed, skips)."""
+    manifest, _ = update_manifest(base_dir, layers, manifest_path)
+    entries = [e for e in manifest['fragments'] if e['layer'] in layers]
+    local = find_zshenv_local(base_dir)
+    data = local.read_bytes() if local else b''
+    stamp = input_stamp(data, entries, layers)
+    skips = skipped_fragments(entries, read_toggle_state(data.decode('utf-8', errors='replace')))
+    try:
+        m = STAMP_RE.search(out.read_text(encoding='utf-8'))
+    except OSError:
+        m = None
+    if m and m.group(1) == stamp:
+        if not check:
+            os.utime(out)  # inputs were touched but not changed: mark the list fresh again
+        return False, skips
+    if not check:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_chunks(out, [render_skip_list(stamp, layers, skips)])
+    return True, skips
+
+
+def render_index(index: Dict[str, List[dict]], state: Dict[str, str]) -> str:
+    out = []
+    for var, gated in index.items():
+        value = state.get(var)
+        out.append(f"{var}" + (f"  (.zshenv.local: {value})" if value is not None else ''))
+        out += [f"  {g['gates']:<8} {g['fragment']}" for g in gated]
+    return '\n'.join(out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Toggle index and fragment skip list')
+    parser.add_argument('--base-dir', type=Path, default=ROOT,
+                        help='ZDOTDIR or chezmoi source directory (default: %(default)s)')
+    parser.add_argument('--layers', nargs='+', help='Layer directories (default: .live targets)')
+    parser.add_argument('--manifest', type=Path, default=default_manifest_path(),
+                        help='Module manifest (default: %(default)s)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_index = sub.add_parser('index', help='Show which fragments each toggle gates')
+    p_index.add_argument('--format', choices=('text', 'json'), default='text')
+    p_skip = sub.add_parser('skip-list', help='Regenerate the skip list if its inputs changed')
+    p_skip.add_argument('-o', '--output', type=Path, default=default_skip_list_path(),
+                        help='Skip list file (default: %(default)s)')
+    p_skip.add_argument('--check', action='store_true', help='Only report whether the list is stale')
+    p_skip.add_argument('-q', '--quiet', action='store_true')
+    args = parser.parse_args(argv)
+
+    layers = args.layers or live_layers(args.base_dir)
+    if not layers:
+        print(f"❌ No layers found under {args.base_dir}")
+        return 1
+
+    if args.command == 'index':
+        manifest, _ = update_manifest(args.base_dir, layers, args.manifest)
+        index = toggle_index([e for e in manifest['fragments'] if e['layer'] in layers])
+        local = find_zshenv_local(args.base_dir)
+        state = read_toggle_state(local.read_text(encoding='utf-8', errors='replace')) if local else {}
+        if args.format == 'json':
+            print(json.dumps({'toggles': index, 'state': state}, indent=2))
+        else:
+            print(render_index(index, state))
+        return 0
+
+    changed, skips = update_skip_list(args.base_dir, layers, args.manifest, args.output, args.check)
+    if args.check:
+        if not args.quiet:
+            print(f"{'⚠️  Stale' if changed else '✅ Current'}: {args.output}")
+        return 1 if changed else 0
+    if not args.quiet:
+        state = '📝 Wrote' if changed else '✅ Unchanged'
+        print(f"{state} {args.output} ({len(skips)} fragment(s) skipped)")
+        for key, var in skips:
+            print(f"   ⏭️  {key}  ({var}=1)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
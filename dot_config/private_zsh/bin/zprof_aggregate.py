@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Aggregate zprof dumps from many shell startups into one stable ranking.
+
+A single zprof run is noisy: a cold cache or a background job reorders
+the top of the table from one startup to the next. This reads any number
+of dumps (files or directories; one file may hold several dumps, e.g. a
+log appended to on every startup), and reports for each function:
+
+- how many runs it appeared in and its mean call count
+- median, mean and standard deviation of self and total time (ms), with
+  a function missing from a run counted as 0 ms in that run
+- its rank by median self time, which is what the table is sorted by
+
+Only the flat table at the top of each dump is read; the call graph that
+follows repeats the same numbers. Names that change on every plugin
+reload are normalized first (NORMALIZE, extend with --normalize
+REGEX=REPL), e.g. `_zsh_autosuggest_bound_3_accept-line` becomes
+`_zsh_autosuggest_bound_N_accept-line` and zsh-syntax-highlighting's
+`_zsh_highlight_widget_orig-s0.0000030000-r1234-` prefix is dropped;
+names merged this way are summed within a run.
+
+Functions are mapped back to where they are defined, in load order with
+later definitions winning: the live .zshenv layer, .zshenv.local,
+.zshrc, the fragments of the live layers (through the `functions` field
+of the module manifest), .zshrc.local, then any --source files or
+directories (plugin checkouts; in autoload dirs a file named after a
+function defines it).
+
+Capture dumps with the quickstart switch (`zqs enable-zsh-profiling`,
+which runs zprof at the end of .zshrc) and append them to one file:
+
+    for i in {1..20}; do zsh -i -c exit >> zprof.log; done
+
+Usage:
+    python3 bin/zprof_aggregate.py DUMP... [--top N] [--sort self|total|calls]
+                                   [--source PATH]... [--normalize REGEX=REPL]...
+                                   [--base-dir DIR] [--format text|json]
+
+Exit codes:
+    0 - success
+    1 - no zprof table found in the input
+"""
+
+import argparse
+import json
+import math
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from toggle_index import find_zshenv_local
+from zsh_blocks import scan
+from zsh_manifest import default_manifest_path, live_layers, resolve_live, update_manifest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEADER_RE = re.compile(r'^num\s+calls\s+time\s+self\s+name\s*$')
+ROW_RE = re.compile(
+    r'^\s*\d+\)\s+(\d+)'                              # rank, calls
+    r'\s+([\d.]+)\s+[\d.]+\s+[\d.]+%'                 # total ms, avg, share
+    r'\s+([\d.]+)\s+[\d.]+\s+[\d.]+%'                 # self ms, avg, share
+    r'\s+(.+?)\s*$'
+)
+
+# Names that embed a reload counter or a random tag
+NORMALIZE = [
+    (r'^(_zsh_autosuggest_(?:bound|orig))_\d+_', r'\1_N_'),
+    (r'^_zsh_highlight_widget_orig-s[\d.]+-r\d+-', '_zsh_highlight_widget_orig-'),
+    (r'^\(anon\).*', '(anon)'),
+    (r'^\(eval\).*', '(eval)'),
+]
+
+SOURCE_SUFFIXES = ('.zsh', '.zsh-theme', '.sh', '')
+
+
+@dataclass
+class Row:
+    calls: int
+    total_ms: float
+    self_ms: float
+
+
+def iter_dumps(lines: Iterable[str]) -> Iterator[Dict[str, Row]]:
+    """The flat table of every zprof dump in ``lines``, keyed by raw name."""
+    table: Optional[Dict[str, Row]] = None
+    for line in lines:
+        if HEADER_RE.match(line):
+            if table:
+                yield table
+            table = {}
+            continue
+        if table is None:
+            continue
+        m = ROW_RE.match(line)
+        if m:
+            table[m.group(4)] = Row(int(m.group(1)), float(m.group(2)), float(m.group(3)))
+        elif table and not line.strip('-\n '):
+            # The blank or dashed line after the rows starts the call graph
+            yield table
+            table = None
+    if table:
+        yield table
+
+
+def read_dumps(paths: Iterable[Path]) -> List[Dict[str, Row]]:
+    dumps = []
+    for path in paths:
+        files = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+        for file in files:
+            with open(file, encoding='utf-8', errors='replace') as f:
+                dumps.extend(iter_dumps(f))
+    return dumps
+
+
+def normalizer(rules: List[Tuple[str, str]]):
+    compiled = [(re.compile(pattern), repl) for pattern, repl in rules]
+
+    def normalize(name: str) -> str:
+        for regex, repl in compiled:
+            name = regex.sub(repl, name)
+        return name
+    return normalize
+
+
+def normalize_dump(dump: Dict[str, Row], normalize) -> Dict[str, Row]:
+    merged: Dict[str, Row] = {}
+    for name, row in dump.items():
+        key = normalize(name)
+        if key in merged:
+            prev = merged[key]
+            merged[key] = Row(prev.calls + row.calls, prev.total_ms + row.total_ms, prev.self_ms + row.self_ms)
+        else:
+            merged[key] = row
+    return merged
+
+
+def _source_files(path: Path) -> List[Path]:
+    if path.is_file():
+        return [path]
+    return sorted(p for p in path.rglob('*') if p.is_file() and p.suffix in SOURCE_SUFFIXES)
+
+
+def _config_files(base_dir: Path, names: Iterable[Optional[str]]) -> List[Path]:
+    found = []
+    for name in names:
+        if not name:
+            continue
+        for candidate in (name, 'dot_' + name[1:]):
+            if (base_dir / candidate).is_file():
+                found.append(base_dir / candidate)
+                break
+    return found
+
+
+def function_index(base_dir: Path, manifest_path: Path, sources: List[Path]) -> Dict[str, Tuple[str, int]]:
+    """function name -> (file, line), later definitions winning."""
+    index: Dict[str, Tuple[str, int]] = {}
+
+    def add_file(path: Path, label: str):
+        text = path.read_text(encoding='utf-8', errors='replace')
+        for line, name in scan(text).functions:
+            index[name] = (label, line)
+        # An autoload file is the body of the function it is named after
+        if not path.suffix:
+            index.setdefault(path.name, (label, 1))
+
+    def label(path: Path) -> str:
+        try:
+            return str(path.resolve().relative_to(base_dir.resolve()))
+        except ValueError:
+            return str(path)
+
+    early = _config_files(base_dir, [resolve_live(base_dir, '.zshenv')])
+    local = find_zshenv_local(base_dir)
+    early += [local] if local else []
+    early += _config_files(base_dir, ['.zshrc'])
+    for path in early:
+        add_file(path, label(path))
+    layers = live_layers(base_dir)
+    if layers:
+        manifest, _ = update_manifest(base_dir, layers, manifest_path)
+        for entry in manifest['fragments']:
+            if entry['layer'] in layers:
+                for name, line in entry.get('functions', {}).items():
+                    index[name] = (entry['path'], line)
+    for path in _config_files(base_dir, ['.zshrc.local']):
+        add_file(path, label(path))
+    for source in sources:
+        for path in _source_files(source):
+            add_file(path, label(path))
+    return index
+
+
+def _spread(values: List[float]) -> dict:
+    ordered = sorted(values)
+    n = len(ordered)
+    median = ordered[n // 2] if n % 2 else (ordered[n // 2 - 1] + ordered[n // 2]) / 2
+    mean = math.fsum(ordered) / n
+    stddev = math.sqrt(math.fsum((v - mean) ** 2 for v in ordered) / (n - 1)) if n > 1 else 0.0
+    return {'median': round(median, 3), 'mean': round(mean, 3), 'stddev': round(stddev, 3),
+            'rsd': round(stddev / mean, 4) if mean else 0.0}
+
+
+def aggregate(dumps: List[Dict[str, Row]], index: Dict[str, Tuple[str, int]]) -> List[dict]:
+    """Per-function statistics over ``dumps`` (already normalized)."""
+    names = sorted({name for dump in dumps for name in dump})
+    absent = Row(0, 0.0, 0.0)
+    functions = []
+    for name in names:
+        rows = [dump.get(name, absent) for dump in dumps]
+        where = index.get(name)
+        functions.append({
+            'name': name,
+            'runs': sum(1 for dump in dumps if name in dump),
+            'calls': round(sum(r.calls for r in rows) / len(rows), 2),
+            'self_ms': _spread([r.self_ms for r in rows]),
+            'total_ms': _spread([r.total_ms for r in rows]),
+            'file': where[0] if where else None,
+            'line': where[1] if where else None,
+        })
+    return functions
+
+
+def render_text(functions: List[dict], runs: int, top: int) -> str:
+    out = [f"📊 {len(functions)} functions over {runs} zprof runs (median of each, ± stddev)", '',
+           f"{'#':>3} {'self ms':>16} {'total ms':>16} {'calls':>7} {'runs':>5}  function  (defined in)"]
+    for rank, f in enumerate(functions[:top], 1):
+        s, t = f['self_ms'], f['total_ms']
+        where = f"{f['file']}:{f['line']}" if f['file'] else '?'
+        out.append(f"{rank:>3} {s['median']:>8.2f} ±{s['stddev']:>6.2f} {t['median']:>8.2f} ±{t['stddev']:>6.2f} "
+                   f"{f['calls']:>7g} {f['runs']:>5}  {f['name']}  ({where})")
+    return '\n'.join(out)
+
+
+def parse_rule(value: str) -> Tuple[str, str]:
+    pattern, sep, repl = value.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f'expected REGEX=REPL, got {value!r}')
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f'bad regex {pattern!r}: {e}')
+    return pattern, repl
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Aggregate zprof dumps across runs')
+    parser.add_argument('dumps', nargs='+', type=Path, help='files or directories of zprof output')
+    parser.add_argument('--top', type=int, default=30)
+    parser.add_argument('--sort', choices=['self', 'total', 'calls'], default='self',
+                        help='rank by median self or total time, or by mean calls (default: self)')
+    parser.add_argument('--source', type=Path, action='append', default=[],
+                        help='extra file or directory to find definitions in (plugins, autoload dirs)')
+    parser.add_argument('--normalize', type=parse_rule, action='append', default=[], metavar='REGEX=REPL')
+    parser.add_argument('--base-dir', type=Path, default=ROOT)
+    parser.add_argument('--manifest', type=Path, default=default_manifest_path())
+    parser.add_argument('--format', choices=['text', 'json'], default='text')
+    args = parser.parse_args(argv)
+
+    dumps = read_dumps(args.dumps)
+    if not dumps:
+        print("❌ No zprof output found (expected a 'num  calls  time  self  name' table)", file=sys.stderr)
+        return 1
+    normalize = normalizer(NORMALIZE + args.normalize)
+    dumps = [normalize_dump(dump, normalize) for dump in dumps]
+    functions = aggregate(dumps, function_index(args.base_dir, args.manifest, args.source))
+    if args.sort == 'calls':
+        functions.sort(key=lambda f: (-f['calls'], f['name']))
+    else:
+        functions.sort(key=lambda f: (-f[f'{args.sort}_ms']['median'], -f[f'{args.sort}_ms']['mean'], f['name']))
+
+    if args.format == 'json':
+        print(json.dumps({'runs': len(dumps), 'sort': args.sort, 'functions': functions[:args.top]}, indent=2))
+    else:
+        print(render_text(functions, len(dumps), args.top))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
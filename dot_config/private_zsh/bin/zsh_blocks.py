@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Lightweight structural tokenizer for zsh sources.
+
+Splits a script into pipelines and keeps track of just enough grammar to
+know where each one sits: quoting, `$(...)` / backtick / `<(...)`
+substitutions, `[[ ]]` and `(( ))`, comments, heredoc bodies, case
+patterns, and the compound commands around it (if, loops, case, function
+bodies, { } groups). It is not a full parser; the point is that analysis
+and rewriting tools never mistake a heredoc line, a substituted command or
+a case pattern for top-level code.
+
+Substitution bodies are returned as text, not scanned recursively; call
+scan() on them when their commands matter.
+
+Library usage:
+    from zsh_blocks import scan
+    script = scan(text)
+    for cmd in script.commands:
+        cmd.line, cmd.stages, cmd.context, cmd.substitutions
+    words = split_words(cmd.stages[0])
+    spans = statements(script)   # top-level (first, last) lines, compounds kept whole
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+LOOP_KINDS = ('for', 'while', 'until', 'select', 'repeat')
+
+# Characters the scanner has to look at; everything else is copied in runs
+SPECIAL_RE = re.compile(r'[\\\'"`$()\[\]#<>;&|\n]')
+DQ_SPECIAL_RE = re.compile(r'[\\"`$\n]')
+HEREDOC_RE = re.compile(r'<<(-?)[ \t]*([\'"]?)([\w.@%+-]+)\2')
+FUNC_DEF_RE = re.compile(r'^([\w:.+@-]+)\s*\(\)\s*')
+FUNCTION_KW_RE = re.compile(r'^function\s+([\w:.+@-]+)(?:\s*\(\))?\s*')
+WORD_RE = re.compile(r'(\S+)\s*')
+
+
+@dataclass
+class Substitution:
+    line: int
+    body: str
+    kind: str  # '$(', '`' or '<(' (process substitution)
+
+
+@dataclass
+class Command:
+    """One pipeline, with the compound commands enclosing it."""
+    line: int
+    stages: List[str]
+    context: Tuple[str, ...] = ()
+    substitutions: List[Substitution] = field(default_factory=list)
+    end_line: int = 0
+    # (if id, branch index) of every enclosing if, innermost last
+    branches: Tuple[Tuple[int, int], ...] = ()
+    # '&&' or '||' when the pipeline only runs depending on the previous one
+    joined: str = ''
+
+    @property
+    def text(self) -> str:
+        return ' | '.join(self.stages)
+
+    @property
+    def in_loop(self) -> bool:
+        return any(kind in LOOP_KINDS for kind in self.context)
+
+    @property
+    def in_function(self) -> bool:
+        return 'function' in self.context
+
+    def exclusive_with(self, other: 'Command') -> bool:
+        """True when the two sit in different branches of the same if."""
+        mine = dict(self.branches)
+        return any(if_id in mine and mine[if_id] != branch for if_id, branch in other.branches)
+
+
+@dataclass
+class Script:
+    commands: List[Command]
+    functions: List[Tuple[int, str]]   # (line, name) of every definition
+    heredocs: List[Tuple[int, int]]    # (first, last) body lines
+    compounds: List[Tuple[int, int]] = field(default_factory=list)  # outermost (first, last) lines
+
+
+@dataclass
+class _Frame:
+    kind: str
+    start: int
+    line: int
+
+
+class _Scanner:
+    def __init__(self, text: str, context: Sequence[str], first_line: int):
+        self.text = text
+        self.ctx = list(context)
+        self.line = first_line
+        self.frames: List[_Frame] = []
+        self.buf: List[str] = []
+        self.stages: List[str] = []
+        self.subs: List[Substitution] = []
+        self.start_line: Optional[int] = None
+        self.pending_heredocs: List[Tuple[str, bool]] = []
+        self.pattern_mode = False
+        self.pending_function: Optional[str] = None
+        self.branches: List[Tuple[int, int]] = []
+        self.if_count = 0
+        self.joined = ''
+        self.base = len(self.ctx)
+        self.open_line: Optional[int] = None
+        self.script = Script([], [], [])
+
+    # -- helpers ---------------------------------------------------------
+
+    def _put(self, s: str):
+        if self.start_line is None and s.strip():
+            self.start_line = self.line
+        self.buf.append(s)
+
+    def _at_word_start(self, i: int) -> bool:
+        return i == 0 or self.text[i - 1] in ' \t\n;&|()'
+
+    def _in_substitution(self) -> bool:
+        return any(f.kind in ('$(', '`', '<(') for f in self.frames)
+
+    def _end_stage(self):
+        stage = ''.join(self.buf).strip()
+        self.buf = []
+        if stage:
+            self.stages.append(stage)
+
+    def _end_pipeline(self):
+        self._end_stage()
+        stages, subs = self.stages, self.subs
+        line = self.start_line or self.line
+        self.stages, self.subs, self.start_line = [], [], None
+        if stages:
+            self._emit(line, stages, subs)
+            self.joined = ''
+
+    def _push(self, kind: str, line: int):
+        if len(self.ctx) == self.base:
+            self.open_line = line
+        self.ctx.append(kind)
+
+    def _pop_until(self, kinds, line: int):
+        while len(self.ctx) > self.base:
+            kind = self.ctx.pop()
+            if kind == 'if' and self.branches:
+                self.branches.pop()
+            if kind in kinds:
+                break
+        if len(self.ctx) == self.base and self.open_line is not None:
+            self.script.compounds.append((self.open_line, line))
+            self.open_line = None
+
+    def _record(self, line: int, stages: List[str], subs: List[Substitution]):
+        self.script.commands.append(Command(line, stages, tuple(self.ctx), subs, self.line,
+                                            tuple(self.branches), self.joined))
+
+    def _emit(self, line: int, stages: List[str], subs: List[Substitution]):
+        """Consume reserved words at the start of the pipeline, then record it."""
+        first = stages[0]
+        while first:
+            m = FUNCTION_KW_RE.match(first) or FUNC_DEF_RE.match(first)
+            if m:
+                self.pending_function = m.group(1)
+                self.script.functions.append((line, m.group(1)))
+                first = first[m.end():]
+                continue
+            word_m = WORD_RE.match(first)
+            word, rest = word_m.group(1), first[word_m.end():]
+            if word in ('if', 'while', 'until'):
+                self._push(word, line)
+                if word == 'if':
+                    self.if_count += 1
+                    self.branches.append((self.if_count, 0))
+            elif word in ('elif', 'else'):
+                if self.branches:
+                    if_id, branch = self.branches[-1]
+                    self.branches[-1] = (if_id, branch + 1)
+            elif word in ('then', 'do', '!', 'always'):
+                pass
+            elif word == 'fi':
+                self._pop_until(('if',), line)
+            elif word == 'done':
+                self._pop_until(LOOP_KINDS, line)
+            elif word == 'esac':
+                self._pop_until(('case',), line)
+                self.pattern_mode = False
+            elif word == '{':
+                self._push('function' if self.pending_function else 'brace', line)
+                self.pending_function = None
+            elif word == '}':
+                self._pop_until(('function', 'brace'), line)
+            elif word in ('for', 'foreach', 'select', 'repeat', 'case'):
+                # The header runs once, in the enclosing context
+                self._record(line, [first] + stages[1:], subs)
+                if word == 'case':
+                    self._push('case', line)
+                    self.pattern_mode = True
+                else:
+                    self._push('for' if word == 'foreach' else word, line)
+                return
+            else:
+                break
+            first = rest
+        self.pending_function = None
+        if first or len(stages) > 1:
+            self._record(line, [first] + stages[1:] if first else stages[1:], subs)
+
+    def _read_heredocs(self, i: int) -> int:
+        """Skip the heredoc bodies that start after the newline at ``i - 1``."""
+        text = self.text
+        for delim, dash in self.pending_heredocs:
+            first = self.line
+            while i < len(text):
+                end = text.find('\n', i)
+                end = len(text) if end == -1 else end
+                body_line = text[i:end]
+                i = end + 1
+                self.line += 1
+                if (body_line.lstrip('\t') if dash else body_line).strip() == delim:
+                    break
+            self.script.heredocs.append((first, self.line - 1))
+        self.pending_heredocs = []
+        return i
+
+    # -- main loop -------------------------------------------------------
+
+    def run(self) -> Script:
+        text, n = self.text, len(self.text)
+        i = 0
+        while i < n:
+            top = self.frames[-1].kind if self.frames else None
+            m = (DQ_SPECIAL_RE if top == '"' else SPECIAL_RE).search(text, i)
+            j = m.start() if m else n
+            if j > i:
+                if self.pattern_mode and not self.frames:
+                    chunk = text[i:j]
+                    if chunk.strip() == 'esac' or chunk.lstrip().startswith('esac'):
+                        self.pattern_mode = False
+                        self._put(chunk)
+                else:
+                    self._put(text[i:j])
+                i = j
+                if i >= n:
+                    break
+            c = text[i]
+            nxt = text[i + 1] if i + 1 < n else ''
+
+            if c == '\\':
+                if nxt == '\n':
+                    self.line += 1
+                    self._put(' ')
+                else:
+                    self._put(text[i:i + 2])
+                i += 2
+                continue
+            if c == '\n':
+                self.line += 1
+                if top is None and not self.pattern_mode:
+                    # A trailing | keeps the pipeline open across lines
+                    if ''.join(self.buf).strip() or not self.stages:
+                        self._end_pipeline()
+                    if self.pending_heredocs:
+                        i = self._read_heredocs(i + 1)
+                        continue
+                elif top is not None:
+                    self._put(c)
+                i += 1
+                continue
+
+            if top == '"':
+                if c == '"':
+                    self.frames.pop()
+                    self._put(c)
+                    i += 1
+                    continue
+                # $, ` handled below like outside quotes
+            else:
+                if c == "'":
+                    ansi = i > 0 and text[i - 1] == '$'
+                    k = i + 1
+                    while k < n and text[k] != "'":
+                        k += 2 if ansi and text[k] == '\\' else 1
+                    self.line += text.count('\n', i, k)
+                    self._put(text[i:k + 1])
+                    i = k + 1
+                    continue
+                if c == '"':
+                    self.frames.append(_Frame('"', i, self.line))
+                    self._put(c)
+                    i += 1
+                    continue
+                if c == '#' and top in (None, '$(', '(', '<(') and self._at_word_start(i):
+                    end = text.find('\n', i)
+                    i = n if end == -1 else end
+                    continue
+
+            if c == '`':
+                if top == '`':
+                    frame = self.frames.pop()
+                    if not self._in_substitution():
+                        self.subs.append(Substitution(frame.line, text[frame.start + 1:i], '`'))
+                else:
+                    self.frames.append(_Frame('`', i, self.line))
+                self._put(c)
+                i += 1
+                continue
+            if c == '$':
+                if text.startswith('$((', i):
+                    self.frames.append(_Frame('((', i, self.line))
+                    self._put('$((')
+                    i += 3
+                    continue
+                if nxt == '(':
+                    self.frames.append(_Frame('$(', i, self.line))
+                    self._put('$(')
+                    i += 2
+                    continue
+                self._put(c)
+                i += 1
+                continue
+            if top == '"':
+                self._put(c)
+                i += 1
+                continue
+
+            # Unquoted context
+            if c == '(':
+                if self.pattern_mode and not self.frames and not ''.join(self.buf).strip():
+                    i += 1  # optional leading paren of a case pattern
+                    continue
+                if text.startswith('((', i) and not ''.join(self.buf).strip():
+                    self.frames.append(_Frame('((', i, self.line))
+                    self._put('((')
+                    i += 2
+                    continue
+                kind = '<(' if i > 0 and text[i - 1] in '<>' and self._at_word_start(i - 1) else '('
+                self.frames.append(_Frame(kind, i, self.line))
+                self._put(c)
+                i += 1
+                continue
+            if c == ')':
+                if top == '((' and text.startswith('))', i):
+                    self.frames.pop()
+                    self._put('))')
+                    i += 2
+                    continue
+                if top in ('$(', '<(', '(', '(('):
+                    frame = self.frames.pop()
+                    if frame.kind in ('$(', '<(') and not self._in_substitution():
+                        offset = 2 if frame.kind == '$(' else 1
+                        self.subs.append(Substitution(frame.line, text[frame.start + offset:i], frame.kind))
+                    self._put(c)
+                    i += 1
+                    continue
+                if top is None and (self.pattern_mode or 'case' in self.ctx[-1:]):
+                    # End of a case pattern: drop it, the item body follows
+                    self.buf, self.stages, self.start_line = [], [], None
+                    self.pattern_mode = False
+                    i += 1
+                    continue
+                self._put(c)
+                i += 1
+                continue
+            if c == '[' and nxt == '[' and self._at_word_start(i) and text[i + 2:i + 3] in (' ', '\t', '\n'):
+                self.frames.append(_Frame('[[', i, self.line))
+                self._put('[[')
+                i += 2
+                continue
+            if c == ']' and nxt == ']' and top == '[[':
+                self.frames.pop()
+                self._put(']]')
+                i += 2
+                continue
+            if c == '<' and top is None:
+                hm = HEREDOC_RE.match(text, i)
+                if hm and not text.startswith('<<<', i):
+                    self.pending_heredocs.append((hm.group(3), bool(hm.group(1))))
+                    self._put(hm.group(0))
+                    i = hm.end()
+                    continue
+            if top is not None or c in '<>#[':
+                self._put(c)
+                i += 1
+                continue
+
+            # Separators at the top level
+            if c == ';':
+                if nxt in ';&|':
+                    i += 2
+                    self._end_pipeline()
+                    if 'case' in self.ctx[-1:]:
+                        self.pattern_mode = True
+                    continue
+                self._end_pipeline()
+                i += 1
+                continue
+            if c == '&':
+                prev = text[i - 1] if i else ''
+                if nxt == '&':
+                    self._end_pipeline()
+                    self.joined = '&&'
+                    i += 2
+                    continue
+                if prev in '<>' or nxt == '>':
+                    self._put(c)  # redirection: >&2, &>file
+                    i += 1
+                    continue
+                self._end_pipeline()
+                i += 2 if nxt in '!|' else 1
+                continue
+            if c == '|':
+                if nxt == '|':
+                    self._end_pipeline()
+                    self.joined = '||'
+                    i += 2
+                    continue
+                if self.pattern_mode:
+                    i += 1
+                    continue
+                self._end_stage()
+                i += 2 if nxt == '&' else 1
+                continue
+            self._put(c)
+            i += 1
+
+        self._end_pipeline()
+        return self.script
+
+
+def split_words(text: str) -> List[str]:
+    """Split on unquoted blanks, keeping quotes and ${...}/$(...) intact."""
+    words, cur, i, depth, quote = [], [], 0, 0, None
+    while i < len(text):
+        c = text[i]
+        if quote:
+            cur.append(c)
+            if c == '\\' and quote == '"' and i + 1 < len(text):
+                cur.append(text[i + 1])
+                i += 1
+            elif c == quote:
+                quote = None
+        elif c in '\'"':
+            quote = c
+            cur.append(c)
+        elif c == '\\' and i + 1 < len(text):
+            cur.append(text[i:i + 2])
+            i += 1
+        elif c in '({':
+            depth += 1
+            cur.append(c)
+        elif c in ')}':
+            depth = max(depth - 1, 0)
+            cur.append(c)
+        elif c in ' \t\n' and not depth:
+            if cur:
+                words.append(''.join(cur))
+                cur = []
+        else:
+            cur.append(c)
+        i += 1
+    if cur:
+        words.append(''.join(cur))
+    return words
+
+
+def scan(text: str, context: Sequence[str] = (), first_line: int = 1) -> Script:
+    """Tokenize ``text`` into pipelines with their enclosing compound context."""
+    return _Scanner(text, context, first_line).run()
+
+
+def statements(script: Script) -> List[Tuple[int, int]]:
+    """(first, last) lines of every top-level statement, in order.
+
+    A compound command (if, loop, case, function, { }) is one statement
+    from its opening line to its closing keyword; a simple command extends
+    over its continuation lines and any heredoc bodies it starts.
+    """
+    spans = list(script.compounds)
+    inside = set()
+    for first, last in spans:
+        inside.update(range(first, last + 1))
+    heredocs = dict(script.heredocs)
+    for cmd in script.commands:
+        if cmd.context or cmd.line in inside:
+            continue
+        last = cmd.line + sum(stage.count('\n') for stage in cmd.stages)
+        while last + 1 in heredocs:
+            last = heredocs[last + 1]
+        spans.append((cmd.line, last))
+    merged: List[Tuple[int, int]] = []
+    for first, last in sorted(spans):
+        if merged and first <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(last, merged[-1][1]))
+        else:
+            merged.append((first, last))
+    return merged
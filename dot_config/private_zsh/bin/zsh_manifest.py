@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Machine-readable manifest of zsh fragment metadata.
+
+Every fragment in the layer directories is described by one entry built
+from its standardized header (see executable_standardize-headers.py):
+
+    {"path": ".zshrc.d.01/430-navigation-tools.zsh", "layer": ".zshrc.d.01",
+     "name": "430-navigation-tools.zsh", "phase": "...", "purpose": "...",
+     "requires": ["270-productivity-fzf.zsh"], "requires_raw": "...",
+     "toggles": ["ZF_DISABLE_FZF"], "guards": [], "functions": {"zf::fzf_widget": 12},
+     "size": 1234, "lines": 56, "sha256": "...", "mtime_ns": ...}
+
+``guards`` lists the toggles that switch off the whole fragment: a
+top-of-file ``if [[ "${ZF_DISABLE_X:-0}" == 1 ]]; then return 0; fi`` (or
+the ``&& return`` form) with nothing but debug helpers and idempotency
+guards before it. Only these fragments may be skipped without sourcing
+them (see toggle_index.py). ``functions`` maps every function the
+fragment defines to the line of its last definition, so profiles that
+only know a function name can point at the fragment (see
+zprof_aggregate.py).
+
+Updates are incremental: a file whose size and mtime match the previous
+entry is not opened, and one whose content hash is unchanged keeps its
+parsed metadata. Startup and audit tools read this one JSON file instead
+of grepping every fragment.
+
+Layer names are target names (.zshrc.d.01); in the chezmoi source tree
+the matching dot_ directory is used.
+
+Library usage:
+    from zsh_manifest import update_manifest, load_manifest
+    manifest, stats = update_manifest(base_dir, ['.zshrc.d.01'])
+"""
+
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from zsh_blocks import scan
+
+VERSION = 3
+
+# Header lines of the standard form "# Key:   value"
+HEADER_FIELD_RE = re.compile(r'^#\s*(Filename|Purpose|Phase|Requires|Toggles):\s*(.*?)\s*$', re.IGNORECASE)
+FRAGMENT_REF_RE = re.compile(r'\b\d{3}-[\w.-]+?\.zsh\b')
+TOGGLE_VAR_RE = re.compile(r'\b(?:ZF|NO)_[A-Z0-9_]+\b')
+HEADER_SCAN_LINES = 30
+
+# Whole-file toggle guards and the statements allowed to precede them
+GUARD_COND_RE = re.compile(r'\[\[\s*"?\$\{((?:ZF|NO)_[A-Z0-9_]+)(?::-[^}]*)?\}"?\s*==?\s*"?1"?\s*\]\]')
+GUARD_IF_RE = re.compile(r'if\s+(.+?);?\s*then\s*\n((?:\s*zf::debug\b[^\n]*\n)*)\s*return(?:\s+0)?\s*\n\s*fi\b')
+GUARD_LINE_RE = re.compile(r'(.+?)\s*&&\s*return(?:\s+0)?\s*$')
+PREAMBLE_RE = re.compile(
+    r'typeset\s+-f\s+zf::debug\b.*'
+    r'|zf::debug\b.*'
+    r'|\[\[\s+-n\s+"?\$\{_Z\w+_DONE:-\}"?\s+\]\]\s*&&\s*return(?:\s+0)?'
+)
+
+# Layer families in load order; each has a .live symlink to its active version
+FAMILIES = ['.zshrc.pre-plugins.d', '.zshrc.add-plugins.d', '.zshrc.d']
+
+# Phase fallbacks for headers without a Phase: line, by layer family
+LAYER_PHASES = {
+    '.zshrc.add-plugins.d': 'Plugin activation (.zshrc.add-plugins.d/)',
+    '.zshrc.pre-plugins.d': 'Pre-plugin (.zshrc.pre-plugins.d/)',
+    '.zshrc.d': 'Post-plugin (.zshrc.d/)',
+}
+
+
+def default_manifest_path() -> Path:
+    """$ZSH_CACHE_DIR/module-manifest.json (XDG cache fallback)."""
+    cache = os.environ.get('ZSH_CACHE_DIR')
+    if not cache:
+        xdg = os.environ.get('XDG_CACHE_HOME') or str(Path.home() / '.cache')
+        cache = str(Path(xdg) / 'zsh')
+    return Path(cache) / 'module-manifest.json'
+
+
+def resolve_layer(base_dir: Path, layer: str) -> Optional[Path]:
+    """Find ``layer`` (a target name) under ``base_dir``, or its dot_ source."""
+    for name in (layer, 'dot_' + layer[1:] if layer.startswith('.') else None):
+        if name and (base_dir / name).is_dir():
+            return base_dir / name
+    return None
+
+
+def resolve_live(base_dir: Path, family: str) -> Optional[str]:
+    """Name of the versioned layer ``family``.live points at, if any.
+
+    Reads the symlink in a deployed tree, or the chezmoi ``symlink_``
+    source file in the source tree.
+    """
+    link = base_dir / f'{family}.live'
+    if link.is_symlink():
+        return os.path.basename(os.readlink(link))
+    source = base_dir / f'symlink_dot_{family[1:]}.live'
+    if source.is_file():
+        return source.read_text(encoding='utf-8').strip()
+    return None
+
+
+def live_layers(base_dir: Path) -> List[str]:
+    """The active layer of every family, in load order."""
+    return [layer for layer in (resolve_live(base_dir, f) for f in FAMILIES) if layer]
+
+
+def layer_family(layer: str) -> str:
+    """'.zshrc.d.01' -> '.zshrc.d' (also strips a .live suffix)."""
+    return re.sub(r'\.(\d{2}|live)$', '', layer)
+
+
+def parse_header(text: str) -> Dict[str, str]:
+    """Return the standard header fields found near the top of ``text``."""
+    fields = {}
+    for line in text.split('\n', HEADER_SCAN_LINES)[:HEADER_SCAN_LINES]:
+        m = HEADER_FIELD_RE.match(line.strip())
+        if m:
+            fields.setdefault(m.group(1).lower(), m.group(2))
+    return fields
+
+
+def _guard_vars(condition: str) -> List[str]:
+    """Toggles that alone make ``condition`` true; [] unless every term is ||-ed."""
+    if '&&' in condition:
+        return []
+    return [m.group(1) for m in (GUARD_COND_RE.fullmatch(part.strip())
+                                 for part in re.split(r'\|\|', condition)) if m]
+
+
+def file_guards(text: str) -> List[str]:
+    """Toggles whose value 1 makes the fragment return before doing anything."""
+    guards = []
+    code = '\n'.join(line for line in text.split('\n')
+                     if line.strip() and not line.lstrip().startswith('#')) + '\n'
+    pos = 0
+    while pos < len(code):
+        m = GUARD_IF_RE.match(code, pos)
+        if m:
+            guards += _guard_vars(m.group(1))
+            pos = code.index('\n', m.end()) + 1 if '\n' in code[m.end():] else len(code)
+            continue
+        end = code.index('\n', pos)
+        line = code[pos:end].strip()
+        m = GUARD_LINE_RE.fullmatch(line)
+        if m and not PREAMBLE_RE.fullmatch(line):
+            guards += _guard_vars(m.group(1))
+        elif not PREAMBLE_RE.fullmatch(line):
+            break
+        pos = end + 1
+    return sorted(set(guards))
+
+
+def describe(layer: str, name: str, data: bytes) -> dict:
+    """Build the metadata part of an entry from file content."""
+    text = data.decode('utf-8', errors='replace')
+    fields = parse_header(text)
+    requires_raw = fields.get('requires') or None
+    return {
+        'phase': fields.get('phase') or LAYER_PHASES.get(layer_family(layer), 'Configuration'),
+        'purpose': fields.get('purpose') or None,
+        'requires': FRAGMENT_REF_RE.findall(requires_raw or ''),
+        'requires_raw': requires_raw,
+        'toggles': sorted(set(TOGGLE_VAR_RE.findall(fields.get('toggles') or ''))),
+        'guards': file_guards(text),
+        'functions': {name: line for line, name in scan(text).functions},
+        'lines': text.count('\n') + (0 if text.endswith('\n') or not text else 1),
+    }
+
+
+def load_manifest(path: Optional[Path] = None) -> dict:
+    """Load a manifest; a missing or stale-format file yields an empty one."""
+    path = Path(path or default_manifest_path())
+    try:
+        manifest = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {'version': VERSION, 'fragments': []}
+    if manifest.get('version') != VERSION:
+        return {'version': VERSION, 'fragments': []}
+    return manifest
+
+
+def scan_layers(base_dir: Path, layers: Iterable[str], previous: dict) -> Tuple[List[dict], Dict[str, int]]:
+    """Describe every *.zsh fragment in ``layers``, reusing ``previous``.
+
+    Returns (entries, stats) where stats counts reused/rehashed/parsed files.
+    """
+    old = {e['path']: e for e in previous.get('fragments', [])}
+    stats = {'reused': 0, 'rehashed': 0, 'parsed': 0}
+    entries = []
+    for layer in layers:
+        layer_dir = resolve_layer(base_dir, layer)
+        if layer_dir is None:
+            continue
+        for entry in sorted(os.scandir(layer_dir), key=lambda e: e.name):
+            if not entry.name.endswith('.zsh') or not entry.is_file():
+                continue
+            rel = os.path.relpath(entry.path, base_dir)
+            st = entry.stat()
+            prev = old.get(rel)
+            if prev and prev['size'] == st.st_size and prev['mtime_ns'] == st.st_mtime_ns:
+                entries.append(prev)
+                stats['reused'] += 1
+                continue
+            data = Path(entry.path).read_bytes()
+            digest = hashlib.sha256(data).hexdigest()
+            if prev and prev['sha256'] == digest:
+                item = dict(prev, mtime_ns=st.st_mtime_ns)
+                stats['rehashed'] += 1
+            else:
+                item = {'path': rel, 'layer': layer, 'name': entry.name, **describe(layer, entry.name, data)}
+                stats['parsed'] += 1
+            item.update(size=st.st_size, sha256=digest, mtime_ns=st.st_mtime_ns)
+            entries.append(item)
+    return entries, stats
+
+
+def update_manifest(base_dir: Path, layers: Iterable[str], path: Optional[Path] = None):
+    """Refresh the manifest at ``path`` for ``layers``; return (manifest, stats).
+
+    The file is only rewritten when an entry was added, removed or changed.
+    Entries for layers not listed are kept, so tools can refresh subsets.
+    """
+    path = Path(path or default_manifest_path())
+    layers = list(layers)
+    previous = load_manifest(path)
+    fresh, stats = scan_layers(base_dir, layers, previous)
+    kept = [e for e in previous['fragments'] if e['layer'] not in layers]
+    fragments = sorted(kept + fresh, key=lambda e: e['path'])
+    stats['changed'] = fragments != previous['fragments']
+    if not stats['changed']:
+        return previous, stats
+    manifest = {
+        'version': VERSION,
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'base_dir': str(base_dir),
+        'fragments': fragments,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    tmp.write_text(json.dumps(manifest, indent=2) + '\n', encoding='utf-8')
+    os.replace(tmp, path)
+    return manifest, stats
@@ -2,62 +2,78 @@
 """
 Auto-fix common Markdown style issues across docs/
 - Ensure blank lines around headings and lists
-- Add language tags to unlabeled fenced code blocks when heuristics indicate shell scripts
+- Add language tags to unlabeled fenced code blocks (classified by bin/md_fences.py)
 - Convert emphasized-as-heading lines like `**foo.sh**` to small headings
 - Insert '## Top' when `[Top](#top)` is referenced but no top heading exists
 
-This script writes backups (*.fix.bak) before changing files.
+The fixes are exposed as pure text-to-text functions so other tools can apply
+them to content they already hold in memory:
+
+    from auto_fix_markdown import fix_markdown
+    new_text = fix_markdown(text, title='010-overview')
+
+Usage:
+    python3 docs/tools/auto_fix_markdown.py [--dry-run] [--jobs N]
+                                            [--include GLOB] [--exclude GLOB]
+                                            [PATH ...]
+
+Originals are recorded in the shared backup journal (bin/backup_journal.py)
+instead of *.fix.bak files; undo a run with `backup_journal.py rollback RUN_ID`.
 """
+import argparse
+import fnmatch
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[2]  # repo root
 DOCS = ROOT / 'docs'
 
-md_files = [p for p in DOCS.rglob('*.md') if '.ARCHIVE' not in p.parts]
+sys.path.insert(0, str(ROOT / 'bin'))
+from backup_journal import Journal  # noqa: E402
+from md_fences import classify_block, index_fences  # noqa: E402
+
+TOOL = 'auto-fix-markdown'
 
 heading_re = re.compile(r'^(#{1,6})\s*(.*)')
 emph_heading_re = re.compile(r'^\*\*(.+?)\*\*\s*$')
-code_fence_re = re.compile(r'^```\s*$')
 list_item_re = re.compile(r'^[\s]*([-+*]|\d+\.)\s+')
+top_heading_re = re.compile(r'^#{1,6}\s+Top\s*$')
+
+
+def _fix_lines(lines, headings=True, lists=True, emphasis=True, fences=True):
+    """Apply the selected fixes in a single walk over ``lines``.
 
-changed = []
-for p in md_files:
-    s = p.read_text(encoding='utf-8')
-    orig = s
-    lines = s.splitlines()
+    Fenced blocks are located up front with ``index_fences`` and copied
+    verbatim, so shell comments are not mistaken for headings and closing
+    fences are never tagged.
+    """
+    fence_at = {f.start: f for f in index_fences(lines)}
     out = []
     i = 0
-    # Pre-scan headers to know if # Top present
-    has_top = any(re.match(r'^#{1,6}\s+Top\s*$', ln) for ln in lines)
-    contains_top_ref = any('[Top](#top)' in ln or '[Top](#Top)' in ln for ln in lines)
-    if contains_top_ref and not has_top:
-        # Insert '## Top' after first H1 or at top
-        inserted = False
-        for idx, ln in enumerate(lines):
-            if idx == 0 and ln.startswith('# '):
-                lines.insert(1, '')
-                lines.insert(2, '## Top')
-                lines.insert(3, '')
-                inserted = True
-                break
-        if not inserted:
-            lines.insert(0, '# ' + p.stem)
-            lines.insert(1, '')
-            lines.insert(2, '## Top')
-            lines.insert(3, '')
-    # Process lines applying fixes
     while i < len(lines):
         ln = lines[i]
-        # Convert emphasized headings **foo** -> '#### foo'
-        m = emph_heading_re.match(ln)
-        if m:
-            out.append('#### ' + m.group(1).strip())
-            i += 1
+        # Code fence handling: tag unlabeled blocks, copy contents verbatim
+        fence = fence_at.get(i)
+        if fence is not None:
+            if fences and not fence.info:
+                out.append(f'{fence.indent}```{classify_block(fence.body(lines))}')
+            else:
+                out.append(ln)
+            out.extend(lines[i+1:fence.end+1])
+            i = fence.end + 1
             continue
+        # Convert emphasized headings **foo** -> '#### foo'
+        if emphasis:
+            m = emph_heading_re.match(ln)
+            if m:
+                out.append('#### ' + m.group(1).strip())
+                i += 1
+                continue
         # Ensure blank line before a heading (but not at start)
-        m = heading_re.match(ln)
-        if m:
+        if headings and heading_re.match(ln):
             if out and out[-1].strip() != '':
                 out.append('')
             out.append(ln)
@@ -67,51 +83,157 @@ for p in md_files:
             i += 1
             continue
         # Ensure blank line before list start
-        if list_item_re.match(ln):
+        if lists and list_item_re.match(ln):
             if out and out[-1].strip() != '':
                 out.append('')
             out.append(ln)
             # ensure blank line after list block end (look ahead)
             j = i+1
-            while j < len(lines) and (list_item_re.match(lines[j]) or lines[j].strip()==""):
+            while j < len(lines) and (list_item_re.match(lines[j]) or lines[j].strip() == ""):
                 out.append(lines[j])
                 j += 1
             if j < len(lines) and lines[j].strip() != '':
                 out.append('')
             i = j
             continue
-        # Code fence handling: add language when fence present
-        if code_fence_re.match(ln):
-            # look ahead to next non-empty line to guess language
-            j = i+1
-            while j < len(lines) and lines[j].strip() == '':
-                j += 1
-            lang = ''
-            if j < len(lines):
-                nxt = lines[j]
-                # heuristic: shebang or bash-like commands
-                if nxt.startswith('#!') or 'set -e' in nxt or 'zsh' in nxt or 'bash' in nxt or 'exec zsh' in nxt:
-                    lang = 'bash'
-                # heuristic: mermaid diagrams start with 'graph' or 'sequence' etc
-                if nxt.strip().startswith('graph') or nxt.strip().startswith('sequence') or nxt.strip().startswith('mermaid'):
-                    lang = 'mermaid'
-                if nxt.strip().startswith('|') and '---' in nxt:
-                    lang = 'text'
-            if lang:
-                out.append('```' + lang)
-            else:
-                out.append(ln)
-            i += 1
-            continue
         out.append(ln)
         i += 1
-    new = '\n'.join(out) + '\n'
-    if new != orig:
-        bak = p.with_suffix(p.suffix + '.fix.bak')
-        p.write_text(new, encoding='utf-8')
-        bak.write_text(orig, encoding='utf-8')
-        changed.append(str(p))
-
-print('Modified', len(changed), 'files')
-for c in changed:
-    print(' -', c)
+    return out
+
+
+def _apply(text, **flags):
+    return '\n'.join(_fix_lines(text.splitlines(), **flags)) + '\n'
+
+
+def fix_headings(text):
+    """Ensure blank lines before and after ATX headings."""
+    return _apply(text, headings=True, lists=False, emphasis=False, fences=False)
+
+
+def fix_list_spacing(text):
+    """Ensure blank lines before and after list blocks."""
+    return _apply(text, headings=False, lists=True, emphasis=False, fences=False)
+
+
+def fix_emphasis_headings(text):
+    """Convert lines that are only ``**bold**`` into ``####`` headings."""
+    return _apply(text, headings=False, lists=False, emphasis=True, fences=False)
+
+
+def fix_fence_languages(text):
+    """Add a language tag to unlabeled opening code fences."""
+    return _apply(text, headings=False, lists=False, emphasis=False, fences=True)
+
+
+def fix_top_anchor(text, title='Untitled'):
+    """Insert '## Top' when ``[Top](#top)`` is referenced but missing."""
+    lines = text.splitlines()
+    has_top = any(top_heading_re.match(ln) for ln in lines)
+    contains_top_ref = any('[Top](#top)' in ln or '[Top](#Top)' in ln for ln in lines)
+    if not contains_top_ref or has_top:
+        return text
+    # Insert '## Top' after first H1 or at top
+    if lines and lines[0].startswith('# '):
+        lines[1:1] = ['', '## Top', '']
+    else:
+        lines[0:0] = ['# ' + title, '', '## Top', '']
+    return '\n'.join(lines) + '\n'
+
+
+def fix_markdown(text, title='Untitled'):
+    """Apply every fix in one pass and return the new text.
+
+    ``title`` is used for the H1 inserted when a ``## Top`` anchor is needed
+    but the document has no title of its own.
+    """
+    return _apply(fix_top_anchor(text, title))
+
+
+def fixed_text(path):
+    """The fixed text of one file on disk, or None when nothing changes."""
+    p = Path(path)
+    orig = p.read_text(encoding='utf-8')
+    new = fix_markdown(orig, p.stem)
+    return None if new == orig else new
+
+
+def process_file(path, dry_run=False, run=None):
+    """Fix one file on disk.
+
+    The original is recorded in ``run``; without one the file gets a run
+    of its own, closed (and its manifest written) before returning.
+    Returns None when nothing changes, otherwise the journal entry for the
+    file (an empty dict in dry-run mode).
+    """
+    new = fixed_text(path)
+    if new is None:
+        return None
+    if dry_run:
+        return {}
+    if run is not None:
+        return run.write_text(Path(path), new)
+    with Journal().start_run(TOOL) as own:
+        return own.write_text(Path(path), new)
+
+
+def find_markdown_files(paths, include=(), exclude=()):
+    """Expand files/directories into a sorted list of Markdown files."""
+    found = set()
+    for base in paths:
+        base = Path(base)
+        candidates = [base] if base.is_file() else base.rglob('*.md')
+        for p in candidates:
+            if '.ARCHIVE' in p.parts:
+                continue
+            rel = os.path.relpath(p, ROOT)
+            if include and not any(fnmatch.fnmatch(rel, pat) for pat in include):
+                continue
+            if any(fnmatch.fnmatch(rel, pat) for pat in exclude):
+                continue
+            found.add(p)
+    return sorted(found)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Auto-fix common Markdown style issues')
+    parser.add_argument('paths', nargs='*', type=Path, default=[DOCS],
+                        help='Files or directories to process (default: docs/)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Report files that would change without writing them')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--include', action='append', default=[], metavar='GLOB',
+                        help='Only process paths (relative to the zsh root) matching GLOB')
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                        help='Skip paths (relative to the zsh root) matching GLOB')
+    args = parser.parse_args(argv)
+
+    md_files = find_markdown_files(args.paths, args.include, args.exclude)
+    n = len(md_files)
+    changed = []
+    # Workers only compute the new text; every write happens here, inside
+    # the run, so a failure partway still leaves a manifest for what was
+    # written before it.
+    with Journal().start_run(TOOL) as run:
+        if args.jobs > 1 and n > 1:
+            with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+                for p, new in zip(md_files, pool.map(fixed_text, md_files, chunksize=8)):
+                    if new is not None:
+                        changed.append(str(p))
+                        if not args.dry_run:
+                            run.write_text(p, new)
+        else:
+            for p in md_files:
+                if process_file(p, args.dry_run, run) is not None:
+                    changed.append(str(p))
+
+    print('Would modify' if args.dry_run else 'Modified', len(changed), 'files')
+    for c in changed:
+        print(' -', c)
+    if run.entries:
+        print('Rollback with: python3 bin/backup_journal.py rollback', run.run_id)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -15,7 +15,7 @@ Features:
 - Optional link verification after regeneration
 
 Usage:
-    python3 tools/regenerate-tocs.py [--dry-run] [--file FILE] [--verify] [--collapsible] [--dual-anchors]
+    python3 tools/regenerate-tocs.py [--dry-run] [--file FILE] [--verify] [--collapsible] [--dual-anchors] [--stream]
 
 Options:
     --dry-run       Show what would be changed without modifying files
@@ -23,6 +23,7 @@ Options:
     --verify        Verify links after regeneration
     --collapsible   Make TOC collapsible using HTML details/summary tags
     --dual-anchors  Include both GitHub and Zed-style anchors for compatibility
+    --stream        Bounded-memory mode: scan files via mmap and write output incrementally
     --help          Show this help message
 
 Author: AI Assistant
@@ -33,10 +34,27 @@ import re
 import sys
 import argparse
 import subprocess
+from collections import deque
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Iterable, Iterator, List, Tuple, Optional, Union
 from dataclasses import dataclass
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bin"))
+from fs_snapshot import skip_archived, walk_files  # noqa: E402
+from md_stream import iter_lines, write_lines  # noqa: E402
+
+TOC_HEADING_RE = re.compile(r"^##\s+(\d+\.)?\s*Table of Contents", re.IGNORECASE)
+HEADING_LINE_RE = re.compile(r"^(#{1,4})\s+(.+)$")
+H1_RE = re.compile(r"^#\s+[^#]")
+
+# The navigation footer is searched for in the last 30 lines, looking back
+# up to 10 more for its leading separator.
+NAV_WINDOW = 40
+
+
+class MissingTitle(Exception):
+    """Raised while rendering a document that has no H1 to anchor the TOC."""
+
 
 @dataclass
 class Heading:
@@ -125,14 +143,14 @@ def slugify(text: str) -> str:
     return text
 
 
-def extract_headings(content: str) -> List[Heading]:
-    """Extract all headings from markdown content"""
+def extract_headings(content: Union[str, Iterable[str]]) -> List[Heading]:
+    """Extract all headings from markdown content (a string or line iterable)"""
     headings = []
-    lines = content.split("\n")
+    lines = content.split("\n") if isinstance(content, str) else content
 
     for i, line in enumerate(lines):
         # Match markdown headings (# Header)
-        match = re.match(r"^(#{1,4})\s+(.+)$", line)
+        match = HEADING_LINE_RE.match(line)
         if match:
             level = len(match.group(1))
             text = match.group(2).strip()
@@ -291,94 +309,190 @@ def generate_navigation_footer(current_file: str, title_anchor: str) -> str:
     return "\n".join(footer)
 
 
-def remove_existing_toc(lines: List[str]) -> Tuple[List[str], int]:
+def strip_tocs(lines: Iterable[str]) -> Iterator[str]:
     """
-    Remove ALL existing TOC sections from content.
-    Returns cleaned lines and the index where first TOC was found (or -1).
+    Yield lines with ALL existing TOC sections removed.
+    A section runs from its heading to the next H1/H2 heading (kept), or
+    through the first '---' more than three lines after the heading.
     """
-    first_toc_position = -1
-
-    while True:
-        toc_start = -1
-        toc_end = -1
-
-        # Find TOC section
-        for i, line in enumerate(lines):
-            if re.match(r"^##\s+(\d+\.)?\s*Table of Contents", line, re.IGNORECASE):
-                toc_start = i
-                if first_toc_position == -1:
-                    first_toc_position = i
-                # Find the end of TOC (next ## heading or end of separators)
-                for j in range(i + 1, len(lines)):
-                    # Next heading at same or higher level
-                    if (
-                        re.match(r"^#{1,2}\s+", lines[j])
-                        and "Table of Contents" not in lines[j]
-                    ):
-                        toc_end = j
-                        break
-                    # Separator after some content
-                    if lines[j].strip() == "---" and j > i + 3:
-                        toc_end = j + 1
+    toc_start = None
+
+    for i, line in enumerate(lines):
+        if toc_start is not None:
+            # Next heading at same or higher level ends the TOC
+            if re.match(r"^#{1,2}\s+", line) and "Table of Contents" not in line:
+                toc_start = None
+            # Separator after some content ends it too (and is removed)
+            elif line.strip() == "---" and i > toc_start + 3:
+                toc_start = None
+                continue
+            else:
+                continue
+
+        if TOC_HEADING_RE.match(line):
+            toc_start = i
+            continue
+
+        yield line
+
+
+def strip_navigation(lines: Iterable[str]) -> Iterator[str]:
+    """Yield lines without the navigation footer.
+
+    Only the last NAV_WINDOW lines are held back, since that is where
+    the footer is searched for.
+    """
+    tail = deque()
+    count = 0
+    for line in lines:
+        tail.append(line)
+        count += 1
+        if len(tail) > NAV_WINDOW:
+            yield tail.popleft()
+
+    base = count - len(tail)
+    tail = list(tail)
+    nav_start = count
+
+    # Navigation is typically in the last 20 lines
+    if count >= 20:
+        # Find navigation section (work backwards from end)
+        for i in range(count - 1, max(count - 30, 0), -1):
+            if "**Navigation:**" in tail[i - base]:
+                nav_start = i
+                # Find the start (usually a --- before it)
+                for j in range(i, max(i - 10, 0), -1):
+                    if tail[j - base].strip() == "---":
+                        nav_start = j
                         break
-                if toc_end == -1:
-                    toc_end = len(lines)
                 break
 
-        if toc_start == -1:
-            # No more TOCs found
-            break
+    yield from tail[: nav_start - base]
 
-        # Remove TOC section
-        lines = lines[:toc_start] + lines[toc_end:]
 
-    return lines, first_toc_position
+def insert_toc(lines: Iterable[str], toc_lines: List[str]) -> Iterator[str]:
+    """Yield lines with the TOC (after a blank line) following the first H1"""
+    inserted = False
+    for line in lines:
+        yield line
+        if not inserted and H1_RE.match(line):
+            yield ""
+            yield from toc_lines
+            inserted = True
+    if not inserted:
+        raise MissingTitle()
 
 
-def remove_existing_navigation(lines: List[str]) -> List[str]:
-    """Remove existing navigation footer from content"""
-    # Navigation is typically in the last 20 lines
-    if len(lines) < 20:
-        return lines
-
-    # Find navigation section (work backwards from end)
-    nav_start = -1
-    for i in range(len(lines) - 1, max(len(lines) - 30, 0), -1):
-        if "**Navigation:**" in lines[i]:
-            # Find the start (usually a --- before it)
-            for j in range(i, max(i - 10, 0), -1):
-                if lines[j].strip() == "---":
-                    nav_start = j
+def renumber_headings(lines: Iterable[str], headings: List[Heading]) -> Iterator[str]:
+    """Yield lines with headings rewritten to their hierarchical numbers"""
+    # Track which headings we've used to handle duplicates
+    heading_usage_count = {}
+
+    for line in lines:
+        # Check if this line is a heading we need to renumber
+        match = HEADING_LINE_RE.match(line)
+        if not match:
+            yield line
+            continue
+
+        level = len(match.group(1))
+        text = match.group(2).strip()
+        # Remove existing numbering
+        text = re.sub(r"^\d+(\.\d+)*\.?\s+", "", text)
+
+        # Skip TOC heading - don't number it
+        if "Table of Contents" in text:
+            yield line
+            continue
+
+        # Find matching heading by level and text, accounting for duplicates
+        # Use a key that tracks how many times we've seen this level+text combo
+        key = (level, text)
+        current_usage = heading_usage_count.get(key, 0)
+
+        matching_heading = None
+        usage_count = 0
+        for h in headings:
+            if h.level == level and h.text == text:
+                if usage_count == current_usage:
+                    matching_heading = h
+                    heading_usage_count[key] = current_usage + 1
                     break
-            if nav_start == -1:
-                nav_start = i
-            break
+                usage_count += 1
 
-    if nav_start == -1:
-        return lines
+        if matching_heading:
+            # H1 doesn't get numbered
+            if matching_heading.number:
+                yield f"{'#' * level} {matching_heading.number}. {matching_heading.text}"
+            else:
+                yield f"{'#' * level} {matching_heading.text}"
+        else:
+            yield line
 
-    # Remove from nav_start to end
-    return lines[:nav_start]
+
+def finish_document(lines: Iterable[str], footer: str) -> Iterator[str]:
+    """Yield the final lines: blank runs collapsed, trailing blanks
+    dropped, the navigation footer appended and a single final newline.
+
+    Equivalent to joining, collapsing ``\n{4,}`` to three newlines and
+    ``rstrip() + "\n"``, but only a run of blank lines is ever buffered.
+    """
+    pending = []
+    started = False
+
+    for line in lines:
+        if line.strip() == "":
+            pending.append(line)
+            continue
+        blank_run = 0
+        for blank in pending:
+            if blank == "":
+                blank_run += 1
+                if blank_run <= (2 if started else 3):
+                    yield blank
+            else:
+                blank_run = 0
+                started = True
+                yield blank
+        pending = []
+        started = True
+        yield line
+
+    # Trailing blank lines (still pending) are dropped before the footer
+    yield from footer.rstrip().split("\n")
+    yield ""
 
 
 def process_document(
     file_path: Path,
     dry_run: bool = False,
     collapsible: bool = False,
+    stream: bool = False,
 ) -> bool:
-    """Process a single markdown document"""
+    """Process a single markdown document
+
+    The document is rendered by a pipeline of line generators. In stream
+    mode both passes (heading extraction, then rendering) read the file
+    through mmap and the output is written incrementally; otherwise the
+    same pipeline runs over the in-memory lines.
+    """
     print(f"\n{'[DRY RUN] ' if dry_run else ''}Processing: {file_path}")
 
     # Read content
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
+        if stream:
+            read_lines = lambda: iter_lines(file_path)  # noqa: E731
+        else:
+            with open(file_path, "r", encoding="utf-8") as f:
+                content_lines = f.read().split("\n")
+            read_lines = lambda: content_lines  # noqa: E731
+
+        # Extract headings
+        headings = extract_headings(read_lines())
     except Exception as e:
         print(f"  ✗ Error reading file: {e}")
         return False
 
-    # Extract headings
-    headings = extract_headings(content)
     if not headings:
         print(f"  ⚠ No headings found, skipping")
         return False
@@ -395,81 +509,7 @@ def process_document(
     # Generate new TOC
     new_toc = generate_toc(headings, collapsible=collapsible)
 
-    # Split content into lines
-    lines = content.split("\n")
-
-    # Remove existing TOC
-    lines, toc_position = remove_existing_toc(lines)
-
-    # Remove existing navigation
-    lines = remove_existing_navigation(lines)
-
-    # Find where to insert TOC (after first H1 heading only)
-    insert_position = -1
-    for i, line in enumerate(lines):
-        if re.match(r"^#\s+[^#]", line):  # H1 only (single #)
-            insert_position = i + 1
-            break
-
-    if insert_position == -1:
-        print(f"  ⚠ Could not find main heading (H1), skipping")
-        return False
-
-    # Insert new TOC with blank line before it
-    toc_lines = new_toc.split("\n")
-    lines = lines[:insert_position] + [""] + toc_lines + lines[insert_position:]
-
-    # Update heading numbering in content
-    # Track which headings we've used to handle duplicates
-    heading_usage_count = {}
-    new_lines = []
-
-    for i, line in enumerate(lines):
-        # Check if this line is a heading we need to renumber
-        match = re.match(r"^(#{1,4})\s+(.+)$", line)
-        if match:
-            level = len(match.group(1))
-            text = match.group(2).strip()
-            # Remove existing numbering
-            text = re.sub(r"^\d+(\.\d+)*\.?\s+", "", text)
-
-            # Skip TOC heading - don't number it
-            if "Table of Contents" in text:
-                new_lines.append(line)
-                continue
-
-            # Find matching heading by level and text, accounting for duplicates
-            # Use a key that tracks how many times we've seen this level+text combo
-            key = (level, text)
-            current_usage = heading_usage_count.get(key, 0)
-
-            matching_heading = None
-            usage_count = 0
-            for h in headings:
-                if h.level == level and h.text == text:
-                    if usage_count == current_usage:
-                        matching_heading = h
-                        heading_usage_count[key] = current_usage + 1
-                        break
-                    usage_count += 1
-
-            if matching_heading:
-                # H1 doesn't get numbered
-                if matching_heading.number:
-                    new_line = f"{'#' * level} {matching_heading.number}. {matching_heading.text}"
-                else:
-                    new_line = f"{'#' * level} {matching_heading.text}"
-                new_lines.append(new_line)
-            else:
-                new_lines.append(line)
-        else:
-            new_lines.append(line)
-
-    # Remove trailing blank lines
-    while new_lines and new_lines[-1].strip() == "":
-        new_lines.pop()
-
-    # Add navigation footer
+    # Navigation footer links are relative to docs/
     docs_dir = file_path.parent
     while docs_dir.name != "docs" and docs_dir.parent != docs_dir:
         docs_dir = docs_dir.parent
@@ -480,56 +520,54 @@ def process_document(
         relative_path = file_path.name
 
     nav_footer = generate_navigation_footer(str(relative_path), title_anchor)
-    new_lines.append(nav_footer)
-
-    # Join and clean up
-    new_content = "\n".join(new_lines)
 
-    # Remove excessive blank lines (more than 2 consecutive)
-    new_content = re.sub(r"\n{4,}", "\n\n\n", new_content)
+    # Remove existing TOC and navigation, insert the new TOC after the
+    # first H1, renumber headings, tidy blank lines and append the footer
+    rendered = finish_document(
+        renumber_headings(
+            insert_toc(strip_navigation(strip_tocs(read_lines())), new_toc.split("\n")),
+            headings,
+        ),
+        nav_footer,
+    )
 
-    # Ensure file ends with single newline
-    new_content = new_content.rstrip() + "\n"
+    toc_entries = len([h for h in headings if h.level > 1])
 
-    # Write back
-    if not dry_run:
-        try:
+    try:
+        if dry_run:
+            for _ in rendered:
+                pass
+        elif stream:
+            write_lines(file_path, rendered)
+        else:
+            new_content = "\n".join(rendered)
             with open(file_path, "w", encoding="utf-8") as f:
                 f.write(new_content)
-            print(f"  ✓ Updated successfully")
-            print(
-                f"    - Regenerated TOC with {len([h for h in headings if h.level > 1])} entries"
-            )
-            print(f"    - Updated {len(headings)} heading numbers")
-            return True
-        except Exception as e:
-            print(f"  ✗ Error writing file: {e}")
-            return False
+    except MissingTitle:
+        print(f"  ⚠ Could not find main heading (H1), skipping")
+        return False
+    except Exception as e:
+        print(f"  ✗ Error writing file: {e}")
+        return False
+
+    if not dry_run:
+        print(f"  ✓ Updated successfully")
+        print(f"    - Regenerated TOC with {toc_entries} entries")
+        print(f"    - Updated {len(headings)} heading numbers")
     else:
         print(f"  ✓ Would update (dry run)")
-        print(
-            f"    - Would regenerate TOC with {len([h for h in headings if h.level > 1])} entries"
-        )
+        print(f"    - Would regenerate TOC with {toc_entries} entries")
         print(f"    - Would update {len(headings)} heading numbers")
-        return True
+    return True
 
 
 def find_markdown_files(docs_dir: Path) -> List[Path]:
-    """Find all markdown files in docs directory, excluding archives"""
-    md_files = []
-
-    for file_path in docs_dir.rglob("*.md"):
-        # Skip archived files
-        if ".ARCHIVE" in str(file_path):
-            continue
-
-        # Skip hidden files
-        if any(part.startswith(".") for part in file_path.parts):
-            continue
-
-        md_files.append(file_path)
+    """Find all markdown files in docs directory, excluding archives
 
-    return sorted(md_files)
+    Archived (.ARCHIVE) and hidden directories below docs_dir are pruned
+    before they are descended into.
+    """
+    return walk_files(docs_dir, ".md", skip_archived)
 
 
 def main():
@@ -582,6 +620,12 @@ Examples:
         help="Make TOC collapsible using HTML details/summary tags",
     )
 
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Bounded-memory mode: scan files via mmap and write output incrementally",
+    )
+
     args = parser.parse_args()
 
     # Determine base directory
@@ -629,6 +673,7 @@ Examples:
             file_path,
             dry_run=args.dry_run,
             collapsible=args.collapsible,
+            stream=args.stream,
         ):
             success_count += 1
         else:
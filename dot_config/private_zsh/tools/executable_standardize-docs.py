@@ -27,6 +27,9 @@ from pathlib import Path
 from typing import List, Tuple, Dict, Optional
 from dataclasses import dataclass
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bin"))
+from fs_snapshot import skip_archived, walk_files  # noqa: E402
+
 
 @dataclass
 class Heading:
@@ -392,21 +395,12 @@ def process_document(file_path: Path, dry_run: bool = False) -> bool:
 
 
 def find_markdown_files(docs_dir: Path) -> List[Path]:
-    """Find all markdown files in docs directory, excluding archives"""
-    md_files = []
-
-    for file_path in docs_dir.rglob("*.md"):
-        # Skip archived files
-        if ".ARCHIVE" in str(file_path):
-            continue
-
-        # Skip hidden files
-        if any(part.startswith(".") for part in file_path.parts):
-            continue
-
-        md_files.append(file_path)
+    """Find all markdown files in docs directory, excluding archives
 
-    return sorted(md_files)
+    Archived (.ARCHIVE) and hidden directories below docs_dir are pruned
+    before they are descended into.
+    """
+    return walk_files(docs_dir, ".md", skip_archived)
 
 
 def main():
@@ -10,7 +10,9 @@ Features:
 - Static analysis: Check anchor references match headings
 - Dynamic testing: Parse markdown to verify links resolve correctly
 - TOC-specific verification
-- File link verification (relative paths)
+- File link verification (relative paths) against a one-walk filesystem
+  snapshot (bin/fs_snapshot.py); links that only resolve case-insensitively
+  (fine on macOS, broken on Linux) are reported
 - External URL checking (optional)
 - Detailed reporting with line numbers
 - Exit codes for CI/CD integration
@@ -30,6 +32,7 @@ Author: AI Assistant
 Date: 2025-10-13
 """
 
+import os
 import re
 import sys
 import argparse
@@ -39,6 +42,10 @@ from dataclasses import dataclass
 from collections import defaultdict
 import urllib.parse
 
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "bin"))
+from fs_snapshot import Snapshot, snapshot_for, walk_files  # noqa: E402
+
 
 @dataclass
 class Link:
@@ -208,19 +215,19 @@ def verify_anchor_link(
     )
 
 
-def verify_file_link(link: Link, file_path: Path) -> VerificationResult:
+def verify_file_link(
+    link: Link, file_path: Path, snapshot: Optional[Snapshot] = None
+) -> VerificationResult:
     """Verify a file link points to an existing file"""
-    # Resolve relative path
-    base_dir = file_path.parent
-    target_path = base_dir / link.target
+    snapshot = snapshot or snapshot_for(ROOT)
 
-    # Handle anchors in file links (e.g., file.md#section)
-    if "#" in link.target:
-        file_part = link.target.split("#")[0]
-        target_path = base_dir / file_part
+    # Resolve relative path, dropping any anchor (e.g., file.md#section)
+    file_part = link.target.split("#")[0]
+    target_path = file_path.parent / file_part
+    candidates = [target_path]
 
     # Check if file exists
-    if target_path.exists():
+    if snapshot.exists(target_path):
         return VerificationResult(link=link, is_valid=True, reason="File exists")
 
     # Try to resolve relative to docs directory
@@ -229,14 +236,27 @@ def verify_file_link(link: Link, file_path: Path) -> VerificationResult:
         docs_dir = docs_dir.parent
 
     if docs_dir.name == "docs":
-        alt_path = docs_dir / link.target.split("#")[0]
-        if alt_path.exists():
+        alt_path = docs_dir / file_part
+        candidates.append(alt_path)
+        if snapshot.exists(alt_path):
             return VerificationResult(
                 link=link,
                 is_valid=True,
                 reason=f"File exists (resolved to docs/)",
             )
 
+    # Resolves only on a case-insensitive filesystem (default macOS)
+    for candidate in candidates:
+        actual = snapshot.case_match(candidate)
+        if actual:
+            return VerificationResult(
+                link=link,
+                is_valid=False,
+                reason=f"Case mismatch: {candidate} only exists as {actual} "
+                "(works on macOS, breaks on Linux)",
+                suggestion=f"Use: {os.path.relpath(actual, file_path.parent.absolute())}",
+            )
+
     return VerificationResult(
         link=link,
         is_valid=False,
@@ -265,7 +285,10 @@ def verify_external_url(link: Link) -> VerificationResult:
 
 
 def verify_markdown_file(
-    file_path: Path, check_external: bool = False, verbose: bool = False
+    file_path: Path,
+    check_external: bool = False,
+    verbose: bool = False,
+    snapshot: Optional[Snapshot] = None,
 ) -> Tuple[List[VerificationResult], Dict[str, int]]:
     """Verify all links in a markdown file"""
     if verbose:
@@ -295,7 +318,7 @@ def verify_markdown_file(
             result = verify_anchor_link(link, headings, file_path)
             stats["anchors"] += 1
         elif link.is_file:
-            result = verify_file_link(link, file_path)
+            result = verify_file_link(link, file_path, snapshot)
             stats["files"] += 1
         elif link.is_external:
             if check_external:
@@ -365,7 +388,8 @@ def find_markdown_files(path: Path, recursive: bool = False) -> List[Path]:
         return [path]
 
     if recursive:
-        return sorted(path.rglob("*.md"))
+        # Every .md file, archived trees included, as rglob("*.md") found them
+        return walk_files(path, ".md", lambda name: False)
     else:
         return sorted(path.glob("*.md"))
 
@@ -455,10 +479,14 @@ Examples:
     all_results = []
     total_stats = defaultdict(int)
     files_with_errors = []
+    snapshot = Snapshot(ROOT)
 
     for file_path in files:
         results, stats = verify_markdown_file(
-            file_path, check_external=args.external_urls, verbose=args.verbose
+            file_path,
+            check_external=args.external_urls,
+            verbose=args.verbose,
+            snapshot=snapshot,
         )
 
         all_results.extend(results)
@@ -485,6 +513,11 @@ Examples:
     print(f"\nResults:")
     print(f"  ✓ Valid: {total_stats.get('valid', 0)}")
     print(f"  ✗ Broken: {total_stats.get('broken', 0)}")
+    case_only = sum(1 for r in all_results if r.reason.startswith("Case mismatch"))
+    if case_only:
+        print(f"    (case-only matches: {case_only})")
+    if args.verbose:
+        print(f"\nSnapshot: {len(snapshot.paths)} paths, {snapshot.fallbacks} lookups outside it")
 
     if files_with_errors:
         print(f"\nFiles with broken links:")